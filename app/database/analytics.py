@@ -0,0 +1,269 @@
+"""
+Motores de las consultas analíticas: SQLite o una réplica en DuckDB
+"""
+import csv
+import os
+import tempfile
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.database.create_db import HIRE_SUMMARY_TABLE
+from app.database.db_manager import DatabaseManager
+from app.database.schema import SCHEMAS
+
+try:
+    import duckdb
+except ImportError:  # DuckDB es opcional: solo lo necesita el motor 'duckdb'
+    duckdb = None
+
+# Motores analíticos disponibles
+BACKEND_SQLITE = 'sqlite'
+BACKEND_DUCKDB = 'duckdb'
+ANALYTICS_BACKENDS = (BACKEND_SQLITE, BACKEND_DUCKDB)
+
+# Filas que se leen de SQLite de cada vez al copiar una tabla a DuckDB
+MIRROR_FETCH_SIZE = 50000
+
+class SQLiteAnalytics:
+    """
+    Ejecuta las consultas analíticas directamente sobre SQLite, en
+    conexiones de solo lectura (ver DatabaseManager.execute_read).
+    """
+    name = BACKEND_SQLITE
+
+    def __init__(self, db_manager: DatabaseManager):
+        self.db_manager = db_manager
+
+    @property
+    def version(self) -> None:
+        """
+        Versión de los datos con que responden las consultas, además de la de
+        SQLite (ver DuckDBAnalytics.version). Las consultas leen siempre los
+        datos actuales, por lo que es None.
+        """
+        return None
+
+    def query(self, sql: str, params: Optional[Sequence] = None) -> List[Tuple]:
+        """
+        Ejecuta una consulta de solo lectura. Las consultas analíticas leen el
+        resumen HIRE_SUMMARY_TABLE, que incluye los años archivados.
+
+        Args:
+            sql: Consulta SQL.
+            params: Parámetros de la consulta (opcional).
+
+        Returns:
+            Filas del resultado.
+        """
+        return self.db_manager.execute_read(sql, params)
+
+    def close(self):
+        pass
+
+class DuckDBAnalytics:
+    """
+    Ejecuta las consultas analíticas sobre una réplica de las tablas en un
+    archivo DuckDB, que las recorre por columnas. SQLite sigue siendo la
+    fuente de los datos: la réplica se reconstruye a partir de una
+    instantánea de SQLite cuando las escrituras del gestor la dejan
+    desactualizada (ver DatabaseManager.write_version):
+
+    - Sin refresh_interval, la primera consulta después de una carga
+      reconstruye la réplica antes de responder, por lo que los resultados
+      coinciden siempre con los de SQLite.
+    - Con refresh_interval, un hilo la reconstruye cada refresh_interval
+      segundos si ha habido escrituras, y las consultas usan la última réplica.
+
+    Las escrituras en SQLite de otros procesos no se detectan; para
+    incluirlas se puede llamar a refresh.
+    """
+    name = BACKEND_DUCKDB
+
+    def __init__(self, db_manager: DatabaseManager, path: Optional[str] = None,
+                 refresh_interval: Optional[float] = None):
+        """
+        Inicializa el motor. La réplica se crea en la primera consulta.
+
+        Args:
+            db_manager: Gestor de la base de datos SQLite de origen.
+            path: Ruta del archivo DuckDB (por defecto, la de la base de datos
+                  SQLite con extensión .duckdb).
+            refresh_interval: Segundos entre reconstrucciones programadas, o
+                              None para reconstruir la réplica tras cada carga.
+        """
+        if duckdb is None:
+            raise RuntimeError("El motor analítico duckdb requiere el paquete duckdb (pip install duckdb)")
+        if refresh_interval is not None and refresh_interval <= 0:
+            raise ValueError("El intervalo de actualización debe ser mayor que 0")
+
+        self.db_manager = db_manager
+        self.path = path or os.path.splitext(db_manager.db_path)[0] + '.duckdb'
+        self.refresh_interval = refresh_interval
+        self.mirrored_version: Optional[int] = None
+        self._conn = duckdb.connect(self.path)
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._scheduler: Optional[threading.Thread] = None
+        if refresh_interval is not None:
+            self._scheduler = threading.Thread(target=self._refresh_periodically, name="duckdb-refresh", daemon=True)
+            self._scheduler.start()
+
+    @property
+    def version(self) -> Optional[int]:
+        """
+        Versión de los datos con que responden las consultas, además de la de
+        SQLite. Con refresh_interval, las consultas leen la última réplica,
+        que puede ser anterior a las escrituras: es la versión que copió
+        (mirrored_version). Sin él, la réplica se reconstruye antes de
+        responder y es None.
+        """
+        return None if self.refresh_interval is None else self.mirrored_version
+
+    def is_stale(self) -> bool:
+        """
+        Indica si ha habido escrituras en SQLite desde la última reconstrucción.
+        """
+        return self.mirrored_version != self.db_manager.write_version
+
+    def refresh(self) -> Dict[str, int]:
+        """
+        Reconstruye la réplica con el contenido actual de SQLite.
+
+        Las tablas del esquema y el resumen de hired_employees se leen de una
+        misma instantánea de SQLite y se sustituyen en DuckDB en una sola
+        transacción: las consultas en curso siguen viendo la réplica anterior
+        hasta que termina.
+
+        Returns:
+            Número de filas copiadas de cada tabla.
+        """
+        with self._lock:
+            # La versión se lee antes de abrir la instantánea: una escritura
+            # intermedia hará que la réplica se reconstruya otra vez
+            version = self.db_manager.write_version
+            copied = {}
+            # hired_employees se copia con todo su historial, incluidos los años archivados
+            history, archive_years = self.db_manager.hired_employees_history()
+            with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(self.path))) as tmp_dir:
+                conn = self._conn.cursor()
+                try:
+                    with self.db_manager.snapshot(archive_years) as cursor:
+                        conn.execute("BEGIN TRANSACTION")
+                        for table_name in list(SCHEMAS) + [HIRE_SUMMARY_TABLE]:
+                            source = history if table_name == 'hired_employees' else table_name
+                            copied[table_name] = self._copy_table(cursor, conn, table_name, source, tmp_dir)
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+                finally:
+                    conn.close()
+            self.mirrored_version = version
+            return copied
+
+    @staticmethod
+    def _copy_table(cursor, conn, table_name: str, source: str, tmp_dir: str) -> int:
+        """
+        Copia una tabla de SQLite (leída de source, una tabla o vista con sus
+        mismas columnas) a DuckDB a través de un CSV temporal, que DuckDB carga
+        con COPY mucho más rápido que fila a fila.
+        """
+        columns = cursor.execute(f"PRAGMA table_info({table_name})").fetchall()
+        definitions = ', '.join(
+            f'"{name}" {"BIGINT" if "INT" in col_type.upper() else "VARCHAR"}'
+            for _, name, col_type, _, _, _ in columns
+        )
+        conn.execute(f'CREATE OR REPLACE TABLE "{table_name}" ({definitions})')
+        # Un valor vacío se lee como NULL, salvo en las columnas de texto
+        # obligatorias, donde es una cadena vacía
+        required_text = [
+            f'"{name}"' for _, name, col_type, not_null, _, _ in columns
+            if not_null and "INT" not in col_type.upper()
+        ]
+
+        file_path = os.path.join(tmp_dir, f"{table_name}.csv")
+        rows = 0
+        names = ', '.join(f'"{name}"' for _, name, _, _, _, _ in columns)
+        cursor.execute(f"SELECT {names} FROM {source}")
+        with open(file_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            while True:
+                chunk = cursor.fetchmany(MIRROR_FETCH_SIZE)
+                if not chunk:
+                    break
+                writer.writerows(chunk)
+                rows += len(chunk)
+        if rows:
+            options = ["FORMAT csv", "AUTO_DETECT false", "HEADER false", "DELIMITER ','",
+                       "QUOTE '\"'", "ESCAPE '\"'"]
+            if required_text:
+                options.append(f"FORCE_NOT_NULL ({', '.join(required_text)})")
+            source = file_path.replace("'", "''")
+            conn.execute(f"COPY \"{table_name}\" FROM '{source}' ({', '.join(options)})")
+        return rows
+
+    def query(self, sql: str, params: Optional[Sequence] = None) -> List[Tuple]:
+        """
+        Ejecuta una consulta sobre la réplica. Sin refresh_interval, la
+        reconstruye antes si está desactualizada.
+
+        Args:
+            sql: Consulta SQL (las consultas analíticas son válidas en ambos
+                 motores). En la réplica, hired_employees incluye los años archivados.
+            params: Parámetros de la consulta (opcional).
+
+        Returns:
+            Filas del resultado.
+        """
+        if self.mirrored_version is None or (self.refresh_interval is None and self.is_stale()):
+            self._refresh_if_stale()
+        # Cada hilo consulta con su propia conexión a la misma base de datos
+        conn = self._conn.cursor()
+        try:
+            return conn.execute(sql, params or []).fetchall()
+        finally:
+            conn.close()
+
+    def _refresh_if_stale(self):
+        # Si varias consultas encuentran la réplica desactualizada, solo la
+        # primera la reconstruye
+        with self._lock:
+            if self.mirrored_version is None or self.is_stale():
+                self.refresh()
+
+    def _refresh_periodically(self):
+        while not self._stop.wait(self.refresh_interval):
+            if not self.is_stale():
+                continue
+            try:
+                self.refresh()
+            except Exception as e:
+                # Se reintenta en el siguiente intervalo; mientras, se sigue usando la réplica anterior
+                print(f"Error al actualizar la réplica analítica: {e}")
+
+    def close(self):
+        """
+        Detiene las reconstrucciones programadas y cierra la réplica.
+        """
+        self._stop.set()
+        if self._scheduler is not None:
+            self._scheduler.join()
+        self._conn.close()
+
+def create_analytics(db_manager: DatabaseManager, backend: str = BACKEND_SQLITE, **options):
+    """
+    Crea el motor analítico indicado.
+
+    Args:
+        db_manager: Gestor de la base de datos SQLite.
+        backend: 'sqlite' o 'duckdb'.
+        options: Opciones del motor (path y refresh_interval para 'duckdb').
+
+    Returns:
+        Motor con los métodos query y close.
+    """
+    if backend == BACKEND_SQLITE:
+        return SQLiteAnalytics(db_manager)
+    if backend == BACKEND_DUCKDB:
+        return DuckDBAnalytics(db_manager, **options)
+    raise ValueError(f"Motor analítico no válido. Debe ser uno de: {', '.join(ANALYTICS_BACKENDS)}")
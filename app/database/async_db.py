@@ -0,0 +1,183 @@
+"""
+Acceso asíncrono a la base de datos para los endpoints
+"""
+import asyncio
+import functools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Mapping, Optional, Tuple, TypeVar
+
+from app.database.db_manager import DEFAULT_FETCH_SIZE, Batch, DatabaseManager
+
+# Número de hilos de lectura por defecto
+DEFAULT_READ_WORKERS = 4
+
+T = TypeVar('T')
+
+class DatabaseLanes:
+    """
+    Hilos dedicados a la base de datos, separados de los del bucle de eventos:
+    un conjunto de hilos de lectura y un único hilo de escritura. Las
+    escrituras de las peticiones se ejecutan así de una en una, en orden de
+    llegada y sin competir entre ellas por el bloqueo de SQLite, mientras las
+    lecturas se siguen atendiendo en paralelo.
+
+    Los hilos se crean al primer uso; tras shutdown se vuelven a crear si se
+    usan de nuevo.
+    """
+
+    def __init__(self, read_workers: int = DEFAULT_READ_WORKERS):
+        """
+        Inicializa los carriles.
+
+        Args:
+            read_workers: Número de hilos de lectura.
+        """
+        if read_workers < 1:
+            raise ValueError("El número de hilos de lectura debe ser mayor que 0")
+        self.read_workers = read_workers
+        self._lock = threading.Lock()
+        self._readers: Optional[ThreadPoolExecutor] = None
+        self._writer: Optional[ThreadPoolExecutor] = None
+
+    def _executors(self):
+        with self._lock:
+            if self._readers is None:
+                self._readers = ThreadPoolExecutor(max_workers=self.read_workers, thread_name_prefix="db-read")
+                self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-write")
+            return self._readers, self._writer
+
+    async def read(self, func: Callable[..., T], *args, **kwargs) -> T:
+        """
+        Ejecuta una función bloqueante en un hilo de lectura y espera su resultado
+        sin bloquear el bucle de eventos.
+        """
+        readers, _ = self._executors()
+        return await asyncio.get_running_loop().run_in_executor(readers, functools.partial(func, *args, **kwargs))
+
+    async def write(self, func: Callable[..., T], *args, **kwargs) -> T:
+        """
+        Ejecuta una función bloqueante en el hilo de escritura, después de las
+        escrituras encoladas antes, y espera su resultado sin bloquear el bucle de eventos.
+        """
+        return await asyncio.wrap_future(self.submit_write(func, *args, **kwargs))
+
+    def submit_read(self, func: Callable[..., T], *args, **kwargs) -> 'Future[T]':
+        """
+        Encola una función en un hilo de lectura sin esperar a que termine.
+
+        Returns:
+            Future con el resultado de la función.
+        """
+        readers, _ = self._executors()
+        return readers.submit(func, *args, **kwargs)
+
+    def submit_write(self, func: Callable[..., T], *args, **kwargs) -> 'Future[T]':
+        """
+        Encola una función en el hilo de escritura sin esperar a que termine.
+
+        Returns:
+            Future con el resultado de la función.
+        """
+        _, writer = self._executors()
+        return writer.submit(func, *args, **kwargs)
+
+    def shutdown(self, wait: bool = True):
+        """
+        Detiene los hilos, esperando (por defecto) a que terminen las tareas encoladas.
+        """
+        with self._lock:
+            executors = (self._readers, self._writer)
+            self._readers = self._writer = None
+        for executor in executors:
+            if executor is not None:
+                executor.shutdown(wait=wait)
+
+class AsyncDatabase:
+    """
+    Versión asíncrona de DatabaseManager: cada operación se ejecuta en el
+    carril que le corresponde (lectura o escritura) de un DatabaseLanes.
+    """
+
+    def __init__(self, db_manager: DatabaseManager, lanes: DatabaseLanes):
+        """
+        Inicializa el acceso asíncrono.
+
+        Args:
+            db_manager: Gestor de base de datos que ejecuta las operaciones.
+            lanes: Carriles de lectura y escritura.
+        """
+        self.db_manager = db_manager
+        self.lanes = lanes
+
+    async def read(self, func: Callable[..., T], *args, **kwargs) -> T:
+        """
+        Ejecuta en el carril de lectura una función bloqueante que solo lee.
+        """
+        return await self.lanes.read(func, *args, **kwargs)
+
+    async def write(self, func: Callable[..., T], *args, **kwargs) -> T:
+        """
+        Ejecuta en el carril de escritura una función bloqueante que escribe
+        (por ejemplo, una carga completa con insert_with_quarantine).
+        """
+        return await self.lanes.write(func, *args, **kwargs)
+
+    def write_blocking(self, func: Callable[..., T], *args, **kwargs) -> T:
+        """
+        Ejecuta una función en el carril de escritura y espera su resultado
+        bloqueando el hilo que llama, que no debe ser el del bucle de eventos
+        ni el de escritura. Permite que una carga lea su entrada (por ejemplo,
+        el cuerpo de una petición) en un hilo de trabajo y ocupe el carril de
+        escritura solo con cada inserción.
+        """
+        return self.lanes.submit_write(func, *args, **kwargs).result()
+
+    async def execute_query(self, query: str, params=None):
+        """
+        Ejecuta una consulta de lectura en una conexión de solo lectura (ver
+        DatabaseManager.execute_read).
+        """
+        return await self.lanes.read(self.db_manager.execute_read, query, params)
+
+    async def stream_read(self, query: str, params=None, chunk_size: int = DEFAULT_FETCH_SIZE,
+                          archive_years: Optional[Iterable[int]] = None) -> AsyncIterator[List[Tuple]]:
+        """
+        Recorre el resultado de una consulta de solo lectura por bloques de
+        chunk_size filas (ver DatabaseManager.iter_read). Cada bloque se lee en
+        un hilo de lectura cuando se pide, de modo que un consumidor lento (por
+        ejemplo, un cliente que descarga una exportación) no acumula filas en memoria.
+
+        Yields:
+            Listas de filas.
+        """
+        chunks = self.db_manager.iter_read(query, params, chunk_size, archive_years)
+        try:
+            while True:
+                rows = await self.lanes.read(next, chunks, None)
+                if rows is None:
+                    return
+                yield rows
+        finally:
+            # Si el recorrido se abandona antes del final, la conexión se
+            # devuelve al pool desde un hilo de lectura, sin esperar
+            self.lanes.submit_read(chunks.close)
+
+    async def execute_write(self, query: str, params=None):
+        """
+        Ejecuta una sentencia que modifica la base de datos en el carril de escritura.
+        """
+        return await self.lanes.write(self.db_manager.execute_query, query, params)
+
+    async def insert_batch(self, table_name: str, data: Batch, before_commit=None,
+                           upsert: bool = False) -> int:
+        """
+        Inserta un lote en el carril de escritura (ver DatabaseManager.insert_batch).
+        """
+        return await self.lanes.write(self.db_manager.insert_batch, table_name, data, before_commit, upsert)
+
+    async def insert_bundle(self, batches_by_table: Mapping[str, Iterable[Batch]]) -> Dict[str, int]:
+        """
+        Inserta lotes de varias tablas en el carril de escritura (ver DatabaseManager.insert_bundle).
+        """
+        return await self.lanes.write(self.db_manager.insert_bundle, batches_by_table)
@@ -0,0 +1,216 @@
+"""
+Pool de conexiones SQLite reutilizables
+"""
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+
+# Número de conexiones inactivas que conserva el pool por defecto
+DEFAULT_POOL_SIZE = 8
+
+# PRAGMAs que se aplican una sola vez, al abrir cada conexión
+DEFAULT_PRAGMAS = {
+    # Con WAL las lecturas no esperan a las escrituras ni las bloquean. Es
+    # persistente: basta con que lo aplique una conexión, y repetirlo no tiene efecto
+    'journal_mode': 'WAL',
+    # Esperar a que otra conexión libere el bloqueo en lugar de fallar al instante
+    'busy_timeout': 5000,
+    # Caché de páginas de 16 MB por conexión, que se conserva entre peticiones
+    'cache_size': -16000,
+    'temp_store': 'MEMORY',
+}
+
+# PRAGMAs de las conexiones de solo lectura de las consultas analíticas
+READ_ONLY_PRAGMAS = {
+    # Rechazar cualquier escritura, también las que el modo de apertura no impide
+    # (como las tablas temporales)
+    'query_only': 'ON',
+    'busy_timeout': 5000,
+    'cache_size': -16000,
+    'temp_store': 'MEMORY',
+    # Leer las páginas directamente del archivo mapeado en memoria (hasta 256 MB),
+    # sin copiarlas a la caché de la conexión
+    'mmap_size': 256 * 1024 * 1024,
+}
+
+class ConnectionPool:
+    """
+    Conjunto de conexiones SQLite abiertas que se reutilizan entre operaciones.
+
+    Cada conexión la usa un único hilo a la vez: se toma del pool al empezar
+    una operación y se devuelve al terminarla, de modo que las peticiones
+    atendidas en distintos hilos nunca comparten conexión. Las conexiones se
+    abren con los PRAGMAs del pool, una sola vez, y conservan el esquema ya
+    analizado y su caché de páginas. Antes de entregar una conexión
+    reutilizada se comprueba que siga respondiendo y que el archivo de la base
+    de datos no se haya sustituido; si no, se cierra y se abre otra.
+
+    Con read_only=True las conexiones se abren en modo de solo lectura
+    (mode=ro) y no pueden modificar la base de datos.
+    """
+
+    def __init__(self, db_path: str, size: int = DEFAULT_POOL_SIZE,
+                 pragmas: Optional[Mapping[str, Any]] = None, read_only: bool = False):
+        """
+        Inicializa el pool. Las conexiones se abren a medida que se necesitan.
+
+        Args:
+            db_path: Ruta al archivo de base de datos SQLite.
+            size: Número máximo de conexiones inactivas que se conservan. Si hay
+                  más operaciones simultáneas se abren conexiones adicionales,
+                  que se cierran al devolverlas.
+            pragmas: PRAGMAs de cada conexión (por defecto, DEFAULT_PRAGMAS, o
+                     READ_ONLY_PRAGMAS si read_only es True).
+            read_only: Si es True, abre las conexiones en modo de solo lectura.
+        """
+        if size < 0:
+            raise ValueError("El tamaño del pool no puede ser negativo")
+
+        self.db_path = db_path
+        self.size = size
+        self.read_only = read_only
+        if pragmas is None:
+            pragmas = READ_ONLY_PRAGMAS if read_only else DEFAULT_PRAGMAS
+        self.pragmas: Dict[str, Any] = dict(pragmas)
+        self._idle: List[Tuple[sqlite3.Connection, Optional[Tuple[int, int]]]] = []
+        self._file_ids: Dict[int, Optional[Tuple[int, int]]] = {}
+        self._changes: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+        # Número de usos de una conexión que modificaron filas (ver release)
+        self.writes = 0
+
+    def _file_id(self) -> Optional[Tuple[int, int]]:
+        """
+        Identifica el archivo de la base de datos (dispositivo e inodo), o None
+        si no existe todavía.
+        """
+        try:
+            stat = os.stat(self.db_path)
+        except OSError:
+            return None
+        return stat.st_dev, stat.st_ino
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Abre una conexión nueva y le aplica los PRAGMAs del pool.
+        """
+        # La conexión puede pasar de un hilo a otro entre dos usos, nunca durante uno
+        if self.read_only:
+            uri = f"{Path(os.path.abspath(self.db_path)).as_uri()}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        with self._lock:
+            self._file_ids[id(conn)] = self._file_id()
+            self.connections_opened += 1
+        return conn
+
+    def _discard(self, conn: sqlite3.Connection):
+        """
+        Cierra una conexión que no vuelve al pool.
+        """
+        with self._lock:
+            self._file_ids.pop(id(conn), None)
+            self._changes.pop(id(conn), None)
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def _is_healthy(self, conn: sqlite3.Connection, file_id: Optional[Tuple[int, int]]) -> bool:
+        """
+        Comprueba que una conexión inactiva siga siendo utilizable.
+        """
+        if file_id != self._file_id():
+            return False
+        try:
+            conn.execute("SELECT 1").fetchone()
+        except sqlite3.Error:
+            return False
+        return True
+
+    def acquire(self) -> sqlite3.Connection:
+        """
+        Toma una conexión del pool, o abre una nueva si no hay ninguna inactiva.
+
+        Returns:
+            Conexión para uso exclusivo del llamador hasta que la devuelva con release.
+        """
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                # La última conexión devuelta es la que tiene la caché más reciente
+                conn, file_id = self._idle.pop()
+            if self._is_healthy(conn, file_id):
+                return self._checkout(conn)
+            self._discard(conn)
+        return self._checkout(self._connect())
+
+    def _checkout(self, conn: sqlite3.Connection) -> sqlite3.Connection:
+        """
+        Anota cuántas filas llevaba modificadas la conexión al entregarla.
+        """
+        with self._lock:
+            self._changes[id(conn)] = conn.total_changes
+        return conn
+
+    def release(self, conn: sqlite3.Connection):
+        """
+        Devuelve una conexión al pool. Si quedó una transacción abierta se
+        deshace; si el pool ya tiene size conexiones inactivas, se cierra.
+        Si durante el uso se modificaron filas, incrementa writes.
+
+        Args:
+            conn: Conexión obtenida con acquire.
+        """
+        with self._lock:
+            if conn.total_changes != self._changes.get(id(conn), conn.total_changes):
+                self.writes += 1
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append((conn, self._file_ids.get(id(conn))))
+                return
+        self._discard(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """
+        Toma una conexión del pool durante el bloque with y la devuelve al salir.
+        """
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def idle_count(self) -> int:
+        """
+        Número de conexiones inactivas en el pool.
+        """
+        with self._lock:
+            return len(self._idle)
+
+    def close(self):
+        """
+        Cierra las conexiones inactivas. El pool sigue siendo utilizable: las
+        conexiones que se devuelvan después o se pidan de nuevo se gestionan
+        como de costumbre.
+        """
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._discard(conn)
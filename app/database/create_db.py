@@ -1,11 +1,408 @@
 import sqlite3
 import os
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Tuple
+
+# Definición de las tablas, en orden de creación (las tablas referenciadas primero)
+TABLE_DDL = {
+    'departments': '''
+    CREATE TABLE departments (
+        id INTEGER PRIMARY KEY,
+        department VARCHAR(100) NOT NULL
+    )
+    ''',
+    'jobs': '''
+    CREATE TABLE jobs (
+        id INTEGER PRIMARY KEY,
+        job VARCHAR(100) NOT NULL
+    )
+    ''',
+    'hired_employees': '''
+    CREATE TABLE hired_employees (
+        id INTEGER PRIMARY KEY,
+        name VARCHAR(100) NOT NULL,
+        datetime TIMESTAMP NOT NULL,
+        department_id INTEGER,
+        job_id INTEGER,
+        hire_epoch INTEGER,
+        hire_year INTEGER,
+        hire_quarter INTEGER,
+        FOREIGN KEY (department_id) REFERENCES departments(id),
+        FOREIGN KEY (job_id) REFERENCES jobs(id)
+    )
+    ''',
+}
+
+class DerivedColumn(NamedTuple):
+    """
+    Columna que no viene en los datos de origen: se calcula al insertar a
+    partir de otra columna de la misma fila.
+    """
+    name: str
+    source: str
+    # Expresión SQL con {} en el lugar del valor de la columna de origen
+    expression: str
+
+    def sql(self, value: str) -> str:
+        """
+        Expresión SQL de la columna para el valor indicado (un nombre de columna
+        o un parámetro de la sentencia).
+        """
+        return self.expression.format(value)
+
+# Columnas derivadas de cada tabla. La fecha de contratación se guarda además
+# como instante Unix, año y trimestre, para que las consultas analíticas
+# filtren y agrupen con índices en lugar de llamar a strftime en cada fila
+DERIVED_COLUMNS = {
+    'hired_employees': (
+        DerivedColumn('hire_epoch', 'datetime', "CAST(strftime('%s', {}) AS INTEGER)"),
+        DerivedColumn('hire_year', 'datetime', "CAST(strftime('%Y', {}) AS INTEGER)"),
+        DerivedColumn('hire_quarter', 'datetime', "(CAST(strftime('%m', {}) AS INTEGER) + 2) / 3"),
+    ),
+}
+
+# Índices secundarios de cada tabla. hired_employees no tiene ninguno: los
+# informes de /sql leen el resumen HIRE_SUMMARY_TABLE, con su propio índice
+TABLE_INDEXES: Dict[str, List[str]] = {}
+
+# Años de hired_employees trasladados a archivos de base de datos aparte (ver
+# DatabaseManager.archive_year). file_name es relativo al directorio de la
+# base de datos principal
+ARCHIVES_DDL = '''
+CREATE TABLE IF NOT EXISTS hired_employees_archives (
+    year INTEGER PRIMARY KEY,
+    file_name TEXT NOT NULL,
+    records INTEGER NOT NULL,
+    archived_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+)
+'''
+
+# id de las filas de hired_employees que están en los archivos, con su año.
+# Ya no están en la tabla principal, por lo que su clave primaria no impide
+# que se vuelvan a insertar: DatabaseManager comprueba los lotes contra este
+# registro
+ARCHIVED_IDS_DDL = '''
+CREATE TABLE IF NOT EXISTS hired_employees_archived_ids (
+    id INTEGER PRIMARY KEY,
+    year INTEGER NOT NULL
+)
+'''
+
+# Tablas de seguimiento de las cargas: filas descartadas (ver
+# app.database.quarantine), huellas de los archivos cargados en modo upsert
+# (app.database.fingerprints) y trabajos de importación con sus puntos de
+# control (app.database.import_jobs)
+LOAD_TRACKING_DDL = [
+    '''
+    CREATE TABLE IF NOT EXISTS rejected_rows (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        load_id TEXT NOT NULL,
+        table_name TEXT NOT NULL,
+        line_number INTEGER NOT NULL,
+        raw_row TEXT NOT NULL,
+        errors TEXT NOT NULL,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE INDEX IF NOT EXISTS idx_rejected_rows_load ON rejected_rows (load_id, line_number)
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS table_fingerprints (
+        table_name TEXT PRIMARY KEY,
+        fingerprint TEXT NOT NULL,
+        records INTEGER NOT NULL,
+        loaded_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS import_jobs (
+        job_id TEXT PRIMARY KEY,
+        table_name TEXT NOT NULL,
+        file_path TEXT NOT NULL,
+        byte_offset INTEGER NOT NULL DEFAULT 0,
+        rows_inserted INTEGER NOT NULL DEFAULT 0,
+        last_id INTEGER,
+        status TEXT NOT NULL,
+        error TEXT,
+        updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+]
+
+# Mes de contratación. No se guarda en hired_employees: solo lo usa el
+# resumen, que lo calcula al actualizarse
+HIRE_MONTH = DerivedColumn('hire_month', 'datetime', "CAST(strftime('%m', {}) AS INTEGER)")
+
+# Resumen de hired_employees para las consultas analíticas: contrataciones
+# por año, departamento, trabajo y mes (el trimestre se obtiene del mes),
+# incluidos los años archivados. Los disparadores lo actualizan en la misma
+# transacción que cada INSERT, UPDATE (también los de upsert) o DELETE.
+# archive_year desactiva el de DELETE para trasladar filas sin cambiar los
+# totales, y truncate lo desactiva y vacía el resumen de una vez (ver
+# DatabaseManager).
+HIRE_SUMMARY_TABLE = 'hired_employees_summary'
+
+HIRE_SUMMARY_DDL = [
+    f'''
+    CREATE TABLE IF NOT EXISTS {HIRE_SUMMARY_TABLE} (
+        hire_year INTEGER NOT NULL,
+        department_id INTEGER,
+        job_id INTEGER,
+        hire_month INTEGER NOT NULL,
+        hired INTEGER NOT NULL
+    )
+    ''',
+    f'''
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_hired_summary_key
+    ON {HIRE_SUMMARY_TABLE} (hire_year, department_id, job_id, hire_month)
+    ''',
+]
+
+def _summary_group(row: str) -> str:
+    """
+    Condición que selecciona en el resumen el grupo de una fila de
+    hired_employees (NEW u OLD en un disparador).
+    """
+    return (f"hire_year = {row}.hire_year AND department_id IS {row}.department_id "
+            f"AND job_id IS {row}.job_id AND hire_month = {HIRE_MONTH.sql(f'{row}.datetime')}")
+
+# Disparador que descuenta del resumen las filas eliminadas
+HIRE_SUMMARY_DELETE_TRIGGER = 'hired_employees_summary_delete'
+
+# Disparadores que mantienen el resumen. department_id y job_id admiten NULL,
+# que no cuenta como conflicto en un índice UNIQUE: en lugar de un upsert, se
+# actualiza el grupo con IS y se inserta solo si no existía (changes() = 0)
+HIRE_SUMMARY_TRIGGERS = [
+    f'''
+    CREATE TRIGGER IF NOT EXISTS hired_employees_summary_insert
+    AFTER INSERT ON hired_employees
+    WHEN NEW.hire_year IS NOT NULL
+    BEGIN
+        UPDATE {HIRE_SUMMARY_TABLE} SET hired = hired + 1
+        WHERE {_summary_group('NEW')};
+        INSERT INTO {HIRE_SUMMARY_TABLE} (hire_year, department_id, job_id, hire_month, hired)
+        SELECT NEW.hire_year, NEW.department_id, NEW.job_id, {HIRE_MONTH.sql('NEW.datetime')}, 1
+        WHERE changes() = 0;
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS hired_employees_summary_update
+    AFTER UPDATE OF datetime, hire_year, department_id, job_id ON hired_employees
+    WHEN (OLD.hire_year, OLD.department_id, OLD.job_id, OLD.datetime)
+        IS NOT (NEW.hire_year, NEW.department_id, NEW.job_id, NEW.datetime)
+    BEGIN
+        UPDATE {HIRE_SUMMARY_TABLE} SET hired = hired - 1
+        WHERE {_summary_group('OLD')};
+        DELETE FROM {HIRE_SUMMARY_TABLE}
+        WHERE hired = 0 AND {_summary_group('OLD')};
+        UPDATE {HIRE_SUMMARY_TABLE} SET hired = hired + 1
+        WHERE {_summary_group('NEW')};
+        INSERT INTO {HIRE_SUMMARY_TABLE} (hire_year, department_id, job_id, hire_month, hired)
+        SELECT NEW.hire_year, NEW.department_id, NEW.job_id, {HIRE_MONTH.sql('NEW.datetime')}, 1
+        WHERE changes() = 0 AND NEW.hire_year IS NOT NULL;
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS {HIRE_SUMMARY_DELETE_TRIGGER}
+    AFTER DELETE ON hired_employees
+    WHEN OLD.hire_year IS NOT NULL
+    BEGIN
+        UPDATE {HIRE_SUMMARY_TABLE} SET hired = hired - 1
+        WHERE {_summary_group('OLD')};
+        DELETE FROM {HIRE_SUMMARY_TABLE}
+        WHERE hired = 0 AND {_summary_group('OLD')};
+    END
+    ''',
+]
+
+# Recuento de hired_employees por grupo del resumen
+HIRE_SUMMARY_COUNTS = f'''
+SELECT hire_year, department_id, job_id, {HIRE_MONTH.sql('datetime')} AS hire_month, COUNT(*)
+FROM {{source}}
+WHERE hire_year IS NOT NULL
+GROUP BY hire_year, department_id, job_id, hire_month
+'''
+
+def _read_archives(cursor: sqlite3.Cursor, query: str) -> Iterator[Tuple[int, Tuple[Any, ...]]]:
+    """
+    Ejecuta una consulta en el archivo de cada año archivado de hired_employees.
+    
+    Los archivos no cambian una vez escritos: se leen en conexiones aparte,
+    ya que ATTACH no se admite dentro de una transacción.
+    
+    Args:
+        cursor: Cursor de la base de datos principal.
+        query: Consulta sobre la tabla hired_employees del archivo.
+        
+    Yields:
+        Tuplas (año, fila) con las filas de cada archivo.
+    """
+    main_path = next(path for _, name, path in cursor.execute("PRAGMA database_list") if name == 'main')
+    directory = os.path.dirname(main_path)
+    archives = cursor.execute("SELECT year, file_name FROM hired_employees_archives ORDER BY year").fetchall()
+    for year, file_name in archives:
+        uri = f"{Path(os.path.join(directory, file_name)).as_uri()}?mode=ro"
+        archive = sqlite3.connect(uri, uri=True)
+        try:
+            for row in archive.execute(query):
+                yield year, row
+        finally:
+            archive.close()
+
+def refresh_hire_summary(cursor: sqlite3.Cursor) -> int:
+    """
+    Recalcula hired_employees_summary a partir de hired_employees y de los
+    archivos de los años archivados, en la transacción del cursor.
+    
+    Args:
+        cursor: Cursor de la base de datos principal.
+        
+    Returns:
+        Número de grupos del resumen.
+    """
+    counts = Counter()
+    for *key, hired in cursor.execute(HIRE_SUMMARY_COUNTS.format(source='main.hired_employees')):
+        counts[tuple(key)] += hired
+    for _, (*key, hired) in _read_archives(cursor, HIRE_SUMMARY_COUNTS.format(source='hired_employees')):
+        counts[tuple(key)] += hired
+    
+    cursor.execute(f"DELETE FROM {HIRE_SUMMARY_TABLE}")
+    cursor.executemany(
+        f"INSERT INTO {HIRE_SUMMARY_TABLE} (hire_year, department_id, job_id, hire_month, hired) "
+        f"VALUES (?, ?, ?, ?, ?)",
+        [key + (hired,) for key, hired in counts.items()]
+    )
+    return len(counts)
+
+def _add_hire_date_columns(cursor: sqlite3.Cursor):
+    """
+    Añade a hired_employees las columnas derivadas de la fecha de contratación,
+    las calcula para las filas existentes y crea sus índices.
+    """
+    existing = {row[1] for row in cursor.execute("PRAGMA table_info(hired_employees)")}
+    derived = DERIVED_COLUMNS['hired_employees']
+    for column in derived:
+        if column.name not in existing:
+            cursor.execute(f"ALTER TABLE hired_employees ADD COLUMN {column.name} INTEGER")
+    assignments = ', '.join(f"{column.name} = {column.sql(column.source)}" for column in derived)
+    cursor.execute(f"UPDATE hired_employees SET {assignments}")
+    for ddl in TABLE_INDEXES.get('hired_employees', ()):
+        cursor.execute(ddl)
+
+def _add_archives_registry(cursor: sqlite3.Cursor):
+    """
+    Crea el registro de los años de hired_employees archivados.
+    """
+    cursor.execute(ARCHIVES_DDL)
+
+def _add_hire_summary(cursor: sqlite3.Cursor):
+    """
+    Crea el resumen de hired_employees con sus disparadores y lo calcula con
+    las filas existentes.
+    """
+    for ddl in HIRE_SUMMARY_DDL + HIRE_SUMMARY_TRIGGERS:
+        cursor.execute(ddl)
+    refresh_hire_summary(cursor)
+
+def _recreate_hire_summary(cursor: sqlite3.Cursor):
+    """
+    Sustituye el resumen de hired_employees por trimestre por el resumen por mes.
+    """
+    cursor.execute("DROP TRIGGER IF EXISTS hired_employees_summary_insert")
+    cursor.execute("DROP TRIGGER IF EXISTS hired_employees_summary_update")
+    cursor.execute(f"DROP TRIGGER IF EXISTS {HIRE_SUMMARY_DELETE_TRIGGER}")
+    cursor.execute(f"DROP TABLE IF EXISTS {HIRE_SUMMARY_TABLE}")
+    _add_hire_summary(cursor)
+
+def _add_hire_summary_delete_trigger(cursor: sqlite3.Cursor):
+    """
+    Crea el disparador que descuenta del resumen las filas eliminadas y
+    recalcula el resumen, por si se eliminaron filas antes de existir.
+    """
+    for ddl in HIRE_SUMMARY_TRIGGERS:
+        cursor.execute(ddl)
+    refresh_hire_summary(cursor)
+
+def _add_archived_ids_registry(cursor: sqlite3.Cursor):
+    """
+    Crea el registro de los id archivados de hired_employees y lo llena con
+    los id de los archivos existentes.
+    """
+    cursor.execute(ARCHIVED_IDS_DDL)
+    archived = [(row[0], year) for year, row in _read_archives(cursor, "SELECT id FROM hired_employees")]
+    cursor.executemany("INSERT OR REPLACE INTO hired_employees_archived_ids (id, year) VALUES (?, ?)", archived)
+
+def _drop_hire_year_index(cursor: sqlite3.Cursor):
+    """
+    Elimina el índice de hired_employees por año, departamento, trabajo y
+    trimestre, que ya no usa ninguna consulta.
+    """
+    cursor.execute("DROP INDEX IF EXISTS idx_hired_year_department_job_quarter")
+
+def _add_load_tracking_tables(cursor: sqlite3.Cursor):
+    """
+    Crea las tablas de seguimiento de las cargas, que hasta ahora creaban sus
+    almacenes al instanciarse (en las bases de datos que ya las tienen, no
+    cambia nada).
+    """
+    for ddl in LOAD_TRACKING_DDL:
+        cursor.execute(ddl)
+
+# Migraciones de las bases de datos existentes: MIGRATIONS[i] lleva el esquema
+# de la versión i a la i + 1. La versión se guarda en PRAGMA user_version
+MIGRATIONS: List[Callable[[sqlite3.Cursor], None]] = [
+    _add_hire_date_columns,
+    _add_archives_registry,
+    _add_hire_summary,
+    _recreate_hire_summary,
+    _add_hire_summary_delete_trigger,
+    _add_archived_ids_registry,
+    _drop_hire_year_index,
+    _add_load_tracking_tables,
+]
+
+# Versión del esquema que crea create_database
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def migrate_database(db_path: str) -> int:
+    """
+    Actualiza una base de datos existente a la versión actual del esquema,
+    aplicando las migraciones pendientes en una sola transacción.
+
+    Args:
+        db_path: Ruta al archivo de base de datos.
+
+    Returns:
+        Número de migraciones aplicadas.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        # La versión se lee con el bloqueo de escritura tomado, por si otro
+        # proceso está migrando la misma base de datos
+        cursor.execute("BEGIN IMMEDIATE")
+        version = cursor.execute("PRAGMA user_version").fetchone()[0]
+        pending = MIGRATIONS[version:]
+        for migration in pending:
+            migration(cursor)
+        if pending:
+            cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.commit()
+        return len(pending)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
 
 def create_database(db_path=None):
     """
     Crea la base de datos SQLite con las tablas necesarias para la migración de datos.
-    Si la base de datos ya existe, la función no hace nada.
-
+    Si la base de datos ya existe, le aplica las migraciones pendientes (ver
+    migrate_database).
+    
     Args:
         db_path: Ruta opcional para el archivo de base de datos. Si es None,
                 se usa la ruta predeterminada.
@@ -20,39 +417,26 @@ def create_database(db_path=None):
     
     # Verificar si la base de datos ya existe
     if os.path.exists(db_path):
-        print(f"La base de datos ya existe en: {db_path}")
+        if migrate_database(db_path):
+            print(f"Base de datos migrada a la versión {SCHEMA_VERSION} en: {db_path}")
+        else:
+            print(f"La base de datos ya existe en: {db_path}")
         return db_path
     
     # Crear la conexión a la base de datos
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
     
-    # Crear las tablas
-    cursor.execute('''
-    CREATE TABLE departments (
-        id INTEGER PRIMARY KEY,
-        department VARCHAR(100) NOT NULL
-    )
-    ''')
-    
-    cursor.execute('''
-    CREATE TABLE jobs (
-        id INTEGER PRIMARY KEY,
-        job VARCHAR(100) NOT NULL
-    )
-    ''')
-    
-    cursor.execute('''
-    CREATE TABLE hired_employees (
-        id INTEGER PRIMARY KEY,
-        name VARCHAR(100) NOT NULL,
-        datetime TIMESTAMP NOT NULL,
-        department_id INTEGER,
-        job_id INTEGER,
-        FOREIGN KEY (department_id) REFERENCES departments(id),
-        FOREIGN KEY (job_id) REFERENCES jobs(id)
-    )
-    ''')
+    # Crear las tablas y sus índices
+    for table_name, ddl in TABLE_DDL.items():
+        cursor.execute(ddl)
+        for index_ddl in TABLE_INDEXES.get(table_name, ()):
+            cursor.execute(index_ddl)
+    cursor.execute(ARCHIVES_DDL)
+    cursor.execute(ARCHIVED_IDS_DDL)
+    for ddl in HIRE_SUMMARY_DDL + HIRE_SUMMARY_TRIGGERS + LOAD_TRACKING_DDL:
+        cursor.execute(ddl)
+    cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
     
     # Guardar los cambios y cerrar la conexión
     conn.commit()
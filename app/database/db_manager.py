@@ -3,84 +3,596 @@ Módulo para manejar las operaciones de base de datos
 """
 import sqlite3
 import os
-from typing import List, Dict, Any, Tuple
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Dict, Any, Tuple, Iterable, Iterator, Mapping, Union, Optional, Callable
+
+from app.database.connection_pool import DEFAULT_POOL_SIZE, ConnectionPool
+from app.database.create_db import (
+    HIRE_SUMMARY_DELETE_TRIGGER, HIRE_SUMMARY_TABLE, TABLE_DDL, TABLE_INDEXES, refresh_hire_summary
+)
+from app.database.schema import SCHEMAS
+from app.utils.column_batch import ColumnBatch
+from app.utils.row_validation import raise_on_rejected
+
+# Un lote puede ser una lista de diccionarios o un lote columnar
+Batch = Union[List[Dict[str, Any]], ColumnBatch]
+
+# Valores de synchronous admitidos en una sesión de carga masiva
+BULK_LOAD_SYNCHRONOUS = ('OFF', 'NORMAL')
+
+# Caché de páginas de una sesión de carga masiva, en KiB
+BULK_LOAD_CACHE_KIB = 256 * 1024
+
+# PRAGMAs de la conexión que modifica una sesión de carga masiva y que se restauran al terminar
+_SESSION_PRAGMAS = ('synchronous', 'cache_size', 'temp_store', 'foreign_keys')
+
+# Filas que se leen de cada vez al recorrer un resultado con iter_read
+DEFAULT_FETCH_SIZE = 1000
+
+# Prefijo con que se adjuntan los archivos de los años archivados de hired_employees
+ARCHIVE_SCHEMA_PREFIX = 'archive_'
+
+# id de un lote que se buscan de cada vez en el registro de id archivados
+# (por debajo del límite de parámetros de SQLite)
+ARCHIVED_ID_LOOKUP_SIZE = 500
+
+# Número máximo de años archivados: la vista HISTORY_VIEW adjunta todos los
+# archivos a la conexión, y SQLite admite por defecto 10 bases de datos adjuntas
+MAX_ARCHIVES = 10
+
+# Vista temporal con todo el historial de hired_employees: la tabla principal
+# y los archivos adjuntos
+HISTORY_VIEW = 'hired_employees_history'
+
+class BulkLoadSession:
+    """
+    Sesión de carga masiva abierta con DatabaseManager.bulk_load: todos los
+    lotes se insertan en una única transacción, que se confirma al cerrar la sesión.
+    """
+    
+    def __init__(self, db_manager: 'DatabaseManager', cursor: sqlite3.Cursor):
+        self.db_manager = db_manager
+        self.cursor = cursor
+        self.records_inserted = 0
+        self.batches = 0
+    
+    def insert(self, table_name: str, data: Batch,
+               before_commit: Optional[Callable[[sqlite3.Cursor], None]] = None,
+               upsert: bool = False) -> int:
+        """
+        Inserta un lote en la transacción de la sesión, sin confirmarla.
+        
+        Args:
+            table_name: Nombre de la tabla donde insertar los datos.
+            data: Lista de diccionarios o lote columnar con los datos a insertar.
+            before_commit: Función opcional que recibe el cursor y se ejecuta
+                           después del lote, en la misma transacción (como en
+                           DatabaseManager.insert_batch).
+            upsert: Si es True, actualiza los registros existentes que hayan cambiado.
+            
+        Returns:
+            Número de registros insertados (con upsert, insertados o actualizados).
+        """
+        inserted = self.db_manager._insert_rows(self.cursor, table_name, data, upsert)
+        if before_commit is not None:
+            before_commit(self.cursor)
+        self.records_inserted += inserted
+        self.batches += 1
+        return inserted
+    
+    def insert_batches(self, table_name: str, batches: Iterable[Batch],
+                       upsert: bool = False) -> Tuple[int, int]:
+        """
+        Inserta una secuencia de lotes en la transacción de la sesión. Un lote
+        columnar con filas no válidas lanza RowValidationError.
+        
+        Returns:
+            Tupla con el número total de registros insertados y el número de lotes.
+        """
+        total_inserted = 0
+        batch_count = 0
+        for batch in _checked(batches):
+            total_inserted += self.insert(table_name, batch, upsert=upsert)
+            batch_count += 1
+        return total_inserted, batch_count
 
 class DatabaseManager:
-    def __init__(self, db_path=None):
+    def __init__(self, db_path=None, pool_size: int = DEFAULT_POOL_SIZE,
+                 pragmas: Optional[Mapping[str, Any]] = None):
         """
         Inicializa el gestor de base de datos.
         
         Args:
             db_path: Ruta al archivo de base de datos SQLite. Si es None, 
                     se usa la ruta predeterminada.
+            pool_size: Número de conexiones inactivas que se conservan para
+                       reutilizarlas (ver ConnectionPool).
+            pragmas: PRAGMAs de cada conexión (por defecto, DEFAULT_PRAGMAS).
+                     Las conexiones de solo lectura de execute_read y snapshot
+                     usan READ_ONLY_PRAGMAS.
         """
         if db_path is None:
             db_dir = os.path.dirname(os.path.abspath(__file__))
             self.db_path = os.path.join(db_dir, 'migration.db')
         else:
             self.db_path = db_path
+        self.pool = ConnectionPool(self.db_path, pool_size, pragmas)
+        self.read_pool = ConnectionPool(self.db_path, pool_size, read_only=True)
+        # Conexión dedicada a PRAGMA data_version (ver data_version)
+        self._version_pool = ConnectionPool(self.db_path, 1, read_only=True)
+        self._version_lock = threading.Lock()
     
     def get_connection(self) -> Tuple[sqlite3.Connection, sqlite3.Cursor]:
         """
-        Obtiene una conexión a la base de datos.
+        Obtiene una conexión del pool. Debe devolverse con close_connection.
         
         Returns:
             Tupla con la conexión y el cursor.
         """
-        conn = sqlite3.connect(self.db_path)
+        conn = self.pool.acquire()
         cursor = conn.cursor()
         return conn, cursor
     
     def close_connection(self, conn: sqlite3.Connection):
         """
-        Cierra una conexión a la base de datos.
+        Devuelve una conexión al pool.
         
         Args:
-            conn: Conexión a cerrar.
+            conn: Conexión obtenida con get_connection.
         """
         if conn:
-            conn.close()
+            self.pool.release(conn)
+    
+    @property
+    def write_version(self) -> int:
+        """
+        Número que aumenta cada vez que una operación de este gestor modifica
+        filas de la base de datos. Sirve para saber si una copia de los datos
+        (como la réplica analítica) ha quedado desactualizada.
+        """
+        return self.pool.writes
     
-    def insert_batch(self, table_name: str, data: List[Dict[str, Any]]) -> int:
+    def data_version(self) -> Tuple[int, int]:
+        """
+        Versión de los datos: cambia cada vez que se confirma una escritura,
+        tanto de este gestor (write_version) como de otro proceso o conexión
+        (PRAGMA data_version de una conexión dedicada que nunca escribe).
+        
+        PRAGMA data_version solo consulta la cabecera del WAL en memoria
+        compartida, sin leer páginas. Su valor es propio de cada conexión: si
+        la conexión dedicada se sustituye (por ejemplo, porque el archivo de la
+        base de datos ha cambiado), la versión cambia aunque no haya habido escrituras.
+        """
+        with self._version_lock:
+            with self._version_pool.connection() as conn:
+                data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        return self.write_version, data_version
+    
+    def close(self):
+        """
+        Cierra las conexiones inactivas de los pools.
+        """
+        self.pool.close()
+        self.read_pool.close()
+        self._version_pool.close()
+    
+    def insert_batch(self, table_name: str, data: Batch,
+                     before_commit: Optional[Callable[[sqlite3.Cursor], None]] = None,
+                     upsert: bool = False) -> int:
         """
         Inserta un lote de registros en la tabla especificada.
         
         Args:
             table_name: Nombre de la tabla donde insertar los datos.
-            data: Lista de diccionarios con los datos a insertar.
+            data: Lista de diccionarios o lote columnar con los datos a insertar.
+            before_commit: Función opcional que recibe el cursor y se ejecuta en la
+                           misma transacción, justo antes del commit (por ejemplo,
+                           para guardar un punto de control de la importación).
+                           Se ejecuta aunque el lote esté vacío.
+            upsert: Si es True, los registros cuya clave primaria ya existe se
+                    actualizan en lugar de provocar un error, y solo si algún
+                    valor ha cambiado.
             
         Returns:
-            Número de registros insertados.
+            Número de registros insertados (con upsert, insertados o actualizados).
+        """
+        if not data and before_commit is None:
+            return 0
+        
+        # Ejecutar la inserción por lotes
+        conn, cursor = self.get_connection()
+        try:
+            inserted_count = self._insert_rows(cursor, table_name, data, upsert)
+            if before_commit is not None:
+                before_commit(cursor)
+            conn.commit()
+            return inserted_count
+        except sqlite3.Error as e:
+            conn.rollback()
+            raise e
+        finally:
+            self.close_connection(conn)
+    
+    def _insert_rows(self, cursor: sqlite3.Cursor, table_name: str, data: Batch,
+                     upsert: bool = False) -> int:
+        """
+        Inserta un lote con el cursor indicado, sin confirmar la transacción.
+        
+        Args:
+            cursor: Cursor de la transacción en curso.
+            table_name: Nombre de la tabla donde insertar los datos.
+            data: Lista de diccionarios o lote columnar con los datos a insertar.
+            upsert: Si es True, actualiza los registros existentes que hayan cambiado.
+            
+        Returns:
+            Número de registros insertados (con upsert, insertados o actualizados).
         """
         if not data:
             return 0
         
-        # Obtener las columnas del primer registro
-        columns = list(data[0].keys())
-        placeholders = ', '.join(['?' for _ in columns])
+        schema = SCHEMAS.get(table_name)
+        if isinstance(data, ColumnBatch):
+            # Los lotes columnares se recorren como tuplas sin copiarlos
+            columns = data.columns
+            values = data.rows()
+        else:
+            # Obtener las columnas del primer registro. Las columnas derivadas
+            # que envíe el cliente se ignoran: siempre se calculan aquí
+            computed = {column.name for column in schema.derived_columns} if schema else set()
+            columns = [column for column in data[0].keys() if column not in computed]
+            values = [tuple(record.get(column) for column in columns) for record in data]
+        if table_name == 'hired_employees':
+            values = self._exclude_archived(cursor, columns, values, upsert)
+            if not values:
+                return 0
+        
+        placeholders = ['?' for _ in columns]
+        derived = [column for column in schema.derived_columns if column.source in columns] if schema else []
+        if derived:
+            # Las columnas derivadas se calculan en la misma sentencia a partir
+            # del parámetro de su columna de origen
+            positions = {column: position for position, column in enumerate(columns, 1)}
+            placeholders = [f"?{position}" for position in positions.values()]
+            placeholders += [column.sql(f"?{positions[column.source]}") for column in derived]
+            columns = list(columns) + [column.name for column in derived]
+        
+        placeholders = ', '.join(placeholders)
         columns_str = ', '.join(columns)
         
         # Preparar la consulta SQL
         query = f"INSERT INTO {table_name} ({columns_str}) VALUES ({placeholders})"
+        if upsert:
+            query += self._upsert_clause(table_name, columns)
+        cursor.executemany(query, values)
+        return cursor.rowcount
+    
+    def _exclude_archived(self, cursor: sqlite3.Cursor, columns: List[str],
+                          values: Iterable[Tuple[Any, ...]], upsert: bool) -> Iterable[Tuple[Any, ...]]:
+        """
+        Comprueba las filas de un lote de hired_employees contra los id
+        archivados (ver archive_year), que ya no están en la tabla principal.
         
-        # Preparar los valores para la inserción
-        values = []
-        for record in data:
-            row_values = [record.get(column) for column in columns]
-            values.append(tuple(row_values))
+        Los archivos no se modifican: con upsert, las filas iguales a su copia
+        archivada se omiten, como las filas sin cambios de la tabla principal;
+        una fila archivada con otros valores, o cualquier id archivado sin
+        upsert, hace fallar el lote con ValueError.
         
-        # Ejecutar la inserción por lotes
+        Args:
+            cursor: Cursor de la transacción en curso.
+            columns: Columnas de las filas, sin las derivadas.
+            values: Filas del lote.
+            upsert: Si el lote se inserta con upsert.
+            
+        Returns:
+            Filas que se deben insertar.
+        """
+        if 'id' not in columns or not cursor.execute(
+                "SELECT 1 FROM hired_employees_archived_ids LIMIT 1").fetchone():
+            return values
+        
+        values = list(values)
+        position = list(columns).index('id')
+        ids = [row[position] for row in values]
+        archived = {}
+        for start in range(0, len(ids), ARCHIVED_ID_LOOKUP_SIZE):
+            chunk = ids[start:start + ARCHIVED_ID_LOOKUP_SIZE]
+            archived.update(cursor.execute(
+                f"SELECT id, year FROM hired_employees_archived_ids WHERE id IN ({', '.join('?' for _ in chunk)})",
+                chunk
+            ))
+        if not archived:
+            return values
+        if not upsert:
+            record_id = min(archived)
+            raise ValueError(f"El id {record_id} de hired_employees ya existe en el año archivado {archived[record_id]}")
+        
+        # Los archivos se leen en conexiones aparte, como en refresh_hire_summary
+        compared = [column for column in columns if column != 'id']
+        query = (f"SELECT 1 FROM hired_employees WHERE id = ? "
+                 f"AND ({', '.join(compared)}) IS ({', '.join('?' for _ in compared)})")
+        by_year: Dict[int, List[Tuple[Any, ...]]] = {}
+        for row in values:
+            if row[position] in archived:
+                by_year.setdefault(archived[row[position]], []).append(row)
+        for year, rows in sorted(by_year.items()):
+            uri = f"{Path(self.archive_path(year)).as_uri()}?mode=ro"
+            archive = sqlite3.connect(uri, uri=True)
+            try:
+                for row in rows:
+                    params = [row[position]] + [value for column, value in zip(columns, row) if column != 'id']
+                    if not archive.execute(query, params).fetchone():
+                        raise ValueError(f"El id {row[position]} de hired_employees está en el año archivado "
+                                         f"{year} y los años archivados no se pueden modificar")
+            finally:
+                archive.close()
+        return [row for row in values if row[position] not in archived]
+    
+    @staticmethod
+    def _upsert_clause(table_name: str, columns: List[str]) -> str:
+        """
+        Construye la cláusula ON CONFLICT que actualiza un registro existente solo
+        si alguno de sus valores cambia. Las filas idénticas no se reescriben y
+        no cuentan en rowcount.
+        
+        Args:
+            table_name: Nombre de la tabla.
+            columns: Columnas del INSERT.
+            
+        Returns:
+            Cláusula ON CONFLICT para añadir al INSERT.
+        """
+        schema = SCHEMAS.get(table_name)
+        key = [column.name for column in schema.columns if column.primary_key] if schema else []
+        if not key or not set(key) <= set(columns):
+            raise ValueError(f"La tabla {table_name} no admite upsert sin su clave primaria")
+        
+        updates = [column for column in columns if column not in key]
+        if not updates:
+            return f" ON CONFLICT ({', '.join(key)}) DO NOTHING"
+        
+        current = ', '.join(f"{table_name}.{column}" for column in updates)
+        incoming = ', '.join(f"excluded.{column}" for column in updates)
+        assignments = ', '.join(f"{column} = excluded.{column}" for column in updates)
+        return (f" ON CONFLICT ({', '.join(key)}) DO UPDATE SET {assignments}"
+                f" WHERE ({current}) IS NOT ({incoming})")
+    
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Cursor]:
+        """
+        Abre una transacción en una única conexión. Se confirma al salir del
+        bloque sin errores y se deshace si se produce una excepción.
+        
+        Yields:
+            Cursor de la transacción.
+        """
         conn, cursor = self.get_connection()
         try:
-            cursor.executemany(query, values)
+            yield cursor
             conn.commit()
-            return cursor.rowcount
-        except sqlite3.Error as e:
+        except Exception:
             conn.rollback()
-            raise e
+            raise
         finally:
             self.close_connection(conn)
     
+    @contextmanager
+    def bulk_load(self, tables: Optional[Iterable[str]] = None, synchronous: str = 'NORMAL',
+                  foreign_keys: bool = False) -> Iterator[BulkLoadSession]:
+        """
+        Abre una sesión de carga masiva en una única conexión y una única
+        transacción, para recargas completas:
+        
+        - Aplica un perfil de carga a la conexión: journal_mode=WAL (que es
+          persistente y queda activo en la base de datos), synchronous OFF o
+          NORMAL, una caché de páginas de BULK_LOAD_CACHE_KIB y temp_store=MEMORY.
+          Al terminar, la conexión recupera sus PRAGMAs y vuelve al pool.
+        - Toma el bloqueo de escritura al empezar (BEGIN IMMEDIATE) y mantiene
+          la transacción abierta durante todos los lotes.
+        - Elimina los índices secundarios de las tablas cargadas y los vuelve a
+          crear al final, antes del commit, en lugar de mantenerlos fila a fila.
+          Lo mismo hace con sus disparadores: el resumen de hired_employees
+          (HIRE_SUMMARY_TABLE) se recalcula de una vez antes del commit.
+        - Aplaza las comprobaciones de claves foráneas hasta el commit
+          (defer_foreign_keys). Solo se comprueban si foreign_keys es True; en
+          ese caso, una referencia rota hace fallar el commit.
+        
+        Si se produce una excepción, la transacción se deshace por completo,
+        incluida la eliminación de los índices.
+        
+        Args:
+            tables: Tablas que se van a cargar (por defecto, todas las del esquema).
+            synchronous: 'NORMAL' (por defecto) u 'OFF', que no espera a que los
+                         datos lleguen al disco y puede dejar la base de datos
+                         dañada si el sistema se detiene durante la carga.
+            foreign_keys: Si es True, se comprueban las claves foráneas al confirmar.
+            
+        Yields:
+            Sesión con la que insertar los lotes.
+        """
+        if synchronous not in BULK_LOAD_SYNCHRONOUS:
+            raise ValueError(f"synchronous no válido. Debe ser uno de: {', '.join(BULK_LOAD_SYNCHRONOUS)}")
+        tables = list(SCHEMAS) if tables is None else list(tables)
+        
+        conn, cursor = self.get_connection()
+        saved = {name: cursor.execute(f"PRAGMA {name}").fetchone()[0] for name in _SESSION_PRAGMAS}
+        try:
+            # Estos PRAGMAs no se pueden cambiar dentro de una transacción
+            cursor.execute("PRAGMA journal_mode = WAL")
+            cursor.execute(f"PRAGMA synchronous = {synchronous}")
+            cursor.execute(f"PRAGMA cache_size = -{BULK_LOAD_CACHE_KIB}")
+            cursor.execute("PRAGMA temp_store = MEMORY")
+            cursor.execute(f"PRAGMA foreign_keys = {'ON' if foreign_keys else 'OFF'}")
+            
+            cursor.execute("BEGIN IMMEDIATE")
+            # Se restablece sola al terminar la transacción
+            cursor.execute("PRAGMA defer_foreign_keys = ON")
+            indexes = self._drop_secondary_indexes(cursor, tables)
+            triggers = self._drop_triggers(cursor, tables)
+            
+            yield BulkLoadSession(self, cursor)
+            
+            for ddl in indexes + triggers:
+                cursor.execute(ddl)
+            if 'hired_employees' in tables:
+                refresh_hire_summary(cursor)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            for name, value in saved.items():
+                cursor.execute(f"PRAGMA {name} = {value}")
+            self.close_connection(conn)
+    
+    @staticmethod
+    def _drop_secondary_indexes(cursor: sqlite3.Cursor, tables: List[str]) -> List[str]:
+        """
+        Elimina los índices creados con CREATE INDEX sobre las tablas indicadas
+        (no los de las claves primarias ni los de restricciones UNIQUE).
+        
+        Returns:
+            Sentencias con las que volver a crearlos.
+        """
+        if not tables:
+            return []
+        placeholders = ', '.join('?' for _ in tables)
+        indexes = cursor.execute(
+            f"SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL "
+            f"AND tbl_name IN ({placeholders}) ORDER BY name",
+            tables
+        ).fetchall()
+        for name, _ in indexes:
+            cursor.execute(f'DROP INDEX "{name}"')
+        return [ddl for _, ddl in indexes]
+    
+    @staticmethod
+    def _drop_triggers(cursor: sqlite3.Cursor, tables: List[str]) -> List[str]:
+        """
+        Elimina los disparadores de las tablas indicadas.
+        
+        Returns:
+            Sentencias con las que volver a crearlos.
+        """
+        if not tables:
+            return []
+        placeholders = ', '.join('?' for _ in tables)
+        triggers = cursor.execute(
+            f"SELECT name, sql FROM sqlite_master WHERE type = 'trigger' "
+            f"AND tbl_name IN ({placeholders}) ORDER BY name",
+            tables
+        ).fetchall()
+        for name, _ in triggers:
+            cursor.execute(f'DROP TRIGGER "{name}"')
+        return [ddl for _, ddl in triggers]
+    
+    @staticmethod
+    @contextmanager
+    def _suspended_trigger(cursor: sqlite3.Cursor, name: str) -> Iterator[None]:
+        """
+        Elimina un disparador durante el bloque y lo vuelve a crear al salir, en
+        la transacción del cursor (si la transacción se deshace, el disparador
+        se recupera con ella).
+        """
+        trigger = cursor.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?", (name,)
+        ).fetchone()
+        if trigger is None:
+            yield
+            return
+        cursor.execute(f'DROP TRIGGER "{name}"')
+        yield
+        cursor.execute(trigger[0])
+    
+    def insert_bundle(self, batches_by_table: Mapping[str, Iterable[Batch]]) -> Dict[str, int]:
+        """
+        Inserta lotes de varias tablas en una sola sesión de carga masiva
+        (ver bulk_load), es decir, en una sola transacción y una sola conexión.
+        Las tablas se cargan en el orden de creación del esquema, de modo que las
+        tablas referenciadas (departments, jobs) se insertan antes que hired_employees.
+        Una fila no válida en cualquier lote columnar deshace la carga completa
+        (RowValidationError).
+        
+        Args:
+            batches_by_table: Lotes a insertar, por nombre de tabla.
+            
+        Returns:
+            Número de registros insertados en cada tabla.
+        """
+        unknown = set(batches_by_table) - set(SCHEMAS)
+        if unknown:
+            raise ValueError(f"Tablas no válidas: {', '.join(sorted(unknown))}")
+        
+        inserted = {}
+        with self.bulk_load(batches_by_table) as session:
+            for table_name in SCHEMAS:
+                if table_name not in batches_by_table:
+                    continue
+                inserted[table_name], _ = session.insert_batches(table_name, batches_by_table[table_name])
+        return inserted
+    
+    def insert_batches(self, table_name: str, batches: Iterable[Batch],
+                       upsert: bool = False) -> Tuple[int, int]:
+        """
+        Inserta en la tabla una secuencia de lotes, consumiéndola de forma perezosa.
+        Cada lote se inserta y se confirma antes de leer el siguiente, por lo que
+        la memoria depende del tamaño del lote y no del total de registros.
+        La carga se detiene con RowValidationError en el primer lote columnar
+        con filas no válidas; para descartarlas y seguir cargando, véase
+        app.database.quarantine.insert_with_quarantine.
+        
+        Args:
+            table_name: Nombre de la tabla donde insertar los datos.
+            batches: Iterable de lotes (listas de diccionarios o lotes columnares).
+            upsert: Si es True, actualiza los registros existentes que hayan cambiado.
+            
+        Returns:
+            Tupla con el número total de registros insertados y el número de lotes.
+        """
+        total_inserted = 0
+        batch_count = 0
+        for batch in _checked(batches):
+            total_inserted += self.insert_batch(table_name, batch, upsert=upsert)
+            batch_count += 1
+        return total_inserted, batch_count
+    
+    def truncate(self, table_name: str):
+        """
+        Elimina todos los registros de una tabla en una sola transacción, junto
+        con su contador de autoincremento y, para hired_employees, el resumen
+        HIRE_SUMMARY_TABLE (los archivos de los años archivados se eliminan
+        aparte, con drop_archives).
+        
+        Args:
+            table_name: Nombre de la tabla.
+        """
+        if table_name not in SCHEMAS:
+            raise ValueError(f"Tabla no válida. Debe ser una de: {', '.join(SCHEMAS)}")
+        with self.transaction() as cursor:
+            cursor.execute("BEGIN IMMEDIATE")
+            # Sin disparadores, SQLite vacía la tabla sin recorrer sus filas;
+            # el resumen se vacía después de una vez
+            with self._suspended_trigger(cursor, HIRE_SUMMARY_DELETE_TRIGGER):
+                cursor.execute(f"DELETE FROM {table_name}")
+            # sqlite_sequence solo existe si alguna tabla se creó con AUTOINCREMENT
+            if cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_sequence'").fetchone():
+                cursor.execute("DELETE FROM sqlite_sequence WHERE name = ?", (table_name,))
+            if table_name == 'hired_employees':
+                cursor.execute(f"DELETE FROM {HIRE_SUMMARY_TABLE}")
+    
+    def refresh_hire_summary(self) -> int:
+        """
+        Recalcula el resumen HIRE_SUMMARY_TABLE desde cero (por ejemplo, tras
+        modificar hired_employees con los disparadores desactivados).
+        
+        Returns:
+            Número de grupos del resumen.
+        """
+        with self.transaction() as cursor:
+            cursor.execute("BEGIN IMMEDIATE")
+            return refresh_hire_summary(cursor)
+    
     def execute_query(self, query: str, params=None):
         """
         Ejecuta una consulta SQL.
@@ -107,3 +619,277 @@ class DatabaseManager:
             raise e
         finally:
             self.close_connection(conn)
+    
+    @contextmanager
+    def snapshot(self, archive_years: Optional[Iterable[int]] = None) -> Iterator[sqlite3.Cursor]:
+        """
+        Abre una transacción de lectura sobre una conexión de solo lectura.
+        
+        Todas las consultas del bloque with ven la misma instantánea de la base
+        de datos, la de la primera lectura. Con WAL, la instantánea no espera a
+        las escrituras en curso (incluidas las cargas masivas) ni las bloquea.
+        
+        Args:
+            archive_years: Años archivados cuyos archivos se adjuntan a la
+                           conexión (ver attach_archives). Con None, la
+                           conexión conserva los que tuviera adjuntos.
+        
+        Yields:
+            Cursor de la transacción, que se cierra al salir del bloque.
+        """
+        conn = self.read_pool.acquire()
+        try:
+            # ATTACH no se admite dentro de una transacción
+            if archive_years is not None:
+                self.attach_archives(conn, archive_years)
+            cursor = conn.cursor()
+            cursor.execute("BEGIN")
+            yield cursor
+        finally:
+            # Al devolverla, el pool cierra la transacción de lectura
+            self.read_pool.release(conn)
+    
+    def execute_read(self, query: str, params=None,
+                     archive_years: Optional[Iterable[int]] = None) -> List[Tuple]:
+        """
+        Ejecuta una consulta de solo lectura en una instantánea (ver snapshot).
+        
+        Args:
+            query: Consulta SQL a ejecutar.
+            params: Parámetros para la consulta (opcional).
+            archive_years: Años archivados que usa la consulta (ver snapshot).
+            
+        Returns:
+            Filas del resultado.
+        """
+        with self.snapshot(archive_years) as cursor:
+            cursor.execute(query, params or ())
+            return cursor.fetchall()
+    
+    def iter_read(self, query: str, params=None, chunk_size: int = DEFAULT_FETCH_SIZE,
+                  archive_years: Optional[Iterable[int]] = None) -> Iterator[List[Tuple]]:
+        """
+        Ejecuta una consulta de solo lectura y recorre su resultado por bloques
+        de chunk_size filas (fetchmany), sin cargarlo entero en memoria.
+        
+        La conexión y su instantánea (ver snapshot) se conservan mientras dura
+        el recorrido y se devuelven al pool al agotar el iterador o al cerrarlo
+        con close. Mientras tanto, WAL no puede reutilizar las páginas
+        posteriores a la instantánea, por lo que un recorrido no debe quedar
+        abandonado sin cerrar.
+        
+        Args:
+            query: Consulta SQL a ejecutar.
+            params: Parámetros para la consulta (opcional).
+            chunk_size: Número máximo de filas de cada bloque.
+            archive_years: Años archivados que usa la consulta (ver snapshot).
+            
+        Returns:
+            Iterador de listas de filas.
+        """
+        if chunk_size < 1:
+            raise ValueError("El tamaño de bloque debe ser mayor que 0")
+        
+        def chunks() -> Iterator[List[Tuple]]:
+            with self.snapshot(archive_years) as cursor:
+                cursor.execute(query, params or ())
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        return
+                    yield rows
+        return chunks()
+    
+    def archive_path(self, year: int) -> str:
+        """
+        Ruta del archivo de base de datos al que se traslada un año de hired_employees.
+        """
+        return f"{os.path.splitext(self.db_path)[0]}_archive_{int(year)}.db"
+    
+    def archived_years(self) -> Dict[int, str]:
+        """
+        Años de hired_employees trasladados a archivos aparte.
+        
+        Returns:
+            Ruta del archivo de cada año archivado.
+        """
+        directory = os.path.dirname(os.path.abspath(self.db_path))
+        return {
+            year: os.path.join(directory, file_name)
+            for year, file_name in self.execute_read("SELECT year, file_name FROM hired_employees_archives")
+        }
+    
+    def attach_archives(self, conn: sqlite3.Connection, years: Iterable[int]):
+        """
+        Adjunta a una conexión de solo lectura los archivos de los años
+        indicados, como ARCHIVE_SCHEMA_PREFIX + año, y desadjunta los demás.
+        Define además la vista temporal HISTORY_VIEW, con las filas de la tabla
+        principal y de los archivos adjuntos. La conexión no debe tener una
+        transacción abierta.
+        
+        Args:
+            conn: Conexión del pool de solo lectura.
+            years: Años archivados que se van a consultar.
+        """
+        wanted = {f"{ARCHIVE_SCHEMA_PREFIX}{int(year)}": int(year) for year in years}
+        attached = {
+            name for _, name, _ in conn.execute("PRAGMA database_list")
+            if name.startswith(ARCHIVE_SCHEMA_PREFIX)
+        }
+        if attached == set(wanted):
+            return
+        
+        for name in attached - set(wanted):
+            conn.execute(f"DETACH DATABASE {name}")
+        for name in set(wanted) - attached:
+            uri = f"{Path(os.path.abspath(self.archive_path(wanted[name]))).as_uri()}?mode=ro"
+            conn.execute(f"ATTACH DATABASE ? AS {name}", (uri,))
+        
+        columns = ', '.join(_table_columns('hired_employees'))
+        parts = [f"SELECT {columns} FROM main.hired_employees"]
+        parts += [f"SELECT {columns} FROM {name}.hired_employees" for name in sorted(wanted)]
+        # La vista vive en el esquema temporal, en memoria, que query_only
+        # también protege: se desactiva solo para definirla
+        conn.execute("PRAGMA query_only = OFF")
+        try:
+            conn.execute(f"DROP VIEW IF EXISTS temp.{HISTORY_VIEW}")
+            conn.execute(f"CREATE TEMP VIEW {HISTORY_VIEW} AS {' UNION ALL '.join(parts)}")
+        finally:
+            conn.execute("PRAGMA query_only = ON")
+    
+    def hired_employees_history(self) -> Tuple[str, List[int]]:
+        """
+        Origen de las consultas que leen todo el historial de hired_employees.
+        
+        Returns:
+            Tupla con la tabla o vista que se consulta (la tabla principal, o
+            la vista HISTORY_VIEW si hay años archivados) y los años que hay
+            que adjuntar (para execute_read, iter_read o snapshot).
+        """
+        archives = self.archived_years()
+        if not archives:
+            return "main.hired_employees", []
+        return HISTORY_VIEW, sorted(archives)
+    
+    def archive_year(self, year: int) -> int:
+        """
+        Traslada las filas de hired_employees de un año a su propio archivo de
+        base de datos (archive_path) y las elimina de la tabla principal.
+        
+        El archivo se escribe y se confirma antes de eliminar las filas, y todo
+        ocurre con el bloqueo de escritura de la base de datos principal
+        tomado, de modo que no se pierden filas insertadas a la vez. Si el
+        proceso se interrumpe antes de terminar, el año sigue en la tabla
+        principal y el archivo a medias se sustituye en el siguiente intento.
+        
+        Las filas de ese año que se carguen después se guardan en la tabla
+        principal; las consultas por año las incluyen. Los id trasladados se
+        anotan en hired_employees_archived_ids para que no se vuelvan a
+        insertar (ver _exclude_archived). Se admiten como mucho MAX_ARCHIVES
+        años archivados.
+        
+        Args:
+            year: Año de contratación que se archiva.
+            
+        Returns:
+            Número de filas trasladadas.
+        """
+        year = int(year)
+        path = self.archive_path(year)
+        conn, cursor = self.get_connection()
+        try:
+            # Impide que se escriban filas del año mientras se copian
+            cursor.execute("BEGIN IMMEDIATE")
+            if cursor.execute("SELECT 1 FROM hired_employees_archives WHERE year = ?", (year,)).fetchone():
+                raise ValueError(f"El año {year} ya está archivado")
+            if cursor.execute("SELECT COUNT(*) FROM hired_employees_archives").fetchone()[0] >= MAX_ARCHIVES:
+                raise ValueError(f"No se pueden archivar más de {MAX_ARCHIVES} años")
+            records = cursor.execute(
+                "SELECT COUNT(*) FROM hired_employees WHERE hire_year = ?", (year,)
+            ).fetchone()[0]
+            if not records:
+                raise ValueError(f"No hay empleados contratados en {year}")
+            
+            self._write_archive(path, year)
+            # Las filas archivadas siguen contando en el resumen
+            cursor.execute(
+                "INSERT INTO hired_employees_archived_ids (id, year) "
+                "SELECT id, hire_year FROM hired_employees WHERE hire_year = ?",
+                (year,)
+            )
+            with self._suspended_trigger(cursor, HIRE_SUMMARY_DELETE_TRIGGER):
+                cursor.execute("DELETE FROM hired_employees WHERE hire_year = ?", (year,))
+            cursor.execute(
+                "INSERT INTO hired_employees_archives (year, file_name, records) VALUES (?, ?, ?)",
+                (year, os.path.basename(path), records)
+            )
+            conn.commit()
+            return records
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self.close_connection(conn)
+    
+    def _write_archive(self, path: str, year: int):
+        """
+        Crea el archivo de un año con una copia de sus filas, leídas de la base
+        de datos principal en una conexión aparte, y lo confirma.
+        """
+        for suffix in ('', '-journal', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        
+        columns = ', '.join(_table_columns('hired_employees'))
+        source = f"{Path(os.path.abspath(self.db_path)).as_uri()}?mode=ro"
+        archive = sqlite3.connect(path)
+        try:
+            archive.execute(TABLE_DDL['hired_employees'])
+            archive.execute("ATTACH DATABASE ? AS source", (source,))
+            archive.execute(
+                f"INSERT INTO hired_employees ({columns}) "
+                f"SELECT {columns} FROM source.hired_employees WHERE hire_year = ?",
+                (year,)
+            )
+            for ddl in TABLE_INDEXES.get('hired_employees', ()):
+                archive.execute(ddl)
+            archive.commit()
+        finally:
+            archive.close()
+    
+    def drop_archives(self) -> int:
+        """
+        Elimina todos los años archivados de hired_employees, con sus archivos.
+        
+        Returns:
+            Número de archivos eliminados.
+        """
+        with self.transaction() as cursor:
+            cursor.execute("BEGIN IMMEDIATE")
+            years = [year for year, in cursor.execute("SELECT year FROM hired_employees_archives")]
+            cursor.execute("DELETE FROM hired_employees_archives")
+            cursor.execute("DELETE FROM hired_employees_archived_ids")
+        for year in years:
+            path = self.archive_path(year)
+            for suffix in ('', '-journal', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+        return len(years)
+
+def _table_columns(table_name: str) -> Tuple[str, ...]:
+    """
+    Columnas de una tabla, incluidas las derivadas, en orden de definición.
+    """
+    schema = SCHEMAS[table_name]
+    return schema.column_names + tuple(column.name for column in schema.derived_columns)
+
+def _checked(batches: Iterable[Batch]) -> Iterator[Batch]:
+    """
+    Recorre los lotes lanzando RowValidationError si un lote columnar trae
+    filas descartadas por la validación, para no perderlas en silencio.
+    """
+    for batch in batches:
+        if isinstance(batch, ColumnBatch):
+            yield from raise_on_rejected((batch,))
+        else:
+            yield batch
@@ -0,0 +1,111 @@
+"""
+Huellas de los archivos cargados en modo upsert, para omitir recargas idénticas
+"""
+import hashlib
+from typing import Any, BinaryIO, Dict, Optional
+
+from app.database.db_manager import DatabaseManager
+
+# Tamaño de lectura al calcular la huella de un archivo
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+# Modos de escritura de las cargas
+MODE_INSERT = 'insert'
+MODE_UPSERT = 'upsert'
+WRITE_MODES = (MODE_INSERT, MODE_UPSERT)
+
+def stream_fingerprint(stream: BinaryIO) -> str:
+    """
+    Calcula la huella SHA-256 de un flujo binario leyéndolo por bloques.
+
+    Args:
+        stream: Flujo binario; se lee hasta el final.
+
+    Returns:
+        Huella en hexadecimal.
+    """
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(_HASH_CHUNK_SIZE), b''):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+def file_fingerprint(file_path: str) -> str:
+    """
+    Calcula la huella SHA-256 del contenido de un archivo.
+
+    Args:
+        file_path: Ruta al archivo.
+
+    Returns:
+        Huella en hexadecimal.
+    """
+    with open(file_path, 'rb') as file:
+        return stream_fingerprint(file)
+
+class FingerprintStore:
+    """
+    Acceso a la tabla table_fingerprints, que guarda por tabla la huella del
+    último archivo cargado en modo upsert.
+
+    Una huella solo es válida mientras nada haya modificado los registros que
+    cargó ese archivo: se sustituye en cada carga upsert y se elimina al
+    escribir en la tabla en modo upsert por otra vía o al truncarla. Las
+    inserciones simples no la invalidan, porque no pueden modificar registros
+    existentes. La tabla la crea create_database (ver LOAD_TRACKING_DDL en
+    app.database.create_db).
+    """
+
+    def __init__(self, db_manager: DatabaseManager):
+        """
+        Inicializa el almacén.
+
+        Args:
+            db_manager: Gestor de la base de datos donde se guardan las huellas.
+        """
+        self.db_manager = db_manager
+
+    def get(self, table_name: str) -> Optional[Dict[str, Any]]:
+        """
+        Obtiene la huella vigente de una tabla.
+
+        Args:
+            table_name: Nombre de la tabla.
+
+        Returns:
+            Diccionario con la huella, los registros y la fecha de carga, o None.
+        """
+        rows = self.db_manager.execute_query(
+            "SELECT fingerprint, records, loaded_at FROM table_fingerprints WHERE table_name = ?",
+            (table_name,)
+        )
+        if not rows:
+            return None
+        fingerprint, records, loaded_at = rows[0]
+        return {"fingerprint": fingerprint, "records": records, "loaded_at": loaded_at}
+
+    def matches(self, table_name: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """
+        Comprueba si un archivo es idéntico al último cargado en la tabla.
+
+        Returns:
+            La huella vigente si coincide, o None.
+        """
+        current = self.get(table_name)
+        return current if current is not None and current["fingerprint"] == fingerprint else None
+
+    def record(self, table_name: str, fingerprint: str, records: int):
+        """
+        Guarda la huella del archivo que se acaba de cargar en la tabla.
+        """
+        self.db_manager.execute_query(
+            "INSERT INTO table_fingerprints (table_name, fingerprint, records) VALUES (?, ?, ?) "
+            "ON CONFLICT (table_name) DO UPDATE SET fingerprint = excluded.fingerprint, "
+            "records = excluded.records, loaded_at = CURRENT_TIMESTAMP",
+            (table_name, fingerprint, records)
+        )
+
+    def clear(self, table_name: str):
+        """
+        Invalida la huella de una tabla.
+        """
+        self.db_manager.execute_query("DELETE FROM table_fingerprints WHERE table_name = ?", (table_name,))
@@ -0,0 +1,245 @@
+"""
+Escritor con confirmación agrupada (group commit) para los lotes de /batch
+"""
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from app.database.async_db import DatabaseLanes
+from app.database.db_manager import Batch, DatabaseManager
+
+# Tiempo que el escritor espera a que lleguen más lotes antes de confirmar, en segundos
+DEFAULT_COMMIT_WINDOW = 0.005
+
+# Número máximo de registros por transacción compartida
+DEFAULT_MAX_COMMIT_RECORDS = 50000
+
+class _PendingBatch(NamedTuple):
+    db_manager: DatabaseManager
+    table_name: str
+    data: Batch
+    upsert: bool
+    future: Future
+
+class GroupCommitWriter:
+    """
+    Agrupa los lotes que llegan a la vez en una sola transacción.
+
+    Los lotes se encolan y un único drenador, que se ejecuta en el hilo de
+    escritura de DatabaseLanes, los recoge: espera hasta window segundos (o
+    hasta reunir max_records registros) a que lleguen más, los inserta todos
+    en una transacción y la confirma con un único commit. Cada lote se
+    inserta en su propio SAVEPOINT, de modo que un lote que falla (por
+    ejemplo, por un id duplicado) se deshace sin afectar a los demás. A cada
+    llamador se le responde después del commit compartido.
+    """
+
+    def __init__(self, lanes: DatabaseLanes, window: float = DEFAULT_COMMIT_WINDOW,
+                 max_records: int = DEFAULT_MAX_COMMIT_RECORDS):
+        """
+        Inicializa el escritor.
+
+        Args:
+            lanes: Carriles de la base de datos; las transacciones se ejecutan
+                   en su hilo de escritura.
+            window: Segundos que se espera a más lotes antes de confirmar (0 para
+                    agrupar solo los que ya estén encolados).
+            max_records: Número máximo de registros por transacción.
+        """
+        if window < 0:
+            raise ValueError("La ventana de agrupación no puede ser negativa")
+        if max_records < 1:
+            raise ValueError("El número máximo de registros por transacción debe ser mayor que 0")
+
+        self.lanes = lanes
+        self.window = window
+        self.max_records = max_records
+        self._pending: 'queue.Queue[_PendingBatch]' = queue.Queue()
+        self._lock = threading.Lock()
+        self._draining = False
+        self._stats = {
+            "max_queue_depth": 0,
+            "commits": 0,
+            "failed_commits": 0,
+            "batches_committed": 0,
+            "batches_failed": 0,
+            "records_committed": 0,
+            "max_batches_per_commit": 0,
+            "max_records_per_commit": 0,
+        }
+
+    def submit(self, db_manager: DatabaseManager, table_name: str, data: Batch,
+               upsert: bool = False) -> 'Future[int]':
+        """
+        Encola un lote para la siguiente transacción compartida.
+
+        Args:
+            db_manager: Gestor de la base de datos donde insertar el lote.
+            table_name: Nombre de la tabla donde insertar los datos.
+            data: Lista de diccionarios o lote columnar con los datos a insertar.
+            upsert: Si es True, actualiza los registros existentes que hayan cambiado.
+
+        Returns:
+            Future con el número de registros insertados, que se completa cuando
+            la transacción que incluye el lote se ha confirmado.
+        """
+        future: 'Future[int]' = Future()
+        self._pending.put(_PendingBatch(db_manager, table_name, data, upsert, future))
+        with self._lock:
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], self._pending.qsize())
+            start = not self._draining
+            self._draining = True
+        if start:
+            self.lanes.submit_write(self._drain)
+        return future
+
+    async def insert_batch(self, db_manager: DatabaseManager, table_name: str, data: Batch,
+                           upsert: bool = False) -> int:
+        """
+        Inserta un lote en la siguiente transacción compartida y espera a que
+        se confirme, sin bloquear el bucle de eventos.
+
+        Returns:
+            Número de registros insertados (con upsert, insertados o actualizados).
+        """
+        return await asyncio.wrap_future(self.submit(db_manager, table_name, data, upsert))
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Estadísticas del escritor: lotes en cola, transacciones confirmadas y
+        tamaño medio y máximo de cada transacción.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        commits = stats["commits"]
+        stats.update({
+            "queue_depth": self._pending.qsize(),
+            "window_ms": self.window * 1000,
+            "avg_batches_per_commit": stats["batches_committed"] / commits if commits else 0,
+            "avg_records_per_commit": stats["records_committed"] / commits if commits else 0,
+        })
+        return stats
+
+    def _drain(self):
+        """
+        Confirma un grupo de lotes. Se ejecuta en el hilo de escritura; si
+        quedan lotes en la cola, vuelve a encolarse en el carril de escritura,
+        detrás de las demás escrituras pendientes, para no acapararlo.
+        """
+        try:
+            group = self._collect()
+            if group:
+                self._commit_group(group)
+        finally:
+            with self._lock:
+                # Un lote encolado después de comprobar la cola encontrará
+                # _draining a False y programará otro drenador
+                more = not self._pending.empty()
+                self._draining = more
+            if more:
+                self.lanes.submit_write(self._drain)
+
+    def _next(self, timeout: float = 0) -> _PendingBatch:
+        """
+        Saca de la cola el siguiente lote cuyo llamador sigue esperando; los
+        lotes cancelados se descartan sin insertarlos. Un lote sacado de la
+        cola ya no se puede cancelar.
+
+        Raises:
+            queue.Empty: Si no hay lotes pendientes (tras esperar timeout segundos).
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            item = self._pending.get(timeout=remaining) if remaining > 0 else self._pending.get_nowait()
+            if item.future.set_running_or_notify_cancel():
+                return item
+
+    def _collect(self) -> List[_PendingBatch]:
+        """
+        Recoge el siguiente grupo de lotes: los encolados y los que lleguen
+        durante la ventana, hasta max_records registros.
+        """
+        try:
+            group = [self._next()]
+        except queue.Empty:
+            return []
+
+        records = len(group[0].data)
+        deadline = time.monotonic() + self.window
+        while records < self.max_records:
+            try:
+                item = self._next(deadline - time.monotonic())
+            except queue.Empty:
+                break
+            group.append(item)
+            records += len(item.data)
+        return group
+
+    def _commit_group(self, group: List[_PendingBatch]):
+        """
+        Inserta un grupo de lotes en una transacción por gestor de base de datos
+        y responde a cada llamador tras el commit.
+        """
+        by_manager: Dict[int, List[_PendingBatch]] = {}
+        for item in group:
+            by_manager.setdefault(id(item.db_manager), []).append(item)
+
+        for items in by_manager.values():
+            db_manager = items[0].db_manager
+            results = []
+            conn = None
+            try:
+                conn, cursor = db_manager.get_connection()
+                cursor.execute("BEGIN IMMEDIATE")
+                for item in items:
+                    cursor.execute("SAVEPOINT batch")
+                    try:
+                        inserted = db_manager._insert_rows(cursor, item.table_name, item.data, item.upsert)
+                    except Exception as e:
+                        cursor.execute("ROLLBACK TO batch")
+                        results.append((item, None, e))
+                    else:
+                        results.append((item, inserted, None))
+                    cursor.execute("RELEASE batch")
+                conn.commit()
+            except Exception as e:
+                if conn is not None:
+                    conn.rollback()
+                with self._lock:
+                    self._stats["failed_commits"] += 1
+                    self._stats["batches_failed"] += len(items)
+                for item in items:
+                    _resolve(item.future, None, e)
+                continue
+            finally:
+                if conn is not None:
+                    db_manager.close_connection(conn)
+
+            committed = [inserted for _, inserted, error in results if error is None]
+            records = sum(len(item.data) for item, _, error in results if error is None)
+            with self._lock:
+                stats = self._stats
+                stats["commits"] += 1
+                stats["batches_committed"] += len(committed)
+                stats["batches_failed"] += len(results) - len(committed)
+                stats["records_committed"] += records
+                stats["max_batches_per_commit"] = max(stats["max_batches_per_commit"], len(committed))
+                stats["max_records_per_commit"] = max(stats["max_records_per_commit"], records)
+
+            for item, inserted, error in results:
+                _resolve(item.future, inserted, error)
+
+def _resolve(future: Future, result: Any, error: Optional[BaseException]):
+    """
+    Completa el Future de un lote, salvo si ya está completado.
+    """
+    if future.done():
+        return
+    if error is None:
+        future.set_result(result)
+    else:
+        future.set_exception(error)
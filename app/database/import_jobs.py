@@ -0,0 +1,201 @@
+"""
+Trabajos de importación con puntos de control para reanudar cargas grandes
+"""
+import sqlite3
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+from app.database.db_manager import DatabaseManager
+from app.database.quarantine import QuarantineStore, combine_before_commit
+from app.utils.csv_processor import DEFAULT_BATCH_SIZE, iter_csv_batches_from_offset
+from app.utils.row_validation import ON_ERROR_ABORT, ON_ERROR_QUARANTINE, RowValidationError
+
+# Estados de un trabajo de importación
+STATUS_RUNNING = 'running'
+STATUS_COMPLETED = 'completed'
+STATUS_FAILED = 'failed'
+
+class ImportJobConflictError(Exception):
+    """
+    El identificador de trabajo ya existe para otra tabla u otro archivo.
+    """
+
+class ImportJobStore:
+    """
+    Acceso a la tabla import_jobs, que guarda el progreso de cada importación.
+    La tabla la crea create_database (ver LOAD_TRACKING_DDL en app.database.create_db).
+    """
+
+    _COLUMNS = ('job_id', 'table_name', 'file_path', 'byte_offset', 'rows_inserted',
+                'last_id', 'status', 'error', 'updated_at')
+
+    def __init__(self, db_manager: DatabaseManager):
+        """
+        Inicializa el almacén.
+
+        Args:
+            db_manager: Gestor de la base de datos donde se guardan los trabajos.
+        """
+        self.db_manager = db_manager
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Obtiene un trabajo por su identificador.
+
+        Args:
+            job_id: Identificador del trabajo.
+
+        Returns:
+            Diccionario con los datos del trabajo, o None si no existe.
+        """
+        rows = self.db_manager.execute_query(
+            f"SELECT {', '.join(self._COLUMNS)} FROM import_jobs WHERE job_id = ?", (job_id,)
+        )
+        return dict(zip(self._COLUMNS, rows[0])) if rows else None
+
+    def create(self, job_id: str, table_name: str, file_path: str):
+        """
+        Registra un trabajo nuevo, sin progreso.
+        """
+        self.db_manager.execute_query(
+            "INSERT INTO import_jobs (job_id, table_name, file_path, status) VALUES (?, ?, ?, ?)",
+            (job_id, table_name, file_path, STATUS_RUNNING)
+        )
+
+    def set_status(self, job_id: str, status: str, error: Optional[str] = None):
+        """
+        Actualiza el estado de un trabajo.
+        """
+        self.db_manager.execute_query(
+            "UPDATE import_jobs SET status = ?, error = ?, updated_at = CURRENT_TIMESTAMP WHERE job_id = ?",
+            (status, error, job_id)
+        )
+
+    @staticmethod
+    def checkpoint(job_id: str, byte_offset: int, rows_inserted: int,
+                   last_id: Optional[int]) -> Callable[[sqlite3.Cursor], None]:
+        """
+        Prepara la escritura de un punto de control para ejecutarla en la misma
+        transacción que el lote (ver DatabaseManager.insert_batch), de modo que
+        el punto de control y los registros se confirman juntos o no se confirman.
+
+        Args:
+            job_id: Identificador del trabajo.
+            byte_offset: Offset del final del último registro confirmado.
+            rows_inserted: Total de registros confirmados.
+            last_id: Último id confirmado.
+
+        Returns:
+            Función que recibe el cursor de la transacción.
+        """
+        def write(cursor: sqlite3.Cursor):
+            cursor.execute(
+                "UPDATE import_jobs SET byte_offset = ?, rows_inserted = ?, last_id = ?, "
+                "updated_at = CURRENT_TIMESTAMP WHERE job_id = ?",
+                (byte_offset, rows_inserted, last_id, job_id)
+            )
+        return write
+
+def run_import_job(db_manager: DatabaseManager, table_name: str, file_path: str,
+                   batch_size: int = DEFAULT_BATCH_SIZE, job_id: Optional[str] = None,
+                   progress: Optional[Any] = None,
+                   on_error: str = ON_ERROR_QUARANTINE, upsert: bool = False,
+                   run_write: Optional[Callable[..., Any]] = None) -> Dict[str, Any]:
+    """
+    Importa un archivo CSV en lotes, guardando un punto de control tras cada
+    lote confirmado. Si el trabajo ya existe, se reanuda desde su último punto
+    de control en lugar de empezar desde el principio del archivo.
+
+    Las filas que no superan la validación se guardan en rejected_rows con el
+    job_id como identificador de carga, en la misma transacción que el lote y
+    su punto de control (on_error='quarantine'), o detienen el trabajo
+    (on_error='abort').
+
+    Args:
+        db_manager: Gestor de base de datos.
+        table_name: Tabla de destino.
+        file_path: Ruta al archivo CSV.
+        batch_size: Número de registros por lote.
+        job_id: Identificador del trabajo. Si es None, se genera uno nuevo.
+        progress: Objeto opcional con métodos start(offset), parsed(filas) e
+                  inserted(filas, offset) que recibe el avance de la importación
+                  (ver app.utils.background_jobs.JobProgress).
+        on_error: Política ante filas no válidas ('quarantine' o 'abort').
+        upsert: Si es True, actualiza los registros existentes que hayan cambiado
+                en lugar de fallar por clave duplicada.
+        run_write: Función con la que ejecutar cada operación sobre la base de
+                   datos, run_write(func, *args), como en insert_with_quarantine:
+                   con AsyncDatabase.write_blocking, el archivo se lee en el hilo
+                   que llama y solo las escrituras ocupan el carril de escritura.
+                   Por defecto, se ejecutan en el hilo que llama.
+
+    Returns:
+        Resumen del trabajo: identificador, estado, offset de reanudación,
+        registros insertados (con upsert, insertados o actualizados) y
+        descartados y lotes en esta ejecución y total acumulado.
+    """
+    def run(func: Callable[..., Any], *args, **kwargs) -> Any:
+        return func(*args, **kwargs) if run_write is None else run_write(func, *args, **kwargs)
+
+    store = ImportJobStore(db_manager)
+    quarantine = QuarantineStore(db_manager)
+    job = run(store.get, job_id) if job_id else None
+
+    if job is None:
+        job_id = job_id or uuid.uuid4().hex
+        run(store.create, job_id, table_name, file_path)
+        byte_offset, total_rows, last_id = 0, 0, None
+    else:
+        if job['table_name'] != table_name or job['file_path'] != file_path:
+            raise ImportJobConflictError(
+                f"El trabajo {job_id} pertenece a la tabla {job['table_name']} y al archivo {job['file_path']}"
+            )
+        byte_offset, total_rows, last_id = job['byte_offset'], job['rows_inserted'], job['last_id']
+
+    # Las líneas anteriores al punto de control son las filas insertadas más las
+    # descartadas, que se confirman juntas (las líneas vacías no se cuentan)
+    first_line = total_rows + run(quarantine.count, job_id) + 1 if byte_offset else 1
+
+    summary = {
+        "job_id": job_id,
+        "status": STATUS_COMPLETED,
+        "resumed_from_offset": byte_offset,
+        "records_inserted": 0,
+        "records_rejected": 0,
+        "batches": 0,
+        "total_records": total_rows
+    }
+    if job is not None and job['status'] == STATUS_COMPLETED:
+        return summary
+
+    run(store.set_status, job_id, STATUS_RUNNING)
+    if progress is not None:
+        progress.start(byte_offset)
+    try:
+        batches = iter_csv_batches_from_offset(file_path, table_name, batch_size, byte_offset, first_line)
+        for batch, end_offset in batches:
+            if batch.rejected and on_error == ON_ERROR_ABORT:
+                raise RowValidationError(batch.rejected[0])
+            if progress is not None:
+                progress.parsed(len(batch))
+            if len(batch):
+                last_id = batch.last_value('id')
+            before_commit = combine_before_commit(
+                QuarantineStore.writer(job_id, table_name, batch.rejected),
+                store.checkpoint(job_id, end_offset, total_rows + len(batch), last_id)
+            )
+            inserted_count = run(db_manager.insert_batch, table_name, batch, before_commit=before_commit,
+                                 upsert=upsert)
+            if progress is not None:
+                progress.inserted(inserted_count, end_offset)
+            total_rows += len(batch)
+            summary["records_inserted"] += inserted_count
+            summary["records_rejected"] += len(batch.rejected)
+            summary["batches"] += 1
+    except Exception as e:
+        run(store.set_status, job_id, STATUS_FAILED, str(e))
+        raise
+
+    run(store.set_status, job_id, STATUS_COMPLETED)
+    summary["total_records"] = total_rows
+    return summary
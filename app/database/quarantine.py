@@ -0,0 +1,161 @@
+"""
+Cuarentena de filas descartadas durante la carga de archivos CSV
+"""
+import json
+import sqlite3
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from app.database.db_manager import DatabaseManager
+from app.utils.column_batch import ColumnBatch
+from app.utils.row_validation import ON_ERROR_ABORT, RejectedRow, raise_on_rejected
+
+class QuarantineStore:
+    """
+    Acceso a la tabla rejected_rows, que guarda las filas que no superaron la
+    validación junto con su número de línea y los motivos. La tabla la crea
+    create_database (ver LOAD_TRACKING_DDL en app.database.create_db).
+    """
+
+    def __init__(self, db_manager: DatabaseManager):
+        """
+        Inicializa el almacén.
+
+        Args:
+            db_manager: Gestor de la base de datos donde se guardan las filas.
+        """
+        self.db_manager = db_manager
+
+    @staticmethod
+    def writer(load_id: str, table_name: str,
+               rejected: Sequence[RejectedRow]) -> Optional[Callable[[sqlite3.Cursor], None]]:
+        """
+        Prepara la escritura de filas descartadas para ejecutarla en la misma
+        transacción que el lote del que proceden (ver DatabaseManager.insert_batch).
+
+        Args:
+            load_id: Identificador de la carga.
+            table_name: Tabla de destino de las filas.
+            rejected: Filas descartadas.
+
+        Returns:
+            Función que recibe el cursor de la transacción, o None si no hay filas.
+        """
+        if not rejected:
+            return None
+
+        def write(cursor: sqlite3.Cursor):
+            cursor.executemany(
+                "INSERT INTO rejected_rows (load_id, table_name, line_number, raw_row, errors) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(load_id, table_name, row.line_number, json.dumps(row.values, ensure_ascii=False),
+                  '; '.join(row.errors)) for row in rejected]
+            )
+        return write
+
+    def count(self, load_id: str) -> int:
+        """
+        Cuenta las filas descartadas de una carga.
+        """
+        return self.db_manager.execute_query(
+            "SELECT COUNT(*) FROM rejected_rows WHERE load_id = ?", (load_id,)
+        )[0][0]
+
+    def get(self, load_id: str, limit: int = 100, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        Obtiene las filas descartadas de una carga, en orden de línea.
+
+        Args:
+            load_id: Identificador de la carga.
+            limit: Número máximo de filas a devolver.
+            offset: Número de filas a omitir.
+
+        Returns:
+            Lista de diccionarios con la tabla, la línea, los valores originales
+            y los motivos de cada fila.
+        """
+        rows = self.db_manager.execute_query(
+            "SELECT table_name, line_number, raw_row, errors FROM rejected_rows "
+            "WHERE load_id = ? ORDER BY line_number, id LIMIT ? OFFSET ?",
+            (load_id, limit, offset)
+        )
+        return [
+            {"table_name": table_name, "line_number": line_number,
+             "values": json.loads(raw_row), "errors": errors.split('; ')}
+            for table_name, line_number, raw_row, errors in rows
+        ]
+
+def combine_before_commit(*callbacks: Optional[Callable[[sqlite3.Cursor], None]]
+                          ) -> Optional[Callable[[sqlite3.Cursor], None]]:
+    """
+    Combina varias funciones before_commit en una, ignorando las que son None.
+    """
+    active = [callback for callback in callbacks if callback is not None]
+    if not active:
+        return None
+
+    def run(cursor: sqlite3.Cursor):
+        for callback in active:
+            callback(cursor)
+    return run
+
+def insert_with_quarantine(db_manager: DatabaseManager, table_name: str,
+                           batches: Iterable[ColumnBatch], load_id: str,
+                           on_error: str, upsert: bool = False, bulk: bool = False,
+                           run_write: Optional[Callable[..., Any]] = None) -> Dict[str, int]:
+    """
+    Inserta una secuencia de lotes aplicando la política ante filas no válidas.
+    Con 'quarantine' las filas descartadas de cada lote se guardan en
+    rejected_rows en la misma transacción que el lote; con 'abort' la carga se
+    detiene con RowValidationError en el primer lote con filas descartadas
+    (los lotes anteriores quedan confirmados, salvo con bulk).
+
+    Args:
+        db_manager: Gestor de base de datos.
+        table_name: Tabla de destino.
+        batches: Lotes columnares.
+        load_id: Identificador de la carga, con el que se guardan las filas descartadas.
+        on_error: Política ante filas no válidas ('quarantine' o 'abort').
+        upsert: Si es True, actualiza los registros existentes que hayan cambiado.
+        bulk: Si es True, la carga se hace en una sesión de carga masiva
+              (DatabaseManager.bulk_load): una sola transacción para todos los
+              lotes, que se deshace por completo si la carga falla.
+        run_write: Función con la que ejecutar cada escritura, run_write(func,
+                   *args). Con AsyncDatabase.write_blocking, los lotes se leen
+                   en el hilo que llama y solo las inserciones ocupan el carril
+                   de escritura; con bulk, la sesión es una sola transacción,
+                   así que los lotes se leen todos antes de abrirla. Por
+                   defecto, se ejecutan en el hilo que llama.
+
+    Returns:
+        Registros insertados, registros descartados y número de lotes; con
+        upsert, también los registros que no cambiaron (y no se reescribieron).
+    """
+    summary = {"records_inserted": 0, "records_rejected": 0, "batches": 0}
+    if upsert:
+        summary["records_unchanged"] = 0
+    def run(func: Callable[..., Any], *args, **kwargs) -> Any:
+        return func(*args, **kwargs) if run_write is None else run_write(func, *args, **kwargs)
+
+    if on_error == ON_ERROR_ABORT:
+        batches = raise_on_rejected(batches)
+
+    def load(insert: Callable[..., int]):
+        for batch in batches:
+            quarantine = QuarantineStore.writer(load_id, table_name, batch.rejected)
+            written = insert(table_name, batch, before_commit=quarantine, upsert=upsert)
+            summary["records_inserted"] += written
+            if upsert:
+                summary["records_unchanged"] += len(batch) - written
+            summary["records_rejected"] += len(batch.rejected)
+            summary["batches"] += 1
+
+    if bulk:
+        def load_bulk():
+            with db_manager.bulk_load([table_name]) as session:
+                load(session.insert)
+        if run_write is not None:
+            batches = list(batches)
+        run(load_bulk)
+    else:
+        load(lambda *args, **kwargs: run(db_manager.insert_batch, *args, **kwargs))
+    return summary
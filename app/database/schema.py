@@ -0,0 +1,149 @@
+"""
+Registro de esquemas de tabla derivado de las sentencias DDL
+"""
+import sqlite3
+from typing import Any, Callable, Dict, NamedTuple, Optional, Sequence, Tuple
+
+from app.database.create_db import DERIVED_COLUMNS, TABLE_DDL, DerivedColumn
+
+# Rango de los enteros de SQLite (64 bits con signo), el mismo que el de los
+# lotes columnares en array('q')
+INT64_MIN = -2 ** 63
+INT64_MAX = 2 ** 63 - 1
+
+class ColumnSchema(NamedTuple):
+    """
+    Definición de una columna tal como la describe PRAGMA table_info.
+    """
+    name: str
+    type: str
+    not_null: bool
+    primary_key: bool
+
+    @property
+    def is_integer(self) -> bool:
+        return 'INT' in self.type.upper()
+
+    @property
+    def is_timestamp(self) -> bool:
+        column_type = self.type.upper()
+        return 'TIMESTAMP' in column_type or 'DATE' in column_type
+
+    @property
+    def nullable(self) -> bool:
+        # Una INTEGER PRIMARY KEY nula haría que SQLite asignara un id nuevo
+        return not self.not_null and not self.primary_key
+
+class TableSchema:
+    """
+    Esquema de una tabla con un convertidor de filas CSV precompilado.
+
+    columns contiene solo las columnas que traen los datos de origen; las
+    columnas derivadas (derived_columns) se calculan al insertar.
+    """
+
+    def __init__(self, name: str, columns: Sequence[ColumnSchema],
+                 derived_columns: Sequence[DerivedColumn] = ()):
+        """
+        Inicializa el esquema.
+
+        Args:
+            name: Nombre de la tabla.
+            columns: Columnas de origen de la tabla, en orden de definición.
+            derived_columns: Columnas que se calculan al insertar.
+        """
+        self.name = name
+        self.columns = list(columns)
+        self.derived_columns = tuple(derived_columns)
+        self.column_names = tuple(column.name for column in self.columns)
+        self.int_columns = tuple(column.name for column in self.columns if column.is_integer)
+        self.nullable_int_columns = tuple(
+            column.name for column in self.columns if column.is_integer and column.nullable
+        )
+        self.convert_row = self._compile_converter()
+
+    def _compile_converter(self) -> Callable[[Sequence[str]], Tuple[Any, ...]]:
+        """
+        Genera una función que convierte una fila CSV (lista de cadenas) en una
+        tupla tipada. El código de cada columna se decide aquí, una sola vez por
+        tabla, de modo que la función resultante no evalúa el esquema por fila.
+
+        Returns:
+            Función row -> tupla en el orden de column_names.
+        """
+        expressions = []
+        for index, column in enumerate(self.columns):
+            value = f"row[{index}]"
+            if column.is_integer and column.nullable:
+                expressions.append(f"(int({value}) if {value}.strip() else None)")
+            elif column.is_integer:
+                expressions.append(f"int({value})")
+            elif column.nullable:
+                expressions.append(f"({value} if {value} != '' else None)")
+            else:
+                expressions.append(value)
+
+        source = f"def convert_{self.name}(row):\n    return ({', '.join(expressions)},)\n"
+        namespace: Dict[str, Any] = {}
+        exec(compile(source, f"<schema {self.name}>", "exec"), namespace)
+        return namespace[f"convert_{self.name}"]
+
+    def __repr__(self) -> str:
+        return f"TableSchema({self.name!r}, {list(self.column_names)!r})"
+
+def _load_schemas() -> Dict[str, TableSchema]:
+    """
+    Crea las tablas en una base de datos en memoria a partir de TABLE_DDL y
+    lee su definición con PRAGMA table_info.
+
+    Returns:
+        Diccionario con el esquema de cada tabla, en orden de creación.
+    """
+    conn = sqlite3.connect(':memory:')
+    try:
+        schemas = {}
+        for table_name, ddl in TABLE_DDL.items():
+            conn.execute(ddl)
+            derived = DERIVED_COLUMNS.get(table_name, ())
+            derived_names = {column.name for column in derived}
+            columns = [
+                ColumnSchema(name=name, type=col_type, not_null=bool(not_null), primary_key=bool(pk))
+                for _, name, col_type, not_null, _, pk in conn.execute(f"PRAGMA table_info({table_name})")
+                if name not in derived_names
+            ]
+            schemas[table_name] = TableSchema(table_name, columns, derived)
+        return schemas
+    finally:
+        conn.close()
+
+# Esquemas de todas las tablas de la migración
+SCHEMAS: Dict[str, TableSchema] = _load_schemas()
+
+def get_schema(table_name: str) -> TableSchema:
+    """
+    Obtiene el esquema de una tabla.
+
+    Args:
+        table_name: Nombre de la tabla.
+
+    Returns:
+        Esquema de la tabla.
+    """
+    try:
+        return SCHEMAS[table_name]
+    except KeyError:
+        raise ValueError(
+            f"Tabla no válida. Debe ser una de: {', '.join(SCHEMAS)}"
+        ) from None
+
+def find_schema(table_name: Optional[str]) -> Optional[TableSchema]:
+    """
+    Obtiene el esquema de una tabla si está registrada.
+
+    Args:
+        table_name: Nombre de la tabla, o None.
+
+    Returns:
+        Esquema de la tabla, o None si no está registrada.
+    """
+    return SCHEMAS.get(table_name) if table_name else None
@@ -1,18 +1,15 @@
 """
 Configuración principal de la API REST
 """
-from fastapi import FastAPI, UploadFile, File, HTTPException, Body
+from fastapi import FastAPI, UploadFile, File, HTTPException, Body, Query
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-import os
-import tempfile
-import shutil
 from typing import List, Dict, Any
 
 # Importar módulos propios
 from app.database.create_db import create_database
 from app.database.db_manager import DatabaseManager
-from app.utils.csv_processor import parse_csv_file, validate_batch_size
+from app.utils.csv_processor import iter_stream_batches, validate_batch_size, DEFAULT_BATCH_SIZE
 
 # Crear la aplicación FastAPI
 app = FastAPI(
@@ -43,16 +40,18 @@ async def root():
 
 # Endpoint para cargar un archivo CSV
 @app.post("/upload/{table_name}")
-async def upload_csv(table_name: str, file: UploadFile = File(...)):
+async def upload_csv(table_name: str, file: UploadFile = File(...),
+                     batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1)):
     """
     Carga un archivo CSV en la tabla especificada.
     
     Args:
         table_name: Nombre de la tabla donde cargar los datos (departments, jobs, hired_employees).
         file: Archivo CSV a cargar.
+        batch_size: Número de registros por lote de inserción.
         
     Returns:
-        Mensaje de éxito y número de registros insertados.
+        Mensaje de éxito, número de registros insertados y número de lotes.
     """
     # Validar el nombre de la tabla
     valid_tables = ["departments", "jobs", "hired_employees"]
@@ -62,41 +61,31 @@ async def upload_csv(table_name: str, file: UploadFile = File(...)):
             detail=f"Tabla no válida. Debe ser una de: {', '.join(valid_tables)}"
         )
     
-    # Guardar el archivo temporalmente
-    temp_file = tempfile.NamedTemporaryFile(delete=False)
     try:
-        shutil.copyfileobj(file.file, temp_file)
-        temp_file.close()
-        
-        # Procesar el archivo CSV
-        data = parse_csv_file(temp_file.name)
+        # Procesar el archivo subido directamente, sin copiarlo a un archivo temporal
+        batches = iter_stream_batches(file.file, table_name, batch_size)
+        db_manager = DatabaseManager()
+        inserted_count, batch_count = db_manager.insert_batches(table_name, batches)
         
-        # Validar el tamaño del lote
-        if not validate_batch_size(data):
+        if batch_count == 0:
             raise HTTPException(
                 status_code=400,
-                detail="El tamaño del lote debe estar entre 1 y 1000 registros"
+                detail="El archivo CSV no contiene registros"
             )
         
-        # Insertar los datos en la base de datos
-        db_manager = DatabaseManager()
-        inserted_count = db_manager.insert_batch(table_name, data)
-        
         return JSONResponse(
             status_code=201,
             content={
                 "message": f"Archivo CSV cargado exitosamente en la tabla {table_name}",
-                "records_inserted": inserted_count
+                "records_inserted": inserted_count,
+                "batches": batch_count
             }
         )
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    
-    finally:
-        # Eliminar el archivo temporal
-        if os.path.exists(temp_file.name):
-            os.unlink(temp_file.name)
 
 # Endpoint para insertar un lote de registros
 @app.post("/batch/{table_name}")
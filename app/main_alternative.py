@@ -2,7 +2,7 @@
 Configuración principal de la API REST (versión alternativa sin python-multipart)
 """
 # Incluir nueva libreria con rutas
-from fastapi import FastAPI, UploadFile, File, HTTPException, Body
+from fastapi import FastAPI, UploadFile, File, HTTPException, Body, Query
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 import os
@@ -14,7 +14,7 @@ from typing import List, Dict, Any
 # Importar módulos propios
 from app.database.create_db import create_database
 from app.database.db_manager import DatabaseManager
-from app.utils.csv_processor import parse_csv_file, validate_batch_size
+from app.utils.csv_processor import iter_csv_batches, validate_batch_size, DEFAULT_BATCH_SIZE
 from app.routes.sql_routes import router as sql_router
 
 # Crear la aplicación FastAPI
@@ -49,16 +49,18 @@ async def root():
 
 # Endpoint para cargar datos desde una ruta de archivo CSV
 @app.post("/upload-from-path/{table_name}")
-async def upload_csv_from_path(table_name: str, file_path: str = Body(..., embed=True)):
+async def upload_csv_from_path(table_name: str, file_path: str = Body(..., embed=True),
+                               batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1)):
     """
     Carga un archivo CSV desde una ruta específica en la tabla especificada.
     
     Args:
         table_name: Nombre de la tabla donde cargar los datos (departments, jobs, hired_employees).
         file_path: Ruta al archivo CSV en el sistema de archivos.
+        batch_size: Número de registros por lote de inserción.
         
     Returns:
-        Mensaje de éxito y número de registros insertados.
+        Mensaje de éxito, número de registros insertados y número de lotes.
     """
     # Validar el nombre de la tabla
     valid_tables = ["departments", "jobs", "hired_employees"]
@@ -76,28 +78,28 @@ async def upload_csv_from_path(table_name: str, file_path: str = Body(..., embed
                 detail=f"El archivo {file_path} no existe"
             )
         
-        # Procesar el archivo CSV
-        data = parse_csv_file(file_path)
+        # Procesar el archivo CSV en lotes e insertarlos a medida que se leen
+        batches = iter_csv_batches(file_path, batch_size, table_name)
+        db_manager = DatabaseManager()
+        inserted_count, batch_count = db_manager.insert_batches(table_name, batches)
         
-        # Validar el tamaño del lote
-        if not validate_batch_size(data):
+        if batch_count == 0:
             raise HTTPException(
                 status_code=400,
-                detail="El tamaño del lote debe estar entre 1 y 1000 registros"
+                detail="El archivo CSV no contiene registros"
             )
         
-        # Insertar los datos en la base de datos
-        db_manager = DatabaseManager()
-        inserted_count = db_manager.insert_batch(table_name, data)
-        
         return JSONResponse(
             status_code=201,
             content={
                 "message": f"Archivo CSV cargado exitosamente en la tabla {table_name}",
-                "records_inserted": inserted_count
+                "records_inserted": inserted_count,
+                "batches": batch_count
             }
         )
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -2,18 +2,39 @@
 Configuración principal de la API REST con integración de rutas SQL
 y soporte para ambos métodos de carga (archivo y ruta)
 """
-from fastapi import FastAPI, UploadFile, File, HTTPException, Body
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, UploadFile, File, HTTPException, Body, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 import os
-import tempfile
 import shutil
-from typing import List, Dict, Any, Optional
+import tempfile
+import uuid
+from typing import List, Dict, Any, Optional, Callable
 
 # Importar módulos propios
 from app.database.create_db import create_database
-from app.database.db_manager import DatabaseManager
-from app.utils.csv_processor import parse_csv_file, validate_batch_size
+from app.database.async_db import AsyncDatabase
+from app.database.db_manager import DEFAULT_FETCH_SIZE, DatabaseManager
+from app.database.group_commit import GroupCommitWriter
+from app.database.fingerprints import (
+    MODE_INSERT, MODE_UPSERT, WRITE_MODES, FingerprintStore, file_fingerprint, stream_fingerprint
+)
+from app.database.import_jobs import ImportJobConflictError, ImportJobStore, run_import_job
+from app.database.quarantine import QuarantineStore, insert_with_quarantine
+from app.database.schema import get_schema
+from app.utils import db_utils
+from app.utils.background_jobs import BackgroundJobManager, JobProgress, JobQueueFullError
+from app.utils.compression import detect_file_compression
+from app.utils.column_batch import ColumnBatch
+from app.utils.csv_processor import iter_csv_batches, iter_stream_batches, validate_batch_size, DEFAULT_BATCH_SIZE
+from app.utils.export import EXPORT_CSV, EXPORT_MEDIA_TYPES, csv_chunk, ndjson_chunk, validate_export_format
+from app.utils.ndjson_processor import NDJSONError, iter_ndjson_batches
+from app.utils.parallel_csv import iter_csv_batches_parallel
+from app.utils.row_validation import ERROR_POLICIES, ON_ERROR_QUARANTINE, RowValidationError, dry_run_report
+from app.utils.streaming import ChunkStream
 from app.routes.sql_routes import router as sql_router
 
 # Variables globales para modo de prueba
@@ -42,13 +63,232 @@ app.add_middleware(
 # Función para obtener el gestor de base de datos
 def get_db_manager():
     """
-    Obtiene una instancia del gestor de base de datos.
+    Obtiene el gestor de base de datos compartido, con su pool de conexiones.
     En modo de prueba, devuelve la instancia configurada para pruebas.
     """
     global test_db_manager
     if test_mode and test_db_manager:
         return test_db_manager
-    return DatabaseManager()
+    return db_utils.get_db_manager()
+
+def get_async_db() -> AsyncDatabase:
+    """
+    Obtiene el acceso asíncrono al gestor de base de datos: las lecturas se
+    ejecutan en los hilos de lectura y las escrituras en el carril de
+    escritura, sin bloquear el bucle de eventos.
+    """
+    return AsyncDatabase(get_db_manager(), db_utils.get_database_lanes())
+
+# Importaciones en segundo plano, ejecutadas en un conjunto acotado de hilos
+job_manager = BackgroundJobManager(
+    max_workers=int(os.environ.get("IMPORT_JOB_WORKERS", "2")),
+    max_pending=int(os.environ.get("IMPORT_JOB_MAX_PENDING", "16"))
+)
+
+# Escritor que agrupa en una sola transacción los lotes de /batch que llegan a la vez
+batch_writer = GroupCommitWriter(
+    db_utils.get_database_lanes(),
+    window=float(os.environ.get("BATCH_COMMIT_WINDOW_MS", "5")) / 1000
+)
+
+# Número máximo de cuerpos de petición que se procesan a la vez en streaming
+# (/upload-stream y /batch-stream), cada uno en un hilo de stream_executor
+MAX_CONCURRENT_STREAMS = int(os.environ.get("MAX_CONCURRENT_STREAMS", "8"))
+stream_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_STREAMS, thread_name_prefix="request-stream")
+
+def submit_import_job(table_name: str, file_path: str, batch_size: int,
+                      job_id: Optional[str] = None, cleanup_file: bool = False,
+                      on_error: str = ON_ERROR_QUARANTINE,
+                      fingerprint: Optional[str] = None) -> JSONResponse:
+    """
+    Encola la importación de un archivo y devuelve la respuesta 202 con el
+    identificador del trabajo.
+    
+    Args:
+        table_name: Tabla de destino.
+        file_path: Ruta al archivo CSV.
+        batch_size: Número de registros por lote.
+        job_id: Identificador del trabajo (opcional; si ya existe, se reanuda).
+        cleanup_file: Si es True, el archivo se elimina al terminar el trabajo.
+        on_error: Política ante filas no válidas ('quarantine' o 'abort').
+        fingerprint: Huella del archivo en una carga upsert (None en modo insert);
+                     se guarda al completar el trabajo.
+        
+    Returns:
+        Respuesta 202 con el identificador y la URL de estado del trabajo.
+    """
+    job_id = job_id or uuid.uuid4().hex
+    current = job_manager.get(job_id)
+    if current is not None and current.status in ("queued", "running"):
+        raise HTTPException(status_code=409, detail=f"El trabajo {job_id} ya está en curso")
+    
+    db = get_async_db()
+    db_manager = db.db_manager
+    # En los archivos comprimidos los offsets se cuentan sobre el contenido
+    # descomprimido, cuyo tamaño no se conoce de antemano: no se estima el tiempo restante
+    bytes_total = None if detect_file_compression(file_path) else os.path.getsize(file_path)
+    progress = JobProgress(job_id, table_name, bytes_total)
+    
+    def task(progress: JobProgress) -> Dict[str, Any]:
+        try:
+            # El archivo se lee en el hilo del trabajo; solo las escrituras pasan por el carril de escritura
+            result = run_import_job(db_manager, table_name, file_path, batch_size, job_id, progress,
+                                    on_error, upsert=fingerprint is not None, run_write=db.write_blocking)
+            if fingerprint is not None:
+                db.write_blocking(
+                    lambda: FingerprintStore(db_manager).record(table_name, fingerprint, result["total_records"])
+                )
+            return result
+        finally:
+            if cleanup_file and os.path.exists(file_path):
+                os.unlink(file_path)
+    
+    try:
+        job_manager.submit(progress, task)
+    except JobQueueFullError as e:
+        if cleanup_file:
+            os.unlink(file_path)
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    return JSONResponse(
+        status_code=202,
+        content={
+            "message": f"Importación en la tabla {table_name} encolada",
+            "job_id": job_id,
+            "status_url": f"/jobs/{job_id}"
+        },
+        headers={"Location": f"/jobs/{job_id}"}
+    )
+
+def validate_load_options(on_error: str, dry_run: bool = False, background: bool = False,
+                          mode: str = MODE_INSERT, bulk: bool = False):
+    """
+    Valida las opciones de una carga.
+    
+    Args:
+        on_error: Política ante filas no válidas.
+        dry_run: Si la carga solo se valida.
+        background: Si la carga se ejecuta en segundo plano.
+        mode: Modo de escritura ('insert' o 'upsert').
+        bulk: Si la carga se hace en una sesión de carga masiva.
+    """
+    if mode not in WRITE_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"mode no válido. Debe ser uno de: {', '.join(WRITE_MODES)}"
+        )
+    if on_error not in ERROR_POLICIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"on_error no válido. Debe ser uno de: {', '.join(ERROR_POLICIES)}"
+        )
+    if dry_run and background:
+        raise HTTPException(
+            status_code=400,
+            detail="dry_run no está disponible con background"
+        )
+    if bulk and background:
+        raise HTTPException(
+            status_code=400,
+            detail="bulk no está disponible con background"
+        )
+
+def skip_if_unchanged(db_manager: DatabaseManager, table_name: str, fingerprint: str,
+                      force: bool) -> Optional[JSONResponse]:
+    """
+    Prepara una carga upsert a partir de la huella del archivo. Si el archivo es
+    idéntico al último cargado en la tabla (y no se fuerza la carga), devuelve la
+    respuesta que la omite; si no, invalida la huella anterior, ya que la carga
+    va a modificar la tabla.
+    
+    Args:
+        db_manager: Gestor de base de datos.
+        table_name: Tabla de destino.
+        fingerprint: Huella del archivo.
+        force: Si es True, el archivo se carga aunque sea idéntico.
+        
+    Returns:
+        Respuesta 200 si la carga se omite, o None si hay que cargar el archivo.
+    """
+    fingerprints = FingerprintStore(db_manager)
+    current = None if force else fingerprints.matches(table_name, fingerprint)
+    if current is None:
+        fingerprints.clear(table_name)
+        return None
+    
+    return JSONResponse(
+        status_code=200,
+        content={
+            "message": f"El archivo es idéntico al último cargado en la tabla {table_name}; no se ha modificado nada",
+            "unchanged": True,
+            "records_inserted": 0,
+            "fingerprint": fingerprint,
+            "loaded_at": current["loaded_at"],
+            "records": current["records"]
+        }
+    )
+
+async def consume_request_body(request: Request, consume: Callable[[ChunkStream], Any]) -> Any:
+    """
+    Pasa el cuerpo de la petición a una función que lo lee en un hilo de trabajo
+    a medida que se recibe, a través de un ChunkStream acotado.
+    
+    Los consumidores se ejecutan en stream_executor, no en el conjunto de
+    hilos de run_in_threadpool, y los fragmentos se encolan desde el bucle de
+    eventos sin ocupar ningún hilo: cuando la cola está llena se espera a que
+    el consumidor lea. Así, los flujos abiertos nunca agotan los hilos que
+    necesitan para avanzar; por encima de MAX_CONCURRENT_STREAMS, los
+    siguientes esperan a que termine alguno.
+    
+    consume espera a los bytes del cliente, por lo que no se ejecuta en el
+    carril de escritura: si escribe en la base de datos, debe enviar allí cada
+    escritura por separado (ver AsyncDatabase.write_blocking), para que un
+    cliente lento no detenga las demás escrituras.
+    
+    Args:
+        request: Petición cuyo cuerpo se va a leer.
+        consume: Función que recibe el flujo y lo consume por completo.
+        
+    Returns:
+        El resultado de consume.
+    """
+    loop = asyncio.get_running_loop()
+    space = asyncio.Event()
+    stream = ChunkStream(on_space=lambda: loop.call_soon_threadsafe(space.set))
+    
+    async def feed(chunk: bytes):
+        while True:
+            # Se limpia antes de intentarlo: una lectura posterior vuelve a activarlo
+            space.clear()
+            if stream.offer(chunk):
+                return
+            await space.wait()
+    
+    def read_all():
+        try:
+            return consume(stream)
+        finally:
+            stream.close()
+    
+    loader = loop.run_in_executor(stream_executor, read_all)
+    try:
+        async for chunk in request.stream():
+            if chunk:
+                await feed(chunk)
+        await feed(b'')
+    except BrokenPipeError:
+        # El consumidor terminó antes (normalmente por un error); se informa abajo
+        pass
+    except asyncio.CancelledError as e:
+        # La petición se ha cancelado: el consumidor se detiene y libera su hilo
+        stream.fail(e)
+        raise
+    except Exception as e:
+        stream.fail(e)
+        await asyncio.gather(loader, return_exceptions=True)
+        raise
+    
+    return await loader
 
 # Inicializar la base de datos al iniciar la aplicación
 @app.on_event("startup")
@@ -64,6 +304,16 @@ async def startup_event():
     else:
         print("Aplicación iniciada en modo de prueba")
 
+@app.on_event("shutdown")
+def shutdown_event():
+    """
+    Evento de cierre de la aplicación.
+    Espera a que terminen las importaciones en segundo plano y cierra las
+    conexiones del pool.
+    """
+    job_manager.shutdown()
+    db_utils.close_db_manager()
+
 # Endpoint para verificar el estado de la API
 @app.get("/")
 async def root():
@@ -77,16 +327,43 @@ async def root():
 
 # Endpoint para cargar un archivo CSV
 @app.post("/upload/{table_name}")
-async def upload_csv(table_name: str, file: UploadFile = File(...)):
+async def upload_csv(table_name: str, file: UploadFile = File(...),
+                     batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1),
+                     background: bool = Query(False),
+                     on_error: str = Query(ON_ERROR_QUARANTINE),
+                     dry_run: bool = Query(False),
+                     mode: str = Query(MODE_INSERT),
+                     force: bool = Query(False),
+                     bulk: bool = Query(False)):
     """
     Carga un archivo CSV en la tabla especificada.
     
     Args:
         table_name: Nombre de la tabla donde cargar los datos (departments, jobs, hired_employees).
         file: Archivo CSV a cargar.
+        batch_size: Número de registros por lote de inserción.
+        background: Si es True, la importación se encola y se responde 202 con el
+                    identificador del trabajo; el progreso se consulta en /jobs/{job_id}.
+                    El archivo se guarda en disco hasta que termine el trabajo.
+        on_error: Qué hacer con las filas no válidas: 'quarantine' (por defecto)
+                  las guarda en rejected_rows y carga el resto; 'abort' detiene
+                  la carga con 400 en el primer lote que las contenga.
+        dry_run: Si es True, solo se valida el archivo y se informa de las filas
+                 no válidas, sin escribir nada.
+        mode: 'insert' (por defecto) o 'upsert': los registros cuyo id ya existe
+              se actualizan, solo si algún valor ha cambiado. En modo upsert, un
+              archivo idéntico al último cargado en la tabla no se vuelve a cargar.
+        force: Si es True, el archivo se carga en modo upsert aunque sea idéntico.
+        bulk: Si es True, el archivo se carga en una sesión de carga masiva: una
+              sola transacción con un perfil de PRAGMAs para cargas grandes y los
+              índices secundarios reconstruidos al final. Si la carga falla no
+              queda ningún lote confirmado.
         
     Returns:
-        Mensaje de éxito y número de registros insertados.
+        Mensaje de éxito, número de registros insertados y descartados, número
+        de lotes e identificador de la carga (para consultar /rejected/{load_id}).
+        En modo upsert, records_inserted cuenta los registros insertados o
+        actualizados y records_unchanged los que no cambiaron.
     """
     # Validar el nombre de la tabla
     valid_tables = ["departments", "jobs", "hired_employees"]
@@ -96,54 +373,117 @@ async def upload_csv(table_name: str, file: UploadFile = File(...)):
             detail=f"Tabla no válida. Debe ser una de: {', '.join(valid_tables)}"
         )
     
-    # Guardar el archivo temporalmente
-    temp_file = tempfile.NamedTemporaryFile(delete=False)
+    validate_load_options(on_error, dry_run, background, mode, bulk)
+    upsert = mode == MODE_UPSERT and not dry_run
+    db = get_async_db()
+    db_manager = db.db_manager
+    
+    fingerprint = None
+    if upsert:
+        # El archivo subido ya está en un archivo temporal de Starlette: se calcula
+        # su huella y se vuelve al principio para cargarlo
+        fingerprint = await run_in_threadpool(stream_fingerprint, file.file)
+        await run_in_threadpool(file.file.seek, 0)
+        unchanged = await db.write(skip_if_unchanged, db_manager, table_name, fingerprint, force)
+        if unchanged is not None:
+            return unchanged
+    
+    if background:
+        # El trabajo sobrevive a la petición, así que necesita su propia copia del archivo
+        def spool() -> str:
+            with tempfile.NamedTemporaryFile(delete=False, suffix=".csv") as temp_file:
+                shutil.copyfileobj(file.file, temp_file)
+                return temp_file.name
+        return submit_import_job(table_name, await run_in_threadpool(spool), batch_size,
+                                 cleanup_file=True, on_error=on_error, fingerprint=fingerprint)
+    
     try:
-        shutil.copyfileobj(file.file, temp_file)
-        temp_file.close()
+        # Procesar el archivo subido directamente, sin copiarlo a un archivo temporal
+        batches = iter_stream_batches(file.file, table_name, batch_size)
+        if dry_run:
+            return JSONResponse(status_code=200, content=await run_in_threadpool(dry_run_report, batches))
+        
+        load_id = uuid.uuid4().hex
+        
+        # El archivo se parsea en un hilo de trabajo: solo las inserciones ocupan el carril de escritura
+        def load() -> Dict[str, int]:
+            loaded = insert_with_quarantine(db_manager, table_name, batches, load_id, on_error, upsert, bulk,
+                                            run_write=db.write_blocking)
+            if fingerprint is not None:
+                records = loaded["records_inserted"] + loaded["records_unchanged"]
+                db.write_blocking(lambda: FingerprintStore(db_manager).record(table_name, fingerprint, records))
+            return loaded
         
-        # Procesar el archivo CSV
-        data = parse_csv_file(temp_file.name)
+        loaded = await run_in_threadpool(load)
         
-        # Validar el tamaño del lote
-        if not validate_batch_size(data):
+        if loaded["batches"] == 0:
             raise HTTPException(
                 status_code=400,
-                detail="El tamaño del lote debe estar entre 1 y 1000 registros"
+                detail="El archivo CSV no contiene registros"
             )
         
-        # Insertar los datos en la base de datos
-        db_manager = get_db_manager()
-        inserted_count = db_manager.insert_batch(table_name, data)
-        
         return JSONResponse(
             status_code=201,
             content={
                 "message": f"Archivo CSV cargado exitosamente en la tabla {table_name}",
-                "records_inserted": inserted_count
+                "load_id": load_id,
+                **loaded
             }
         )
     
+    except HTTPException:
+        raise
+    except RowValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    
-    finally:
-        # Eliminar el archivo temporal
-        if os.path.exists(temp_file.name):
-            os.unlink(temp_file.name)
 
 # Endpoint para cargar datos desde una ruta de archivo CSV (alternativa sin python-multipart)
 @app.post("/upload-from-path/{table_name}")
-async def upload_csv_from_path(table_name: str, file_path: str = Body(..., embed=True)):
+async def upload_csv_from_path(table_name: str, file_path: str = Body(..., embed=True),
+                               job_id: Optional[str] = Body(None, embed=True),
+                               batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1),
+                               workers: int = Query(1, ge=1),
+                               background: bool = Query(False),
+                               on_error: str = Query(ON_ERROR_QUARANTINE),
+                               dry_run: bool = Query(False),
+                               mode: str = Query(MODE_INSERT),
+                               force: bool = Query(False),
+                               bulk: bool = Query(False)):
     """
     Carga un archivo CSV desde una ruta específica en la tabla especificada.
     
+    La carga secuencial se registra como un trabajo de importación que guarda un
+    punto de control (offset en bytes, registros y último id) en la misma
+    transacción que cada lote. Si se repite la petición con el mismo job_id tras
+    un fallo, la carga se reanuda desde el último punto de control.
+    
     Args:
         table_name: Nombre de la tabla donde cargar los datos (departments, jobs, hired_employees).
         file_path: Ruta al archivo CSV en el sistema de archivos.
+        job_id: Identificador del trabajo a reanudar (opcional).
+        batch_size: Número de registros por lote de inserción.
+        workers: Número de procesos para parsear el archivo. Con más de uno, el
+                 archivo se divide en rangos de bytes que se parsean en paralelo
+                 y se insertan en orden desde un único escritor (sin puntos de control).
+                 Los archivos comprimidos (gzip, bz2, xz) se leen siempre de forma secuencial.
+                 Se usan como mucho tantos procesos como núcleos (MAX_WORKERS).
+        background: Si es True, la importación se encola y se responde 202 con el
+                    identificador del trabajo; el progreso se consulta en /jobs/{job_id}.
+        on_error: Qué hacer con las filas no válidas: 'quarantine' (por defecto)
+                  las guarda en rejected_rows y carga el resto; 'abort' detiene
+                  la carga con 400 en el primer lote que las contenga.
+        dry_run: Si es True, solo se valida el archivo y se informa de las filas
+                 no válidas, sin escribir nada (admite workers).
+        mode: 'insert' (por defecto) o 'upsert', como en /upload.
+        force: Si es True, el archivo se carga en modo upsert aunque sea idéntico.
+        bulk: Si es True, el archivo se carga en una sesión de carga masiva, como
+              en /upload (admite workers; sin puntos de control ni reanudación).
         
     Returns:
-        Mensaje de éxito y número de registros insertados.
+        Mensaje de éxito, número de registros insertados y descartados, número
+        de lotes e identificador de la carga, y en la carga secuencial el
+        progreso del trabajo (cuyo job_id es también el identificador de la carga).
     """
     # Validar el nombre de la tabla
     valid_tables = ["departments", "jobs", "hired_employees"]
@@ -161,40 +501,247 @@ async def upload_csv_from_path(table_name: str, file_path: str = Body(..., embed
                 detail=f"El archivo {file_path} no existe"
             )
         
-        # Procesar el archivo CSV
-        data = parse_csv_file(file_path)
+        validate_load_options(on_error, dry_run, background, mode, bulk)
         
-        # Validar el tamaño del lote
-        if not validate_batch_size(data):
+        if background and workers > 1:
             raise HTTPException(
                 status_code=400,
-                detail="El tamaño del lote debe estar entre 1 y 1000 registros"
+                detail="La importación en segundo plano solo está disponible con workers=1"
             )
         
-        # Insertar los datos en la base de datos
-        db_manager = get_db_manager()
-        inserted_count = db_manager.insert_batch(table_name, data)
+        if dry_run:
+            if workers > 1:
+                batches = iter_csv_batches_parallel(file_path, batch_size, workers, table_name=table_name)
+            else:
+                batches = iter_csv_batches(file_path, batch_size, table_name)
+            return JSONResponse(status_code=200, content=await run_in_threadpool(dry_run_report, batches))
+        
+        db = get_async_db()
+        db_manager = db.db_manager
+        upsert = mode == MODE_UPSERT
+        
+        fingerprint = None
+        if upsert:
+            fingerprint = await run_in_threadpool(file_fingerprint, file_path)
+            unchanged = await db.write(skip_if_unchanged, db_manager, table_name, fingerprint, force)
+            if unchanged is not None:
+                return unchanged
+        
+        if background:
+            return submit_import_job(table_name, file_path, batch_size, job_id,
+                                     on_error=on_error, fingerprint=fingerprint)
+        
+        if (workers > 1 or bulk) and job_id is not None:
+            raise HTTPException(
+                status_code=400,
+                detail="La reanudación por job_id solo está disponible con workers=1 y sin bulk"
+            )
+        
+        def load():
+            if workers > 1 or bulk:
+                if workers > 1:
+                    # Parsear en paralelo e insertar los lotes en orden desde este proceso
+                    batches = iter_csv_batches_parallel(file_path, batch_size, workers, table_name=table_name)
+                else:
+                    batches = iter_csv_batches(file_path, batch_size, table_name)
+                load_id = uuid.uuid4().hex
+                loaded = insert_with_quarantine(db_manager, table_name, batches, load_id, on_error, upsert, bulk,
+                                                run_write=db.write_blocking)
+                job = None
+                records = loaded["records_inserted"] + loaded.get("records_unchanged", 0)
+            else:
+                # Procesar el archivo en lotes, con un punto de control tras cada lote
+                job = run_import_job(db_manager, table_name, file_path, batch_size, job_id,
+                                     on_error=on_error, upsert=upsert, run_write=db.write_blocking)
+                load_id = job["job_id"]
+                loaded = {key: job[key] for key in ("records_inserted", "records_rejected", "batches")}
+                records = job["total_records"]
+            
+            if fingerprint is not None:
+                db.write_blocking(lambda: FingerprintStore(db_manager).record(table_name, fingerprint, records))
+            return load_id, loaded, job
+        
+        # El archivo se parsea en un hilo de trabajo: solo las inserciones ocupan el carril de escritura
+        load_id, loaded, job = await run_in_threadpool(load)
+        
+        if loaded["batches"] == 0 and (job is None or job["total_records"] == 0):
+            raise HTTPException(
+                status_code=400,
+                detail="El archivo CSV no contiene registros"
+            )
+        
+        content = {
+            "message": f"Archivo CSV cargado exitosamente en la tabla {table_name}",
+            "load_id": load_id,
+            **loaded
+        }
+        if job is not None:
+            content.update({
+                "job_id": job["job_id"],
+                "resumed_from_offset": job["resumed_from_offset"],
+                "total_records": job["total_records"]
+            })
+        
+        return JSONResponse(status_code=201, content=content)
+    
+    except HTTPException:
+        raise
+    except RowValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ImportJobConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Endpoint para cargar un CSV enviado como cuerpo de la petición, procesándolo mientras llega
+@app.post("/upload-stream/{table_name}")
+async def upload_csv_stream(table_name: str, request: Request,
+                            batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1),
+                            on_error: str = Query(ON_ERROR_QUARANTINE),
+                            dry_run: bool = Query(False),
+                            mode: str = Query(MODE_INSERT)):
+    """
+    Carga en la tabla especificada un CSV enviado como cuerpo crudo de la petición
+    (por ejemplo, con Content-Type: text/csv). Los bytes se decodifican y se parsean
+    en un hilo de trabajo a medida que se reciben, de modo que la inserción del
+    primer lote se solapa con la subida y el archivo nunca se escribe en disco.
+    
+    Args:
+        table_name: Nombre de la tabla donde cargar los datos (departments, jobs, hired_employees).
+        request: Petición cuyo cuerpo contiene el CSV.
+        batch_size: Número de registros por lote de inserción.
+        on_error: Política ante filas no válidas ('quarantine' o 'abort'), como en /upload.
+        dry_run: Si es True, solo se valida el CSV, sin escribir nada.
+        mode: 'insert' (por defecto) o 'upsert'. El cuerpo no se conoce hasta
+              recibirlo entero, así que no se compara con la huella de la última carga.
+        
+    Returns:
+        Mensaje de éxito, número de registros insertados y descartados, número
+        de lotes e identificador de la carga.
+    """
+    # Validar el nombre de la tabla
+    valid_tables = ["departments", "jobs", "hired_employees"]
+    if table_name not in valid_tables:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Tabla no válida. Debe ser una de: {', '.join(valid_tables)}"
+        )
+    
+    validate_load_options(on_error, dry_run, mode=mode)
+    
+    db = get_async_db()
+    db_manager = db.db_manager
+    load_id = uuid.uuid4().hex
+    upsert = mode == MODE_UPSERT and not dry_run
+    
+    def load(stream: ChunkStream):
+        batches = iter_stream_batches(stream, table_name, batch_size)
+        if dry_run:
+            return dry_run_report(batches)
+        if upsert:
+            db.write_blocking(lambda: FingerprintStore(db_manager).clear(table_name))
+        return insert_with_quarantine(db_manager, table_name, batches, load_id, on_error, upsert,
+                                      run_write=db.write_blocking)
+    
+    try:
+        loaded = await consume_request_body(request, load)
+        if dry_run:
+            return JSONResponse(status_code=200, content=loaded)
+        
+        if loaded["batches"] == 0:
+            raise HTTPException(
+                status_code=400,
+                detail="El archivo CSV no contiene registros"
+            )
         
         return JSONResponse(
             status_code=201,
             content={
                 "message": f"Archivo CSV cargado exitosamente en la tabla {table_name}",
-                "records_inserted": inserted_count
+                "load_id": load_id,
+                **loaded
             }
         )
     
+    except HTTPException:
+        raise
+    except RowValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Endpoint para cargar las tres tablas en una sola petición y una sola transacción
+@app.post("/upload-bundle")
+async def upload_bundle(departments: UploadFile = File(...), jobs: UploadFile = File(...),
+                        hired_employees: UploadFile = File(...),
+                        batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1)):
+    """
+    Carga los CSV de departments, jobs y hired_employees en una sola transacción.
+    
+    Los tres archivos se parsean en paralelo en hilos de trabajo, antes de
+    ocupar el carril de escritura; después se insertan las tablas de
+    dimensiones (departments y jobs), seguidas de hired_employees, en una
+    única conexión y con un único commit. Si cualquier archivo falla, o contiene una
+    fila no válida (400), no se guarda nada.
+    
+    Args:
+        departments: Archivo CSV de departamentos.
+        jobs: Archivo CSV de trabajos.
+        hired_employees: Archivo CSV de empleados contratados.
+        batch_size: Número de registros por lote de inserción.
+        
+    Returns:
+        Mensaje de éxito y número de registros insertados en cada tabla.
+    """
+    files = {"departments": departments, "jobs": jobs, "hired_employees": hired_employees}
+    db = get_async_db()
+    
+    def parse() -> Dict[str, List[ColumnBatch]]:
+        # La carga es una sola transacción: los archivos se parsean por completo
+        # antes, para no mantener el bloqueo de escritura mientras se leen
+        with ThreadPoolExecutor(max_workers=len(files)) as pool:
+            futures = {
+                table_name: pool.submit(
+                    lambda upload, table_name: list(iter_stream_batches(upload.file, table_name, batch_size)),
+                    upload, table_name
+                )
+                for table_name, upload in files.items()
+            }
+            return {table_name: future.result() for table_name, future in futures.items()}
+    
+    try:
+        batches_by_table = await run_in_threadpool(parse)
+        inserted = await db.write(db.db_manager.insert_bundle, batches_by_table)
+        
+        return JSONResponse(
+            status_code=201,
+            content={
+                "message": "Archivos CSV cargados exitosamente en una sola transacción",
+                "records_inserted": inserted
+            }
+        )
+    
+    except RowValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # Endpoint para insertar un lote de registros
 @app.post("/batch/{table_name}")
-async def insert_batch(table_name: str, data: List[Dict[str, Any]] = Body(...)):
+async def insert_batch(table_name: str, data: List[Dict[str, Any]] = Body(...),
+                       mode: str = Query(MODE_INSERT)):
     """
     Inserta un lote de registros en la tabla especificada.
     
+    Los lotes que llegan a la vez se insertan en una transacción compartida
+    (ver GroupCommitWriter); la respuesta se envía cuando esa transacción se
+    ha confirmado. Un lote no válido solo hace fallar su propia petición.
+    
     Args:
         table_name: Nombre de la tabla donde insertar los datos (departments, jobs, hired_employees).
         data: Lista de diccionarios con los datos a insertar.
+        mode: 'insert' (por defecto) o 'upsert': los registros cuyo id ya existe
+              se actualizan, solo si algún valor ha cambiado.
         
     Returns:
         Mensaje de éxito y número de registros insertados.
@@ -214,10 +761,19 @@ async def insert_batch(table_name: str, data: List[Dict[str, Any]] = Body(...)):
             detail="El tamaño del lote debe estar entre 1 y 1000 registros"
         )
     
+    if mode not in WRITE_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"mode no válido. Debe ser uno de: {', '.join(WRITE_MODES)}"
+        )
+    
     try:
         # Insertar los datos en la base de datos
-        db_manager = get_db_manager()
-        inserted_count = db_manager.insert_batch(table_name, data)
+        db = get_async_db()
+        if mode == MODE_UPSERT:
+            await db.write(lambda: FingerprintStore(db.db_manager).clear(table_name))
+        inserted_count = await batch_writer.insert_batch(db.db_manager, table_name, data,
+                                                         upsert=mode == MODE_UPSERT)
         
         return JSONResponse(
             status_code=201,
@@ -230,6 +786,256 @@ async def insert_batch(table_name: str, data: List[Dict[str, Any]] = Body(...)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Endpoint para consultar las estadísticas del escritor de /batch
+@app.get("/batch-writer/stats")
+async def get_batch_writer_stats():
+    """
+    Obtiene las estadísticas del escritor con confirmación agrupada de /batch.
+    
+    Returns:
+        Lotes en cola (actual y máximo), transacciones confirmadas y fallidas,
+        lotes y registros confirmados, y lotes y registros por transacción
+        (media y máximo).
+    """
+    return JSONResponse(status_code=200, content=batch_writer.stats())
+
+# Endpoint para insertar registros enviados como flujo NDJSON
+@app.post("/batch-stream/{table_name}")
+async def insert_batch_stream(table_name: str, request: Request,
+                              batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1)):
+    """
+    Inserta en la tabla especificada los registros de un cuerpo NDJSON
+    (Content-Type: application/x-ndjson), un objeto JSON por línea. El cuerpo
+    se lee a medida que llega y los registros se insertan en lotes de
+    batch_size, por lo que la memoria no depende de la longitud del flujo.
+    
+    Cada lote se confirma por separado: si una línea no es válida, la petición
+    falla con 400 indicando la línea, y los lotes anteriores quedan insertados.
+    
+    Args:
+        table_name: Nombre de la tabla donde insertar los datos (departments, jobs, hired_employees).
+        request: Petición cuyo cuerpo contiene los registros.
+        batch_size: Número de registros por lote de inserción.
+        
+    Returns:
+        Mensaje de éxito, número de registros insertados y número de lotes.
+    """
+    # Validar el nombre de la tabla
+    valid_tables = ["departments", "jobs", "hired_employees"]
+    if table_name not in valid_tables:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Tabla no válida. Debe ser una de: {', '.join(valid_tables)}"
+        )
+    
+    db = get_async_db()
+    loaded = {"records_inserted": 0, "batches": 0}
+    
+    def load(stream: ChunkStream):
+        for batch in iter_ndjson_batches(stream, table_name, batch_size):
+            loaded["records_inserted"] += db.write_blocking(db.db_manager.insert_batch, table_name, batch)
+            loaded["batches"] += 1
+    
+    try:
+        await consume_request_body(request, load)
+        
+        if loaded["batches"] == 0:
+            raise HTTPException(
+                status_code=400,
+                detail="El flujo NDJSON no contiene registros"
+            )
+        
+        return JSONResponse(
+            status_code=201,
+            content={
+                "message": f"Registros insertados exitosamente en la tabla {table_name}",
+                **loaded
+            }
+        )
+    
+    except HTTPException:
+        raise
+    except NDJSONError as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"{e}. Registros ya insertados: {loaded['records_inserted']}"
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Endpoint para consultar las filas descartadas de una carga
+@app.get("/rejected/{load_id}")
+async def get_rejected_rows(load_id: str, limit: int = Query(100, ge=1, le=1000),
+                            offset: int = Query(0, ge=0)):
+    """
+    Obtiene las filas que una carga descartó por no superar la validación.
+    
+    Args:
+        load_id: Identificador de la carga (o job_id de un trabajo de importación).
+        limit: Número máximo de filas a devolver.
+        offset: Número de filas a omitir.
+        
+    Returns:
+        Total de filas descartadas y las filas solicitadas, en orden de línea,
+        con sus valores originales y los motivos.
+    """
+    db = get_async_db()
+    
+    def fetch():
+        store = QuarantineStore(db.db_manager)
+        return store.count(load_id), store.get(load_id, limit, offset)
+    
+    try:
+        total, rows = await db.read(fetch)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    return JSONResponse(
+        status_code=200,
+        content={"load_id": load_id, "total": total, "rows": rows}
+    )
+
+# Endpoint para consultar el estado de un trabajo de importación
+@app.get("/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """
+    Obtiene el estado y el progreso de un trabajo de importación.
+    
+    Args:
+        job_id: Identificador del trabajo.
+        
+    Returns:
+        Estado del trabajo: filas leídas e insertadas, rendimiento y tiempo
+        restante estimado. Para trabajos lanzados por otro proceso (o antes de
+        un reinicio) se devuelve el último punto de control guardado.
+    """
+    progress = job_manager.get(job_id)
+    if progress is not None:
+        return JSONResponse(status_code=200, content=progress.snapshot())
+    
+    try:
+        db = get_async_db()
+        job = await db.read(lambda: ImportJobStore(db.db_manager).get(job_id))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"El trabajo {job_id} no existe")
+    
+    return JSONResponse(
+        status_code=200,
+        content={
+            "job_id": job["job_id"],
+            "table_name": job["table_name"],
+            "status": job["status"],
+            "rows_inserted": job["rows_inserted"],
+            "bytes_processed": job["byte_offset"],
+            "last_id": job["last_id"],
+            "error": job["error"],
+            "updated_at": job["updated_at"]
+        }
+    )
+
+# Endpoint para exportar una tabla
+@app.get("/export/{table_name}")
+async def export_table(table_name: str, export_format: str = Query(EXPORT_CSV, alias="format"),
+                       chunk_size: int = Query(DEFAULT_FETCH_SIZE, ge=1, le=100000)):
+    """
+    Exporta todos los registros de una tabla en CSV (sin cabecera, como los
+    archivos de carga) o NDJSON (como /batch-stream), ordenados por id.
+    
+    La respuesta se envía en streaming: las filas se leen de una instantánea
+    de la base de datos en bloques de chunk_size a medida que el cliente las
+    descarga (ver AsyncDatabase.stream_read), por lo que la memoria no depende
+    del tamaño de la tabla. hired_employees incluye los años archivados.
+    
+    Args:
+        table_name: Nombre de la tabla a exportar (departments, jobs, hired_employees).
+        export_format: Formato de la exportación (csv o ndjson).
+        chunk_size: Número de filas que se leen de cada vez.
+        
+    Returns:
+        Contenido de la tabla.
+    """
+    # Validar el nombre de la tabla
+    valid_tables = ["departments", "jobs", "hired_employees"]
+    if table_name not in valid_tables:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Tabla no válida. Debe ser una de: {', '.join(valid_tables)}"
+        )
+    try:
+        validate_export_format(export_format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    db = get_async_db()
+    columns = get_schema(table_name).column_names
+    try:
+        source, archive_years = table_name, None
+        if table_name == "hired_employees":
+            source, archive_years = await db.read(db.db_manager.hired_employees_history)
+        # La tabla se recorre en el orden del id (su rowid), sin ordenar; la
+        # vista con los años archivados se recorre partición a partición
+        order = "" if archive_years else " ORDER BY id"
+        chunks = db.stream_read(f"SELECT {', '.join(columns)} FROM {source}{order}",
+                                chunk_size=chunk_size, archive_years=archive_years)
+        # El primer bloque se lee antes de responder, para que un error de la
+        # consulta se devuelva como 500 y no como una respuesta cortada
+        first = await chunks.__anext__()
+    except StopAsyncIteration:
+        first = []
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    def encode(rows):
+        return csv_chunk(rows) if export_format == EXPORT_CSV else ndjson_chunk(columns, rows)
+    
+    async def body():
+        try:
+            yield encode(first)
+            async for rows in chunks:
+                yield encode(rows)
+        finally:
+            await chunks.aclose()
+    
+    return StreamingResponse(
+        body(),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{table_name}.{export_format}"'}
+    )
+
+# Endpoint para archivar un año de hired_employees
+@app.post("/archive/{year}")
+async def archive_year(year: int):
+    """
+    Traslada los empleados contratados en un año a su propio archivo de base
+    de datos, que se adjunta solo a las consultas que lo necesitan (ver
+    DatabaseManager.archive_year).
+    
+    Args:
+        year: Año de contratación que se archiva.
+        
+    Returns:
+        Número de registros trasladados.
+    """
+    try:
+        db = get_async_db()
+        records = await db.write(db.db_manager.archive_year, year)
+        return JSONResponse(
+            status_code=200,
+            content={
+                "message": f"Año {year} archivado exitosamente",
+                "year": year,
+                "records_archived": records
+            }
+        )
+    
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 # Endpoint para truncar una tabla
 @app.post("/truncate/{table_name}")
 async def truncate_table(table_name: str):
@@ -251,12 +1057,17 @@ async def truncate_table(table_name: str):
         )
     
     try:
-        # Truncar la tabla
-        db_manager = get_db_manager()
-        db_manager.execute_query(f"DELETE FROM {table_name}")
+        # Truncar la tabla, con su contador de autoincremento y, para
+        # hired_employees, su resumen
+        db = get_async_db()
+        await db.write(db.db_manager.truncate, table_name)
+        
+        # La tabla ya no contiene el último archivo cargado
+        await db.write(lambda: FingerprintStore(db.db_manager).clear(table_name))
         
-        # Reiniciar el contador de autoincremento (si se usa)
-        db_manager.execute_query(f"DELETE FROM sqlite_sequence WHERE name='{table_name}'")
+        # Los años archivados también forman parte de hired_employees
+        if table_name == "hired_employees":
+            await db.write(db.db_manager.drop_archives)
         
         return JSONResponse(
             status_code=200,
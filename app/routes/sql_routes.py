@@ -1,9 +1,11 @@
 """
 Rutas para consultas SQL específicas
 """
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import JSONResponse
-from app.utils.db_utils import get_db_manager  # Importar desde db_utils en lugar de main_updated
+import re
+from typing import NamedTuple, Optional, Sequence, Tuple
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import JSONResponse, Response
+from app.utils.db_utils import get_analytics, get_async_db, get_response_cache  # Importar desde db_utils en lugar de main_updated
 
 router = APIRouter(
     prefix="/sql",
@@ -21,115 +23,271 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
-@router.get("/employees-by-quarter")
-async def get_employees_by_quarter():
+# Año de contratación de los informes cuando no se indica otro periodo
+REPORT_YEAR = 2021
+
+# Granularidades de /employees-by-quarter: prefijo de las columnas de cada
+# periodo y número de meses por periodo
+GRANULARITY_QUARTER = 'quarter'
+GRANULARITY_MONTH = 'month'
+GRANULARITIES = {
+    GRANULARITY_QUARTER: ('Q', 3),
+    GRANULARITY_MONTH: ('M', 1),
+}
+
+class ReportPeriod(NamedTuple):
     """
-    Obtiene el número de empleados contratados para cada trabajo y departamento en 2021,
-    dividido por trimestres. La tabla está ordenada alfabéticamente por departamento y trabajo.
+    Periodo de un informe, de un mes inicial a uno final (ambos incluidos).
     """
-    try:
-        db_manager = get_db_manager() #DatabaseManager()
-        query = """
+    start_year: int
+    start_month: int
+    end_year: int
+    end_month: int
+
+    @classmethod
+    def for_year(cls, year: int) -> 'ReportPeriod':
+        return cls(year, 1, year, 12)
+
+    @property
+    def params(self) -> Tuple[int, int, int, int]:
+        """
+        Parámetros de PERIOD_FILTER: los años inicial y final, con los que se
+        busca en el índice del resumen, y los meses inicial y final como año * 100 + mes.
+        """
+        return (self.start_year, self.end_year,
+                self.start_year * 100 + self.start_month, self.end_year * 100 + self.end_month)
+
+def _parse_month(value: str, end: bool) -> Tuple[int, int]:
+    """
+    Convierte una fecha AAAA o AAAA-MM en año y mes. Un año sin mes empieza
+    en enero o, si es el final del periodo, termina en diciembre.
+    """
+    match = re.fullmatch(r'(\d{4})(?:-(\d{2}))?', value.strip())
+    if not match or not 1 <= int(match.group(2) or 1) <= 12:
+        raise ValueError(f"Fecha no válida: {value}. Debe tener el formato AAAA o AAAA-MM")
+    month = int(match.group(2)) if match.group(2) else (12 if end else 1)
+    return int(match.group(1)), month
+
+def parse_report_period(year: Optional[int] = None, start: Optional[str] = None,
+                        end: Optional[str] = None) -> ReportPeriod:
+    """
+    Obtiene el periodo de un informe a partir de los parámetros de la petición.
+    
+    Args:
+        year: Año del informe.
+        start: Inicio del periodo (AAAA o AAAA-MM), en lugar de year.
+        end: Fin del periodo (AAAA o AAAA-MM), incluido.
+        
+    Returns:
+        Periodo indicado, o el año REPORT_YEAR si no se indica ninguno.
+    """
+    if year is not None and (start is not None or end is not None):
+        raise ValueError("Indique un año o un periodo (from y to), no ambos")
+    if (start is None) != (end is None):
+        raise ValueError("El periodo necesita una fecha inicial (from) y una final (to)")
+    if start is None:
+        return ReportPeriod.for_year(REPORT_YEAR if year is None else year)
+    period = ReportPeriod(*_parse_month(start, end=False), *_parse_month(end, end=True))
+    if period.params[2] > period.params[3]:
+        raise ValueError("La fecha inicial del periodo (from) es posterior a la final (to)")
+    return period
+
+def validate_granularity(granularity: str) -> str:
+    """
+    Valida la granularidad de /employees-by-quarter.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Granularidad no válida. Debe ser una de: {', '.join(GRANULARITIES)}")
+    return granularity
+
+# Las consultas reciben los parámetros de ReportPeriod.params y leen el
+# resumen hired_employees_summary, que se mantiene al escribir en
+# hired_employees (ver app.database.create_db): su coste depende del número de
+# departamentos, trabajos y meses del periodo, no del de empleados
+PERIOD_FILTER = "s.hire_year BETWEEN ? AND ? AND s.hire_year * 100 + s.hire_month BETWEEN ? AND ?"
+
+def employees_by_period_query(granularity: str) -> str:
+    """
+    Consulta de los empleados contratados por departamento, trabajo, año y
+    periodo (trimestre o mes), con una columna por periodo.
+    """
+    prefix, months = GRANULARITIES[granularity]
+    # Cada periodo se define por sus meses, sin dividir: la división entera
+    # no se escribe igual en SQLite y en DuckDB
+    columns = ',\n        '.join(
+        f"SUM(CASE WHEN s.hire_month BETWEEN {first} AND {first + months - 1} THEN s.hired ELSE 0 END)"
+        f" AS {prefix}{period}"
+        for period, first in enumerate(range(1, 13, months), 1)
+    )
+    return f"""
+    SELECT 
+        d.department,
+        j.job,
+        s.hire_year,
+        {columns}
+    FROM 
+        hired_employees_summary s
+    JOIN 
+        departments d ON s.department_id = d.id
+    JOIN 
+        jobs j ON s.job_id = j.id
+    WHERE 
+        {PERIOD_FILTER}
+    GROUP BY 
+        d.department, j.job, s.hire_year
+    ORDER BY 
+        d.department, j.job, s.hire_year
+"""
+
+def employees_by_period_columns(granularity: str) -> Tuple[str, ...]:
+    """
+    Nombre de cada columna de employees_by_period_query en el JSON.
+    """
+    prefix, months = GRANULARITIES[granularity]
+    return ("department", "job", "year") + tuple(f"{prefix}{period}" for period in range(1, 12 // months + 1))
+
+# Empleados contratados por departamento, trabajo y periodo, por granularidad
+EMPLOYEES_BY_PERIOD_QUERIES = {granularity: employees_by_period_query(granularity) for granularity in GRANULARITIES}
+EMPLOYEES_BY_QUARTER_QUERY = EMPLOYEES_BY_PERIOD_QUERIES[GRANULARITY_QUARTER]
+
+# Departamentos que contrataron en el periodo más empleados que la media
+DEPARTMENTS_ABOVE_MEAN_QUERY = f"""
+    WITH department_hires AS (
         SELECT 
+            d.id,
             d.department,
-            j.job,
-            SUM(CASE WHEN strftime('%m', datetime) BETWEEN '01' AND '03' THEN 1 ELSE 0 END) AS Q1,
-            SUM(CASE WHEN strftime('%m', datetime) BETWEEN '04' AND '06' THEN 1 ELSE 0 END) AS Q2,
-            SUM(CASE WHEN strftime('%m', datetime) BETWEEN '07' AND '09' THEN 1 ELSE 0 END) AS Q3,
-            SUM(CASE WHEN strftime('%m', datetime) BETWEEN '10' AND '12' THEN 1 ELSE 0 END) AS Q4
+            SUM(s.hired) AS hired
         FROM 
-            hired_employees he
-        JOIN 
-            departments d ON he.department_id = d.id
+            hired_employees_summary s
         JOIN 
-            jobs j ON he.job_id = j.id
+            departments d ON s.department_id = d.id
         WHERE 
-            strftime('%Y', datetime) = '2021'
+            {PERIOD_FILTER}
         GROUP BY 
-            d.department, j.job
-        ORDER BY 
-            d.department, j.job
-        """
+            d.id, d.department
+    ),
+    avg_hires AS (
+        SELECT 
+            AVG(hired) AS mean_hired
+        FROM 
+            department_hires
+    )
+    SELECT 
+        dh.id,
+        dh.department,
+        dh.hired
+    FROM 
+        department_hires dh, 
+        avg_hires av
+    WHERE 
+        dh.hired > av.mean_hired
+    ORDER BY 
+        dh.hired DESC, dh.id
+"""
+
+async def cached_report(query: str, params: Sequence, columns: Sequence[str],
+                        if_none_match: Optional[str]) -> Response:
+    """
+    Responde a una consulta analítica desde la caché de respuestas (ver
+    app.utils.response_cache) mientras no cambien los datos, y la ejecuta y
+    guarda en caso contrario. Comprobar la versión de los datos solo lee
+    PRAGMA data_version, sin ejecutar la consulta.
+    
+    Args:
+        query: Consulta analítica.
+        params: Parámetros de la consulta.
+        columns: Nombre de cada columna del resultado en el JSON.
+        if_none_match: Cabecera If-None-Match de la petición.
         
-        result = db_manager.execute_query(query)
+    Returns:
+        El resultado en JSON con su ETag, o 304 Not Modified si el cliente ya
+        tiene esa versión.
+    """
+    db = get_async_db()
+    cache = get_response_cache()
+    analytics = get_analytics()
+    key = (query, tuple(params))
+    
+    # La versión se lee antes de ejecutar la consulta: si los datos cambian
+    # mientras tanto, la siguiente petición la vuelve a ejecutar. Incluye la
+    # de la réplica analítica, que puede actualizarse después que SQLite
+    version = (await db.read(db.db_manager.data_version), analytics.version)
+    cached = cache.get(key, version)
+    if cached is None:
+        result = await db.read(analytics.query, query, params)
         
         # Convertir el resultado a un formato JSON adecuado
-        formatted_result = []
-        for row in result:
-            formatted_result.append({
-                "department": row[0],
-                "job": row[1],
-                "Q1": row[2],
-                "Q2": row[3],
-                "Q3": row[4],
-                "Q4": row[5]
-            })
-        
-        return JSONResponse(
-            status_code=200,
-            content=formatted_result
+        formatted_result = [dict(zip(columns, row)) for row in result]
+        cached = cache.put(key, version, JSONResponse(content=formatted_result).body)
+    
+    # Los clientes pueden guardar la respuesta, pero deben revalidarla
+    headers = {"ETag": cached.etag, "Cache-Control": "no-cache"}
+    if cached.matches(if_none_match):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cached.body, status_code=200, media_type="application/json", headers=headers)
+
+@router.get("/employees-by-quarter")
+async def get_employees_by_quarter(year: Optional[int] = Query(None, ge=1, le=9999),
+                                   start: Optional[str] = Query(None, alias="from"),
+                                   end: Optional[str] = Query(None, alias="to"),
+                                   granularity: str = Query(GRANULARITY_QUARTER),
+                                   if_none_match: Optional[str] = Header(None)):
+    """
+    Obtiene el número de empleados contratados para cada trabajo y departamento en un año
+    (2021 por defecto) o un periodo, dividido por trimestres o meses. La tabla está ordenada
+    alfabéticamente por departamento y trabajo, con una fila por año.
+    
+    Se responde desde el resumen hired_employees_summary, sin recorrer
+    hired_employees, por lo que comparar varios años cuesta casi lo mismo que
+    consultar uno. Con ANALYTICS_BACKEND=duckdb se ejecuta sobre la réplica
+    en DuckDB (ver app.database.analytics). La respuesta lleva un ETag; con
+    If-None-Match se devuelve 304 si no ha cambiado.
+    
+    Args:
+        year: Año del informe.
+        start: Inicio del periodo (AAAA o AAAA-MM), en lugar de year.
+        end: Fin del periodo (AAAA o AAAA-MM), incluido.
+        granularity: 'quarter' (columnas Q1 a Q4) o 'month' (columnas M1 a M12).
+    """
+    try:
+        period = parse_report_period(year, start, end)
+        validate_granularity(granularity)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        return await cached_report(
+            EMPLOYEES_BY_PERIOD_QUERIES[granularity], period.params,
+            employees_by_period_columns(granularity), if_none_match
         )
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/departments-above-mean")
-async def get_departments_above_mean():
+async def get_departments_above_mean(year: Optional[int] = Query(None, ge=1, le=9999),
+                                     start: Optional[str] = Query(None, alias="from"),
+                                     end: Optional[str] = Query(None, alias="to"),
+                                     if_none_match: Optional[str] = Header(None)):
     """
     Obtiene la lista de IDs, nombres y número de empleados contratados de cada departamento
-    que contrató más empleados que la media de empleados contratados en 2021 para todos los departamentos,
+    que contrató más empleados que la media de empleados contratados en un año (2021 por
+    defecto) o un periodo para todos los departamentos,
     ordenada por el número de empleados contratados (descendente).
+    
+    Args:
+        year: Año del informe.
+        start: Inicio del periodo (AAAA o AAAA-MM), en lugar de year.
+        end: Fin del periodo (AAAA o AAAA-MM), incluido.
     """
     try:
-        db_manager = get_db_manager() #DatabaseManager()
-        query = """
-        WITH department_hires AS (
-            SELECT 
-                d.id,
-                d.department,
-                COUNT(*) AS hired
-            FROM 
-                hired_employees he
-            JOIN 
-                departments d ON he.department_id = d.id
-            WHERE 
-                strftime('%Y', datetime) = '2021'
-            GROUP BY 
-                d.id, d.department
-        ),
-        avg_hires AS (
-            SELECT 
-                AVG(hired) AS mean_hired
-            FROM 
-                department_hires
-        )
-        SELECT 
-            dh.id,
-            dh.department,
-            dh.hired
-        FROM 
-            department_hires dh, 
-            avg_hires av
-        WHERE 
-            dh.hired > av.mean_hired
-        ORDER BY 
-            dh.hired DESC
-        """
-        
-        result = db_manager.execute_query(query)
-        
-        # Convertir el resultado a un formato JSON adecuado
-        formatted_result = []
-        for row in result:
-            formatted_result.append({
-                "id": row[0],
-                "department": row[1],
-                "hired": row[2]
-            })
-        
-        return JSONResponse(
-            status_code=200,
-            content=formatted_result
+        period = parse_report_period(year, start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        return await cached_report(
+            DEPARTMENTS_ABOVE_MEAN_QUERY, period.params, ("id", "department", "hired"), if_none_match
         )
     
     except Exception as e:
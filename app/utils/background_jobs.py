@@ -0,0 +1,225 @@
+"""
+Ejecución de importaciones en segundo plano con seguimiento de progreso
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional
+
+# Estados de un trabajo en segundo plano
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_COMPLETED = 'completed'
+STATUS_FAILED = 'failed'
+
+class JobProgress:
+    """
+    Progreso de un trabajo de importación. Lo actualiza el hilo que ejecuta la
+    importación y lo lee el endpoint de estado.
+    """
+
+    def __init__(self, job_id: str, table_name: str, bytes_total: Optional[int] = None):
+        """
+        Inicializa el progreso de un trabajo en cola.
+
+        Args:
+            job_id: Identificador del trabajo.
+            table_name: Tabla de destino.
+            bytes_total: Tamaño del archivo, para estimar el tiempo restante.
+        """
+        self.job_id = job_id
+        self.table_name = table_name
+        self.bytes_total = bytes_total
+        self.status = STATUS_QUEUED
+        self.rows_parsed = 0
+        self.rows_inserted = 0
+        self.bytes_processed = 0
+        self.start_offset = 0
+        self.error: Optional[str] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.created_at = datetime.now(timezone.utc)
+        self._started: Optional[float] = None
+        self._finished: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def start(self, start_offset: int = 0):
+        """
+        Marca el trabajo como en ejecución.
+
+        Args:
+            start_offset: Offset desde el que se reanuda el archivo.
+        """
+        with self._lock:
+            self.status = STATUS_RUNNING
+            self.start_offset = start_offset
+            self.bytes_processed = start_offset
+            self._started = time.monotonic()
+
+    def parsed(self, rows: int):
+        """
+        Registra filas leídas del archivo y pendientes de insertar.
+        """
+        with self._lock:
+            self.rows_parsed += rows
+
+    def inserted(self, rows: int, byte_offset: Optional[int] = None):
+        """
+        Registra filas confirmadas en la base de datos.
+
+        Args:
+            rows: Número de filas confirmadas.
+            byte_offset: Offset del archivo alcanzado tras confirmarlas.
+        """
+        with self._lock:
+            self.rows_inserted += rows
+            if byte_offset is not None:
+                self.bytes_processed = byte_offset
+
+    def finish(self, result: Dict[str, Any]):
+        """
+        Marca el trabajo como completado.
+        """
+        with self._lock:
+            self.status = STATUS_COMPLETED
+            self.result = result
+            self._finished = time.monotonic()
+
+    def fail(self, error: str):
+        """
+        Marca el trabajo como fallido.
+        """
+        with self._lock:
+            self.status = STATUS_FAILED
+            self.error = error
+            self._finished = time.monotonic()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Devuelve el estado del trabajo, con rendimiento y tiempo restante estimado.
+
+        Returns:
+            Diccionario serializable como JSON.
+        """
+        with self._lock:
+            elapsed = None
+            rows_per_second = None
+            eta_seconds = None
+            if self._started is not None:
+                elapsed = (self._finished or time.monotonic()) - self._started
+                if elapsed > 0:
+                    rows_per_second = round(self.rows_inserted / elapsed, 1)
+                    bytes_done = self.bytes_processed - self.start_offset
+                    if self.status == STATUS_RUNNING and self.bytes_total and bytes_done > 0:
+                        remaining = max(self.bytes_total - self.bytes_processed, 0)
+                        eta_seconds = round(remaining / (bytes_done / elapsed), 1)
+                    elif self.status == STATUS_COMPLETED:
+                        eta_seconds = 0.0
+
+            return {
+                "job_id": self.job_id,
+                "table_name": self.table_name,
+                "status": self.status,
+                "rows_parsed": self.rows_parsed,
+                "rows_inserted": self.rows_inserted,
+                "bytes_processed": self.bytes_processed,
+                "bytes_total": self.bytes_total,
+                "elapsed_seconds": round(elapsed, 3) if elapsed is not None else None,
+                "rows_per_second": rows_per_second,
+                "eta_seconds": eta_seconds,
+                "created_at": self.created_at.isoformat(),
+                "error": self.error,
+                "result": self.result
+            }
+
+class JobQueueFullError(Exception):
+    """
+    Hay demasiados trabajos pendientes para aceptar uno nuevo.
+    """
+
+class BackgroundJobManager:
+    """
+    Ejecuta importaciones en un conjunto acotado de hilos, fuera del bucle de
+    eventos, y conserva su progreso en memoria.
+    """
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 16, max_history: int = 1000):
+        """
+        Inicializa el gestor.
+
+        Args:
+            max_workers: Número de importaciones que se ejecutan a la vez.
+            max_pending: Número máximo de trabajos en cola o en ejecución.
+            max_history: Número máximo de trabajos cuyo progreso se conserva.
+        """
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.max_history = max_history
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._jobs: Dict[str, JobProgress] = {}
+        self._active = 0
+        self._lock = threading.Lock()
+
+    def submit(self, progress: JobProgress, task: Callable[[JobProgress], Dict[str, Any]]) -> JobProgress:
+        """
+        Encola un trabajo.
+
+        Args:
+            progress: Progreso del trabajo, ya identificado.
+            task: Función que ejecuta la importación; recibe el progreso y
+                  devuelve el resumen final.
+
+        Returns:
+            El progreso registrado.
+        """
+        with self._lock:
+            if self._active >= self.max_pending:
+                raise JobQueueFullError(
+                    f"Hay {self._active} trabajos pendientes; inténtelo más tarde"
+                )
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="import-job"
+                )
+            self._active += 1
+            self._jobs[progress.job_id] = progress
+            self._prune()
+            executor = self._executor
+
+        executor.submit(self._run, progress, task)
+        return progress
+
+    def _prune(self):
+        # Olvidar los trabajos terminados más antiguos (los diccionarios conservan el orden)
+        excess = len(self._jobs) - self.max_history
+        for job_id in list(self._jobs):
+            if excess <= 0:
+                break
+            if self._jobs[job_id].status in (STATUS_COMPLETED, STATUS_FAILED):
+                del self._jobs[job_id]
+                excess -= 1
+
+    def _run(self, progress: JobProgress, task: Callable[[JobProgress], Dict[str, Any]]):
+        try:
+            progress.finish(task(progress))
+        except Exception as e:
+            progress.fail(str(e))
+        finally:
+            with self._lock:
+                self._active -= 1
+
+    def get(self, job_id: str) -> Optional[JobProgress]:
+        """
+        Obtiene el progreso de un trabajo lanzado por este proceso.
+        """
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def shutdown(self, wait: bool = True):
+        """
+        Detiene el conjunto de hilos.
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
@@ -0,0 +1,179 @@
+"""
+Representación columnar de lotes de registros
+"""
+from array import array
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Sequence, Tuple
+
+class ColumnBatch:
+    """
+    Lote de registros almacenado por columnas.
+
+    Las columnas enteras se guardan en array('q') (8 bytes por valor) y el resto
+    en listas. Las columnas enteras que admiten NULL llevan una máscara de
+    validez (un byte por fila); el valor almacenado en el array para un NULL es 0.
+    Las filas se reconstruyen como tuplas solo al pasarlas a executemany, sin
+    crear un diccionario por registro.
+    """
+
+    def __init__(self, columns: Sequence[str], int_columns: Iterable[str] = (),
+                 nullable_columns: Iterable[str] = (), rejected: Iterable[Any] = ()):
+        """
+        Inicializa un lote vacío.
+
+        Args:
+            columns: Nombres de las columnas, en el orden de los valores de cada fila.
+            int_columns: Columnas enteras, almacenadas en array('q').
+            nullable_columns: Columnas enteras que admiten NULL.
+            rejected: Filas del tramo de origen descartadas por la validación
+                      (ver app.utils.row_validation.RejectedRow). No forman
+                      parte del lote, pero viajan con él para que se registren
+                      en la misma transacción.
+        """
+        self.columns = list(columns)
+        self.rejected = list(rejected)
+        self.int_columns = frozenset(int_columns)
+        self.nullable_columns = frozenset(nullable_columns) & self.int_columns
+        self._values: Dict[str, Any] = {}
+        self._valid: Dict[str, bytearray] = {}
+        for column in self.columns:
+            if column in self.int_columns:
+                self._values[column] = array('q')
+                if column in self.nullable_columns:
+                    self._valid[column] = bytearray()
+            else:
+                self._values[column] = []
+        self._build_appenders()
+
+    def _build_appenders(self):
+        """
+        Precalcula una función de inserción por columna para que append() no
+        tenga que decidir el tipo en cada fila.
+        """
+        appenders = []
+        for column in self.columns:
+            values = self._values[column]
+            if column in self._valid:
+                appenders.append(self._nullable_appender(values, self._valid[column]))
+            else:
+                appenders.append(values.append)
+        self._appenders = appenders
+
+    @staticmethod
+    def _nullable_appender(values: array, valid: bytearray):
+        def append(value: Optional[int]):
+            if value is None:
+                values.append(0)
+                valid.append(0)
+            else:
+                values.append(value)
+                valid.append(1)
+        return append
+
+    @classmethod
+    def from_rows(cls, columns: Sequence[str], rows: Sequence[Sequence[Any]],
+                  int_columns: Iterable[str] = (), nullable_columns: Iterable[str] = (),
+                  rejected: Iterable[Any] = ()) -> 'ColumnBatch':
+        """
+        Construye un lote a partir de filas ya tipadas, transponiéndolas de una vez.
+        Es más rápido que llamar a append() fila a fila.
+
+        Args:
+            columns: Nombres de las columnas.
+            rows: Filas tipadas en el orden de columns.
+            int_columns: Columnas enteras, almacenadas en array('q').
+            nullable_columns: Columnas enteras que admiten NULL.
+            rejected: Filas descartadas por la validación.
+
+        Returns:
+            Lote con las filas indicadas.
+        """
+        batch = cls(columns, int_columns, nullable_columns, rejected)
+        if not rows:
+            return batch
+        for column, values in zip(batch.columns, zip(*rows)):
+            if column in batch._valid:
+                batch._valid[column].extend(value is not None for value in values)
+                batch._values[column].extend(0 if value is None else value for value in values)
+            else:
+                batch._values[column].extend(values)
+        return batch
+
+    def __reduce__(self):
+        # Las funciones de inserción no se serializan; se reconstruyen al cargar
+        return (_restore_column_batch,
+                (self.columns, self.int_columns, self.nullable_columns, self._values, self._valid,
+                 self.rejected))
+
+    def __len__(self) -> int:
+        return len(self._values[self.columns[0]]) if self.columns else 0
+
+    def append(self, row: Sequence[Any]):
+        """
+        Añade una fila ya tipada.
+
+        Args:
+            row: Valores de la fila en el orden de columns.
+        """
+        for append, value in zip(self._appenders, row):
+            append(value)
+
+    def column(self, name: str) -> Iterator[Any]:
+        """
+        Recorre los valores de una columna, con None para los NULL.
+
+        Args:
+            name: Nombre de la columna.
+
+        Returns:
+            Iterador con los valores de la columna.
+        """
+        values = self._values[name]
+        valid = self._valid.get(name)
+        if valid is None:
+            return iter(values)
+        return (value if ok else None for value, ok in zip(values, valid))
+
+    def last_value(self, name: str) -> Any:
+        """
+        Devuelve el último valor de una columna, o None si el lote está vacío.
+
+        Args:
+            name: Nombre de la columna.
+        """
+        values = self._values[name]
+        if not values:
+            return None
+        valid = self._valid.get(name)
+        if valid is not None and not valid[-1]:
+            return None
+        return values[-1]
+
+    def rows(self) -> Iterator[Tuple[Any, ...]]:
+        """
+        Recorre el lote como tuplas, en el formato que espera executemany.
+
+        Returns:
+            Iterador de tuplas en el orden de columns.
+        """
+        return zip(*(self.column(name) for name in self.columns))
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """
+        Convierte el lote en una lista de diccionarios.
+
+        Returns:
+            Lista de diccionarios, uno por fila.
+        """
+        return [dict(zip(self.columns, row)) for row in self.rows()]
+
+def _restore_column_batch(columns, int_columns, nullable_columns, values, valid,
+                          rejected=()) -> ColumnBatch:
+    batch = ColumnBatch.__new__(ColumnBatch)
+    batch.columns = columns
+    batch.rejected = list(rejected)
+    batch.int_columns = int_columns
+    batch.nullable_columns = nullable_columns
+    batch._values = values
+    batch._valid = valid
+    batch._build_appenders()
+    return batch
@@ -0,0 +1,118 @@
+"""
+Detección y descompresión en streaming de archivos CSV comprimidos
+"""
+import bz2
+import gzip
+import lzma
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+# Números mágicos de los formatos admitidos
+_MAGIC_NUMBERS = (
+    (b'\x1f\x8b', 'gzip'),
+    (b'BZh', 'bz2'),
+    (b'\xfd7zXZ\x00', 'xz'),
+)
+
+# Bytes necesarios para reconocer cualquiera de los formatos
+MAGIC_LENGTH = max(len(magic) for magic, _ in _MAGIC_NUMBERS)
+
+_DECOMPRESSORS = {
+    'gzip': lambda fileobj: gzip.GzipFile(fileobj=fileobj, mode='rb'),
+    'bz2': lambda fileobj: bz2.BZ2File(fileobj, mode='rb'),
+    'xz': lambda fileobj: lzma.LZMAFile(fileobj, mode='rb'),
+}
+
+def detect_compression(header: bytes) -> Optional[str]:
+    """
+    Detecta el formato de compresión a partir de los primeros bytes.
+
+    Args:
+        header: Primeros bytes del contenido (al menos MAGIC_LENGTH si los hay).
+
+    Returns:
+        'gzip', 'bz2' o 'xz', o None si el contenido no está comprimido.
+    """
+    for magic, compression in _MAGIC_NUMBERS:
+        if header.startswith(magic):
+            return compression
+    return None
+
+def detect_file_compression(file_path: str) -> Optional[str]:
+    """
+    Detecta el formato de compresión de un archivo.
+
+    Args:
+        file_path: Ruta al archivo.
+
+    Returns:
+        'gzip', 'bz2' o 'xz', o None si el archivo no está comprimido.
+    """
+    with open(file_path, 'rb') as file:
+        return detect_compression(file.read(MAGIC_LENGTH))
+
+class _PrefixedStream:
+    """
+    Flujo que devuelve primero unos bytes ya leídos y después el resto del
+    flujo original. Permite inspeccionar la cabecera de flujos sin peek().
+    """
+
+    def __init__(self, prefix: bytes, stream: BinaryIO):
+        self._prefix = prefix
+        self._stream = stream
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        if not self._prefix:
+            return self._stream.read(size)
+        if size is None or size < 0:
+            data, self._prefix = self._prefix + self._stream.read(), b''
+        else:
+            data, self._prefix = self._prefix[:size], self._prefix[size:]
+        return data
+
+def open_decompressed_stream(stream: BinaryIO) -> BinaryIO:
+    """
+    Envuelve un flujo binario para descomprimirlo sobre la marcha si su
+    cabecera corresponde a gzip, bz2 o xz. No se escribe nada en disco.
+
+    Args:
+        stream: Objeto con un método read(size) que devuelve bytes.
+
+    Returns:
+        Flujo con el contenido descomprimido (o el original si no está comprimido).
+    """
+    header = b''
+    while len(header) < MAGIC_LENGTH:
+        chunk = stream.read(MAGIC_LENGTH - len(header))
+        if not chunk:
+            break
+        header += chunk
+
+    source = _PrefixedStream(header, stream)
+    compression = detect_compression(header)
+    if compression is None:
+        return source
+    return _DECOMPRESSORS[compression](source)
+
+@contextmanager
+def open_binary(file_path: str) -> Iterator[Tuple[BinaryIO, Optional[str]]]:
+    """
+    Abre un archivo en modo binario, descomprimiéndolo sobre la marcha si es
+    necesario.
+
+    Args:
+        file_path: Ruta al archivo.
+
+    Yields:
+        Tupla (flujo binario con el contenido, formato de compresión o None).
+    """
+    with open(file_path, 'rb') as raw:
+        compression = detect_compression(raw.peek(MAGIC_LENGTH)[:MAGIC_LENGTH])
+        if compression is None:
+            yield raw, None
+            return
+        with _DECOMPRESSORS[compression](raw) as decompressed:
+            yield decompressed, compression
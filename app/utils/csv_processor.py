@@ -1,83 +1,446 @@
 """
 Utilidades para procesar archivos CSV
 """
+import codecs
 import csv
+import io
 import os
-from typing import List, Dict, Any
+from itertools import islice
+from typing import List, Dict, Any, BinaryIO, Iterable, Iterator, Optional, Tuple
 
-def parse_csv_file(file_path: str) -> List[Dict[str, Any]]:
+from app.database.schema import TableSchema, find_schema
+from app.utils.column_batch import ColumnBatch
+from app.utils.compression import detect_file_compression, open_binary, open_decompressed_stream
+from app.utils.mmap_csv import iter_mapped_chunks
+from app.utils.row_validation import RejectedRow, RowValidationError, RowValidator
+
+# Tamaño de lote por defecto para la ingesta en streaming
+DEFAULT_BATCH_SIZE = 1000
+
+# Tamaño de lectura para flujos binarios
+READ_CHUNK_SIZE = 64 * 1024
+
+def _open_text(stream: BinaryIO) -> io.TextIOWrapper:
     """
-    Lee un archivo CSV y lo convierte en una lista de diccionarios.
+    Decodifica un archivo binario (comprimido o no) como texto UTF-8 para el
+    lector CSV, con el mismo tratamiento de saltos de línea que newline=''.
+    """
+    return io.TextIOWrapper(stream, encoding='utf-8', newline='')
+
+def detect_table(file_name: str) -> Optional[str]:
+    """
+    Deduce la tabla de destino a partir del nombre de un archivo CSV. Solo se
+    usa cuando el llamador no indica la tabla (por ejemplo, en parse_csv_file).
+    
+    Args:
+        file_name: Nombre del archivo.
+        
+    Returns:
+        Nombre de la tabla cuya estructura sigue el archivo, o None si el archivo
+        tiene un formato genérico con encabezados.
+    """
+    file_name = file_name.lower()
+    if 'department' in file_name:
+        return 'departments'
+    if 'job' in file_name:
+        return 'jobs'
+    if 'employee' in file_name or 'hired' in file_name:
+        return 'hired_employees'
+    return None
+
+def _iter_validated_chunks(csv_reader: Iterable[List[str]], schema: TableSchema, chunk_size: int,
+                           first_line: int = 1) -> Iterator[Tuple[List[Tuple[Any, ...]], List[RejectedRow]]]:
+    """
+    Lee el CSV en bloques de chunk_size filas y valida cada bloque por columnas
+    antes de convertirlo con el convertidor precompilado del esquema. Cada
+    bloque se lee por completo antes de entregarse, de modo que los offsets que
+    sigue el lector corresponden exactamente al final del bloque.
+    
+    Args:
+        csv_reader: Iterable de filas (listas de cadenas) del CSV.
+        schema: Esquema de la tabla de destino.
+        chunk_size: Número de filas del CSV por bloque.
+        first_line: Número de línea de la primera fila leída.
+        
+    Yields:
+        Tuplas (filas válidas ya tipadas, filas descartadas).
+    """
+    validator = RowValidator(schema)
+    reader = iter(csv_reader)
+    line_number = first_line
+    while True:
+        chunk = list(islice(reader, chunk_size))
+        if not chunk:
+            return
+        yield validator.validate(chunk, line_number)
+        line_number += len(chunk)
+
+def _typed_rows(csv_reader: Iterable[List[str]], table_name: Optional[str]):
+    """
+    Determina las columnas del archivo y prepara el iterador de filas tipadas.
+    Para las tablas registradas las filas se validan y se convierten según el
+    esquema; una fila no válida lanza RowValidationError.
+    
+    Args:
+        csv_reader: Iterable de filas (listas de cadenas) del CSV.
+        table_name: Tabla de destino, o None para un CSV genérico con encabezados.
+        
+    Returns:
+        Tupla (columnas, enteras, enteras con NULL, iterador de tuplas), o None
+        si el archivo genérico no tiene encabezados.
+    """
+    schema = find_schema(table_name)
+    if schema is not None:
+        def rows():
+            for valid, rejected in _iter_validated_chunks(csv_reader, schema, DEFAULT_BATCH_SIZE):
+                if rejected:
+                    raise RowValidationError(rejected[0])
+                yield from valid
+        return schema.column_names, schema.int_columns, schema.nullable_int_columns, rows()
+    
+    # Formato genérico para otros archivos CSV: la primera fila son los encabezados
+    csv_reader = iter(csv_reader)
+    headers = next(csv_reader, None)
+    if not headers:
+        return None
+    rows = (tuple(row) for row in csv_reader if len(row) == len(headers))
+    return headers, (), (), rows
+
+def _iter_records(csv_reader: Iterable[List[str]], table_name: Optional[str]) -> Iterator[Dict[str, Any]]:
+    """
+    Convierte las filas de un lector CSV en diccionarios según la tabla de destino.
+    
+    Args:
+        csv_reader: Iterable de filas (listas de cadenas) del CSV.
+        table_name: Tabla de destino, o None para un CSV genérico con encabezados.
+        
+    Yields:
+        Diccionarios con los datos de cada fila.
+    """
+    typed = _typed_rows(csv_reader, table_name)
+    if typed is None:
+        return
+    columns, _, _, rows = typed
+    for row in rows:
+        yield dict(zip(columns, row))
+
+def _iter_column_batches(csv_reader: Iterable[List[str]], table_name: Optional[str],
+                         batch_size: int, first_line: int = 1) -> Iterator[ColumnBatch]:
+    """
+    Convierte las filas de un lector CSV en lotes columnares, sin crear un
+    diccionario por fila.
+    
+    Para las tablas registradas cada lote corresponde a batch_size filas del
+    CSV: las que no superan la validación no se incluyen en el lote sino en
+    su atributo rejected, con su número de línea, de modo que quien inserta
+    el lote decide si descartarlas o detener la carga. Un lote puede tener
+    menos de batch_size registros, o ninguno si todas sus filas se descartaron.
+    
+    Args:
+        csv_reader: Iterable de filas (listas de cadenas) del CSV.
+        table_name: Tabla de destino, o None para un CSV genérico con encabezados.
+        batch_size: Número máximo de registros por lote.
+        first_line: Número de línea de la primera fila leída.
+        
+    Yields:
+        Lotes columnares.
+    """
+    schema = find_schema(table_name)
+    if schema is not None:
+        for valid, rejected in _iter_validated_chunks(csv_reader, schema, batch_size, first_line):
+            if valid or rejected:
+                yield ColumnBatch.from_rows(schema.column_names, valid, schema.int_columns,
+                                            schema.nullable_int_columns, rejected)
+        return
+    
+    typed = _typed_rows(csv_reader, table_name)
+    if typed is None:
+        return
+    columns, int_columns, nullable_columns, rows = typed
+    
+    while True:
+        chunk = list(islice(rows, batch_size))
+        if not chunk:
+            return
+        yield ColumnBatch.from_rows(columns, chunk, int_columns, nullable_columns)
+
+def _iter_file_records(file_path: str, table_name: Optional[str]) -> Iterator[Dict[str, Any]]:
+    """
+    Abre el archivo y entrega sus registros; el archivo se cierra al agotar el iterador.
+    Los archivos comprimidos con gzip, bz2 o xz se descomprimen sobre la marcha.
+    """
+    with open_binary(file_path) as (stream, _):
+        yield from _iter_records(csv.reader(_open_text(stream)), table_name)
+
+def iter_csv_records(file_path: str, table_name: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Lee un archivo CSV de forma perezosa, registro a registro.
     
     Args:
         file_path: Ruta al archivo CSV.
+        table_name: Tabla de destino. Si es None, se deduce del nombre del archivo.
         
     Returns:
-        Lista de diccionarios con los datos del CSV.
+        Iterador de diccionarios con los datos del CSV.
     """
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"El archivo {file_path} no existe")
     
-    data = []
+    if table_name is None:
+        table_name = detect_table(os.path.basename(file_path))
+    return _iter_file_records(file_path, table_name)
+
+def iter_text_lines(stream: BinaryIO, encoding: str = 'utf-8',
+                    chunk_size: int = READ_CHUNK_SIZE) -> Iterator[str]:
+    """
+    Decodifica un flujo binario de forma incremental y lo entrega línea a línea.
+    Solo se corta en '\\n', de modo que el lector CSV recibe las líneas tal como
+    las recibiría de un archivo abierto con newline=''.
     
-    # Detectar el tipo de archivo por su nombre
-    file_name = os.path.basename(file_path).lower()
+    Args:
+        stream: Objeto con un método read(size) que devuelve bytes.
+        encoding: Codificación del texto.
+        chunk_size: Número de bytes a solicitar en cada lectura.
+        
+    Yields:
+        Líneas de texto, incluyendo su terminador.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    pending = ''
+    while True:
+        chunk = stream.read(chunk_size)
+        text = pending + decoder.decode(chunk, final=not chunk)
+        if not chunk:
+            if text:
+                yield text
+            return
+        
+        lines = text.split('\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line + '\n'
+
+def iter_stream_records(stream: BinaryIO, table_name: Optional[str]) -> Iterator[Dict[str, Any]]:
+    """
+    Lee registros CSV desde un flujo binario a medida que llegan los bytes,
+    sin copiarlo previamente a disco. Si el flujo está comprimido con gzip, bz2
+    o xz se descomprime sobre la marcha.
     
-    if 'department' in file_name:
-        # Estructura para departments.csv: id, department
-        with open(file_path, 'r', encoding='utf-8') as file:
-            csv_reader = csv.reader(file)
-            for row in csv_reader:
-                if len(row) >= 2:
-                    data.append({
-                        'id': int(row[0]),
-                        'department': row[1]
-                    })
-    
-    elif 'job' in file_name:
-        # Estructura para jobs.csv: id, job
-        with open(file_path, 'r', encoding='utf-8') as file:
-            csv_reader = csv.reader(file)
-            for row in csv_reader:
-                if len(row) >= 2:
-                    data.append({
-                        'id': int(row[0]),
-                        'job': row[1]
-                    })
-    
-    elif 'employee' in file_name or 'hired' in file_name:
-        # Estructura para hired_employees.csv: id, name, datetime, department_id, job_id
-        with open(file_path, 'r', encoding='utf-8') as file:
-            csv_reader = csv.reader(file)
-            for row in csv_reader:
-                if len(row) >= 5:
-                    # Manejar posibles valores nulos en department_id y job_id
-                    department_id = int(row[3]) if row[3].strip() else None
-                    job_id = int(row[4]) if row[4].strip() else None
-                    
-                    data.append({
-                        'id': int(row[0]),
-                        'name': row[1],
-                        'datetime': row[2],
-                        'department_id': department_id,
-                        'job_id': job_id
-                    })
-    
-    else:
-        # Formato genérico para otros archivos CSV
-        with open(file_path, 'r', encoding='utf-8') as file:
-            csv_reader = csv.reader(file)
-            headers = next(csv_reader, None)
-            
-            if headers:
-                for row in csv_reader:
-                    if len(row) == len(headers):
-                        record = {}
-                        for i, header in enumerate(headers):
-                            record[header] = row[i]
-                        data.append(record)
-    
-    return data
+    Args:
+        stream: Flujo binario con el contenido del CSV.
+        table_name: Tabla de destino, o None para un CSV genérico con encabezados.
+        
+    Yields:
+        Diccionarios con los datos del CSV.
+    """
+    # La cabecera del flujo se inspecciona al pedir el primer registro
+    yield from _iter_records(csv.reader(iter_text_lines(open_decompressed_stream(stream))), table_name)
+
+def iter_batches(records: Iterable[Dict[str, Any]],
+                 batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Agrupa un iterable de registros en lotes de tamaño fijo.
+    
+    Args:
+        records: Iterable de registros.
+        batch_size: Número máximo de registros por lote.
+        
+    Yields:
+        Listas de como máximo batch_size registros.
+    """
+    if batch_size < 1:
+        raise ValueError("El tamaño del lote debe ser mayor que 0")
+    
+    iterator = iter(records)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+def _iter_mapped_batches(file_path: str, schema: TableSchema, batch_size: int,
+                         start_offset: int = 0, first_line: int = 1) -> Iterator[Tuple[ColumnBatch, int]]:
+    """
+    Entrega los lotes de un archivo sin comprimir leyéndolo sobre un mapa de
+    memoria (ver app.utils.mmap_csv), junto con el offset en bytes del final de
+    cada lote. Los lotes son los mismos que los de _iter_column_batches.
+    """
+    validator = RowValidator(schema)
+    line_number = first_line
+    for rows, end in iter_mapped_chunks(file_path, batch_size, start_offset):
+        valid, rejected = validator.validate(rows, line_number)
+        line_number += len(rows)
+        if valid or rejected:
+            yield ColumnBatch.from_rows(schema.column_names, valid, schema.int_columns,
+                                        schema.nullable_int_columns, rejected), end
+
+def _iter_file_column_batches(file_path: str, table_name: Optional[str],
+                              batch_size: int) -> Iterator[ColumnBatch]:
+    """
+    Abre el archivo y entrega sus lotes; el archivo se cierra al agotar el iterador.
+    Los archivos de las tablas registradas se leen sobre un mapa de memoria, y
+    los comprimidos con gzip, bz2 o xz se descomprimen sobre la marcha.
+    """
+    schema = find_schema(table_name)
+    if schema is not None and detect_file_compression(file_path) is None:
+        for batch, _ in _iter_mapped_batches(file_path, schema, batch_size):
+            yield batch
+        return
+    
+    with open_binary(file_path) as (stream, _):
+        yield from _iter_column_batches(csv.reader(_open_text(stream)), table_name, batch_size)
+
+def iter_csv_batches(file_path: str, batch_size: int = DEFAULT_BATCH_SIZE,
+                     table_name: Optional[str] = None) -> Iterator[ColumnBatch]:
+    """
+    Lee un archivo CSV en streaming y lo entrega en lotes columnares de tamaño fijo.
+    La memoria utilizada depende del tamaño del lote, no del tamaño del archivo.
+    
+    Args:
+        file_path: Ruta al archivo CSV.
+        batch_size: Número máximo de registros por lote.
+        table_name: Tabla de destino. Si es None, se deduce del nombre del archivo.
+        
+    Returns:
+        Iterador de lotes columnares.
+    """
+    if batch_size < 1:
+        raise ValueError("El tamaño del lote debe ser mayor que 0")
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"El archivo {file_path} no existe")
+    
+    if table_name is None:
+        table_name = detect_table(os.path.basename(file_path))
+    return _iter_file_column_batches(file_path, table_name, batch_size)
+
+def _iter_record_texts(file: BinaryIO, position: List[int]) -> Iterator[str]:
+    """
+    Lee registros completos de un archivo binario y mantiene en position[0] el
+    offset en bytes del final del último registro entregado. Las líneas con
+    comillas abiertas se unen con las siguientes para no cortar un campo
+    entrecomillado que contenga saltos de línea.
+    
+    Args:
+        file: Archivo abierto en modo binario, situado en position[0].
+        position: Lista de un elemento con el offset actual; se actualiza en cada registro.
+        
+    Yields:
+        Texto de cada registro, incluido su salto de línea.
+    """
+    offset = position[0]
+    pending = b''
+    for line in file:
+        offset += len(line)
+        if pending or b'"' in line:
+            pending += line
+            if pending.count(b'"') % 2:
+                continue
+            line, pending = pending, b''
+        position[0] = offset
+        yield line.decode('utf-8')
+    if pending:
+        position[0] = offset
+        yield pending.decode('utf-8')
+
+def _skip_bytes(stream: BinaryIO, count: int):
+    """
+    Lee y descarta count bytes de un flujo que no admite seek eficiente.
+    """
+    while count > 0:
+        chunk = stream.read(min(count, READ_CHUNK_SIZE))
+        if not chunk:
+            return
+        count -= len(chunk)
+
+def _iter_positioned_batches(file_path: str, table_name: str, batch_size: int,
+                             start_offset: int, first_line: int) -> Iterator[Tuple[ColumnBatch, int]]:
+    """
+    Abre el archivo en el offset indicado y entrega cada lote junto con el
+    offset en bytes del final de su último registro. Los archivos sin
+    comprimir de las tablas registradas se leen sobre un mapa de memoria. En
+    los comprimidos los offsets se refieren al contenido descomprimido; para
+    reanudar se descomprime y descarta el principio, sin volver a parsearlo.
+    """
+    schema = find_schema(table_name)
+    if schema is not None and detect_file_compression(file_path) is None:
+        yield from _iter_mapped_batches(file_path, schema, batch_size, start_offset, first_line)
+        return
+    
+    position = [start_offset]
+    with open_binary(file_path) as (file, compression):
+        if compression is None:
+            file.seek(start_offset)
+        else:
+            _skip_bytes(file, start_offset)
+        csv_reader = csv.reader(_iter_record_texts(file, position))
+        for batch in _iter_column_batches(csv_reader, table_name, batch_size, first_line):
+            yield batch, position[0]
+
+def iter_csv_batches_from_offset(file_path: str, table_name: str, batch_size: int = DEFAULT_BATCH_SIZE,
+                                 start_offset: int = 0, first_line: int = 1) -> Iterator[Tuple[ColumnBatch, int]]:
+    """
+    Lee un archivo CSV en lotes a partir de un offset en bytes, informando tras
+    cada lote de la posición alcanzada. Permite reanudar una importación desde
+    el último punto de control sin volver a leer el principio del archivo.
+    
+    Args:
+        file_path: Ruta al archivo CSV.
+        table_name: Tabla de destino.
+        batch_size: Número máximo de registros por lote.
+        start_offset: Offset en bytes (inicio de un registro) desde el que leer.
+        first_line: Número de línea del registro situado en start_offset, para
+                    numerar las filas descartadas.
+        
+    Returns:
+        Iterador de tuplas (lote columnar, offset del final del lote).
+    """
+    if batch_size < 1:
+        raise ValueError("El tamaño del lote debe ser mayor que 0")
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"El archivo {file_path} no existe")
+    
+    return _iter_positioned_batches(file_path, table_name, batch_size, start_offset, first_line)
+
+def _iter_stream_column_batches(stream: BinaryIO, table_name: Optional[str],
+                                batch_size: int) -> Iterator[ColumnBatch]:
+    """
+    Entrega los lotes de un flujo binario. La cabecera del flujo se inspecciona
+    al pedir el primer lote, en el hilo que consume el iterador.
+    """
+    lines = iter_text_lines(open_decompressed_stream(stream))
+    yield from _iter_column_batches(csv.reader(lines), table_name, batch_size)
+
+def iter_stream_batches(stream: BinaryIO, table_name: Optional[str],
+                        batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[ColumnBatch]:
+    """
+    Lee un flujo binario con contenido CSV y lo entrega en lotes columnares de tamaño fijo.
+    Si el flujo está comprimido con gzip, bz2 o xz se descomprime sobre la
+    marcha, sin escribir el contenido descomprimido en disco.
+    
+    Args:
+        stream: Flujo binario con el contenido del CSV.
+        table_name: Tabla de destino, o None para un CSV genérico con encabezados.
+        batch_size: Número máximo de registros por lote.
+        
+    Returns:
+        Iterador de lotes columnares.
+    """
+    if batch_size < 1:
+        raise ValueError("El tamaño del lote debe ser mayor que 0")
+    
+    return _iter_stream_column_batches(stream, table_name, batch_size)
+
+def parse_csv_file(file_path: str) -> List[Dict[str, Any]]:
+    """
+    Lee un archivo CSV y lo convierte en una lista de diccionarios.
+    
+    Args:
+        file_path: Ruta al archivo CSV.
+        
+    Returns:
+        Lista de diccionarios con los datos del CSV.
+    """
+    return list(iter_csv_records(file_path))
 
 def validate_batch_size(data: List[Dict[str, Any]]) -> bool:
     """
@@ -1,18 +1,124 @@
 """
 Utilidades para la gestión de base de datos
 """
+import os
+import threading
+
 # Variables globales para modo de prueba
 test_mode = False
 test_db_manager = None
 
+# Gestor compartido por todas las peticiones, con su pool de conexiones
+_db_manager = None
+_db_manager_lock = threading.Lock()
+
+# Hilos de lectura y de escritura del acceso asíncrono a la base de datos
+_database_lanes = None
+
+# Motor de las consultas analíticas
+_analytics = None
+
+# Caché de las respuestas de las consultas analíticas y gestor al que corresponde
+_response_cache = None
+_response_cache_owner = None
+
 def get_db_manager():
     """
-    Obtiene una instancia del gestor de base de datos.
+    Obtiene el gestor de base de datos compartido de la aplicación, cuyo pool
+    de conexiones se reutiliza entre peticiones. El tamaño del pool se
+    configura con la variable de entorno DB_POOL_SIZE. Al crearlo, la base de
+    datos se crea o se migra a la versión actual del esquema, aunque no se
+    haya ejecutado el evento de inicio de la aplicación.
     En modo de prueba, devuelve la instancia configurada para pruebas.
     """
+    from app.database.connection_pool import DEFAULT_POOL_SIZE
+    from app.database.create_db import create_database
     from app.database.db_manager import DatabaseManager
     
-    global test_mode, test_db_manager
+    global test_mode, test_db_manager, _db_manager
     if test_mode and test_db_manager:
         return test_db_manager
-    return DatabaseManager()
+    with _db_manager_lock:
+        if _db_manager is None:
+            db_manager = DatabaseManager(pool_size=int(os.environ.get("DB_POOL_SIZE", DEFAULT_POOL_SIZE)))
+            create_database(db_manager.db_path)
+            _db_manager = db_manager
+        return _db_manager
+
+def get_database_lanes():
+    """
+    Obtiene los carriles de lectura y escritura compartidos por los endpoints
+    (ver app.database.async_db). El número de hilos de lectura se configura
+    con la variable de entorno DB_READ_WORKERS.
+    """
+    from app.database.async_db import DEFAULT_READ_WORKERS, DatabaseLanes
+    
+    global _database_lanes
+    with _db_manager_lock:
+        if _database_lanes is None:
+            _database_lanes = DatabaseLanes(int(os.environ.get("DB_READ_WORKERS", DEFAULT_READ_WORKERS)))
+        return _database_lanes
+
+def get_async_db():
+    """
+    Obtiene el acceso asíncrono al gestor de get_db_manager.
+    """
+    from app.database.async_db import AsyncDatabase
+    
+    return AsyncDatabase(get_db_manager(), get_database_lanes())
+
+def get_analytics():
+    """
+    Obtiene el motor de las consultas analíticas sobre el gestor de
+    get_db_manager (ver app.database.analytics). Se configura con las
+    variables de entorno ANALYTICS_BACKEND ('sqlite', por defecto, o
+    'duckdb'), ANALYTICS_DUCKDB_PATH y ANALYTICS_REFRESH_SECONDS (sin
+    definir, la réplica DuckDB se actualiza tras cada carga).
+    """
+    from app.database.analytics import BACKEND_DUCKDB, BACKEND_SQLITE, create_analytics
+    
+    global _analytics
+    db_manager = get_db_manager()
+    with _db_manager_lock:
+        if _analytics is None or _analytics.db_manager is not db_manager:
+            if _analytics is not None:
+                _analytics.close()
+            backend = os.environ.get("ANALYTICS_BACKEND", BACKEND_SQLITE)
+            options = {}
+            if backend == BACKEND_DUCKDB:
+                refresh = os.environ.get("ANALYTICS_REFRESH_SECONDS")
+                options = {
+                    "path": os.environ.get("ANALYTICS_DUCKDB_PATH"),
+                    "refresh_interval": float(refresh) if refresh else None,
+                }
+            _analytics = create_analytics(db_manager, backend, **options)
+        return _analytics
+
+def get_response_cache():
+    """
+    Obtiene la caché de respuestas de los endpoints analíticos sobre el
+    gestor de get_db_manager (ver app.utils.response_cache). Su tamaño se
+    configura con la variable de entorno SQL_CACHE_SIZE (0 la desactiva).
+    """
+    from app.utils.response_cache import DEFAULT_CACHE_SIZE, ResponseCache
+    
+    global _response_cache, _response_cache_owner
+    db_manager = get_db_manager()
+    with _db_manager_lock:
+        # Las versiones de los datos de dos gestores no son comparables
+        if _response_cache is None or _response_cache_owner is not db_manager:
+            _response_cache = ResponseCache(int(os.environ.get("SQL_CACHE_SIZE", DEFAULT_CACHE_SIZE)))
+            _response_cache_owner = db_manager
+        return _response_cache
+
+def close_db_manager():
+    """
+    Detiene los carriles de la base de datos, cierra el motor analítico y
+    las conexiones del gestor compartido (al detener la aplicación).
+    """
+    if _database_lanes is not None:
+        _database_lanes.shutdown()
+    if _analytics is not None:
+        _analytics.close()
+    if _db_manager is not None:
+        _db_manager.close()
@@ -0,0 +1,48 @@
+"""
+Utilidades para exportar el contenido de las tablas por bloques
+"""
+import csv
+import io
+import json
+from typing import Any, Sequence, Tuple
+
+# Formatos de exportación y su tipo de contenido
+EXPORT_CSV = 'csv'
+EXPORT_NDJSON = 'ndjson'
+EXPORT_MEDIA_TYPES = {
+    EXPORT_CSV: 'text/csv',
+    EXPORT_NDJSON: 'application/x-ndjson',
+}
+EXPORT_FORMATS = tuple(EXPORT_MEDIA_TYPES)
+
+def validate_export_format(export_format: str) -> str:
+    """
+    Valida el formato de exportación.
+
+    Args:
+        export_format: Formato solicitado.
+
+    Returns:
+        El formato validado.
+    """
+    if export_format not in EXPORT_MEDIA_TYPES:
+        raise ValueError(f"Formato de exportación no válido. Debe ser uno de: {', '.join(EXPORT_FORMATS)}")
+    return export_format
+
+def csv_chunk(rows: Sequence[Tuple[Any, ...]]) -> bytes:
+    """
+    Convierte un bloque de filas en líneas CSV sin cabecera, el mismo formato
+    que aceptan los endpoints de carga. Los valores nulos quedan vacíos.
+    """
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator='\n').writerows(rows)
+    return buffer.getvalue().encode('utf-8')
+
+def ndjson_chunk(columns: Sequence[str], rows: Sequence[Tuple[Any, ...]]) -> bytes:
+    """
+    Convierte un bloque de filas en líneas NDJSON, un objeto por fila con las
+    columnas indicadas, el mismo formato que acepta /batch-stream.
+    """
+    return ''.join(
+        json.dumps(dict(zip(columns, row)), ensure_ascii=False) + '\n' for row in rows
+    ).encode('utf-8')
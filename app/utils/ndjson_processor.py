@@ -0,0 +1,99 @@
+"""
+Utilidades para procesar flujos NDJSON (un objeto JSON por línea)
+"""
+import json
+from itertools import islice
+from typing import Any, BinaryIO, Iterator, Tuple
+
+from app.database.schema import INT64_MAX, INT64_MIN, TableSchema, get_schema
+from app.utils.column_batch import ColumnBatch
+from app.utils.compression import open_decompressed_stream
+from app.utils.csv_processor import DEFAULT_BATCH_SIZE, iter_text_lines
+
+class NDJSONError(ValueError):
+    """
+    Una línea del flujo NDJSON no es un registro válido para la tabla.
+    """
+
+    def __init__(self, line_number: int, message: str):
+        super().__init__(f"Línea {line_number}: {message}")
+        self.line_number = line_number
+
+def _record_to_row(schema: TableSchema, record: Any, line_number: int) -> Tuple[Any, ...]:
+    """
+    Convierte un objeto JSON en una tupla en el orden de las columnas de la
+    tabla, comprobando que solo use columnas conocidas y que las columnas
+    enteras reciban enteros.
+
+    Args:
+        schema: Esquema de la tabla de destino.
+        record: Valor decodificado de la línea.
+        line_number: Número de línea, para los mensajes de error.
+
+    Returns:
+        Tupla con los valores de la fila (None para las columnas ausentes).
+    """
+    if not isinstance(record, dict):
+        raise NDJSONError(line_number, "se esperaba un objeto JSON")
+
+    unknown = record.keys() - set(schema.column_names)
+    if unknown:
+        raise NDJSONError(line_number, f"columnas desconocidas: {', '.join(sorted(unknown))}")
+
+    row = tuple(record.get(column) for column in schema.column_names)
+    for column, value in zip(schema.column_names, row):
+        if column in schema.int_columns and value is not None and (
+                not isinstance(value, int) or isinstance(value, bool)):
+            raise NDJSONError(line_number, f"la columna {column} debe ser un entero")
+        if column in schema.int_columns and value is not None and not INT64_MIN <= value <= INT64_MAX:
+            raise NDJSONError(line_number, f"la columna {column} está fuera del rango de los enteros de 64 bits")
+    return row
+
+def _iter_rows(stream: BinaryIO, schema: TableSchema) -> Iterator[Tuple[Any, ...]]:
+    """
+    Decodifica el flujo línea a línea y entrega cada registro como tupla.
+    Las líneas vacías se ignoran.
+    """
+    lines = iter_text_lines(open_decompressed_stream(stream))
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise NDJSONError(line_number, f"JSON no válido ({e.msg})") from None
+        yield _record_to_row(schema, record, line_number)
+
+def _iter_ndjson_batches(stream: BinaryIO, schema: TableSchema,
+                         batch_size: int) -> Iterator[ColumnBatch]:
+    """
+    Agrupa los registros del flujo en lotes columnares de tamaño fijo.
+    """
+    rows = _iter_rows(stream, schema)
+    while True:
+        chunk = list(islice(rows, batch_size))
+        if not chunk:
+            return
+        yield ColumnBatch.from_rows(schema.column_names, chunk,
+                                    schema.int_columns, schema.nullable_int_columns)
+
+def iter_ndjson_batches(stream: BinaryIO, table_name: str,
+                        batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[ColumnBatch]:
+    """
+    Lee un flujo binario NDJSON a medida que llegan los bytes y lo entrega en
+    lotes columnares de tamaño fijo. Solo se mantiene en memoria el lote en
+    curso, sea cual sea la longitud del flujo.
+
+    Args:
+        stream: Flujo binario con un objeto JSON por línea (puede estar comprimido).
+        table_name: Tabla de destino, cuyo esquema define las columnas.
+        batch_size: Número máximo de registros por lote.
+
+    Returns:
+        Iterador de lotes columnares. Si una línea no es válida se lanza
+        NDJSONError al llegar a ella; los lotes anteriores ya se han entregado.
+    """
+    if batch_size < 1:
+        raise ValueError("El tamaño del lote debe ser mayor que 0")
+
+    return _iter_ndjson_batches(stream, get_schema(table_name), batch_size)
@@ -0,0 +1,148 @@
+"""
+Parseo paralelo de archivos CSV grandes mediante rangos de bytes
+"""
+import csv
+import io
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Iterator, Optional, Tuple
+
+from app.database.schema import find_schema
+from app.utils.column_batch import ColumnBatch
+from app.utils.compression import detect_file_compression
+from app.utils.csv_processor import (
+    DEFAULT_BATCH_SIZE, _iter_column_batches, detect_table, iter_csv_batches
+)
+
+# Tamaño objetivo de cada fragmento del archivo que procesa un proceso
+DEFAULT_SHARD_BYTES = 8 * 1024 * 1024
+
+# Número máximo de procesos de una carga: uno por núcleo
+MAX_WORKERS = os.cpu_count() or 1
+
+def split_byte_ranges(file_path: str, shard_bytes: int = DEFAULT_SHARD_BYTES) -> List[Tuple[int, int]]:
+    """
+    Divide un archivo en rangos de bytes contiguos que empiezan y terminan en
+    un salto de línea.
+
+    Se asume que los campos no contienen saltos de línea entrecomillados, como
+    ocurre en los CSV de departments, jobs y hired_employees.
+
+    Args:
+        file_path: Ruta al archivo CSV.
+        shard_bytes: Tamaño aproximado de cada rango.
+
+    Returns:
+        Lista de tuplas (inicio, fin) que cubren el archivo completo.
+    """
+    if shard_bytes < 1:
+        raise ValueError("El tamaño de fragmento debe ser mayor que 0")
+
+    size = os.path.getsize(file_path)
+    ranges = []
+    start = 0
+    with open(file_path, 'rb') as file:
+        while start < size:
+            target = start + shard_bytes
+            if target >= size:
+                end = size
+            else:
+                # Avanzar hasta el final de la línea en curso
+                file.seek(target - 1)
+                file.readline()
+                end = file.tell()
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+def _parse_byte_range(file_path: str, start: int, end: int, table_name: str,
+                      batch_size: int) -> Tuple[List[ColumnBatch], int]:
+    """
+    Parsea los registros de un rango de bytes. Se ejecuta en un proceso de trabajo.
+    Las filas descartadas se numeran desde el principio del rango.
+
+    Args:
+        file_path: Ruta al archivo CSV.
+        start: Posición inicial del rango (inicio de línea).
+        end: Posición final del rango (fin de línea, excluida).
+        table_name: Tabla de destino, cuyo esquema define la conversión.
+        batch_size: Número máximo de registros por lote.
+
+    Returns:
+        Tupla (lotes columnares del rango, que se serializan de forma compacta,
+        número de líneas del rango).
+    """
+    with open(file_path, 'rb') as file:
+        file.seek(start)
+        text = file.read(end - start).decode('utf-8')
+    # Se leen como el lector secuencial (newline=''): str.splitlines también
+    # cortaría las filas en caracteres como \x0c o \u2028
+    rows = list(csv.reader(io.StringIO(text, newline='')))
+    return list(_iter_column_batches(rows, table_name, batch_size)), len(rows)
+
+def _iter_parallel_batches(file_path: str, table_name: str, batch_size: int,
+                           workers: Optional[int], shard_bytes: int) -> Iterator[ColumnBatch]:
+    """
+    Reparte los rangos del archivo entre procesos y entrega sus lotes en el
+    orden del archivo. Solo se mantienen en vuelo unos pocos rangos por proceso.
+    Los números de línea de las filas descartadas se trasladan al archivo completo.
+    """
+    ranges = split_byte_ranges(file_path, shard_bytes)
+    workers = min(workers or MAX_WORKERS, MAX_WORKERS)
+    max_pending = workers * 2
+    lines_before = 0
+    
+    def collect(future) -> List[ColumnBatch]:
+        nonlocal lines_before
+        batches, line_count = future.result()
+        for batch in batches:
+            batch.rejected = [row._replace(line_number=row.line_number + lines_before) for row in batch.rejected]
+        lines_before += line_count
+        return batches
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for start, end in ranges:
+            pending.append(executor.submit(_parse_byte_range, file_path, start, end, table_name, batch_size))
+            if len(pending) >= max_pending:
+                yield from collect(pending.popleft())
+        while pending:
+            yield from collect(pending.popleft())
+
+def iter_csv_batches_parallel(file_path: str, batch_size: int = DEFAULT_BATCH_SIZE,
+                              workers: Optional[int] = None,
+                              shard_bytes: int = DEFAULT_SHARD_BYTES,
+                              table_name: Optional[str] = None) -> Iterator[ColumnBatch]:
+    """
+    Lee un archivo CSV parseándolo en varios procesos y lo entrega en lotes
+    columnares, en el mismo orden de registros que iter_csv_batches, para que
+    un único escritor los inserte en la base de datos. Cada rango se divide en
+    lotes de forma independiente, por lo que el último lote de cada rango puede
+    tener menos de batch_size registros.
+
+    Los archivos de formato genérico (con encabezados) se leen de forma
+    secuencial, ya que solo el primer fragmento contiene el encabezado. Los
+    archivos comprimidos también, porque no se pueden dividir por offsets.
+
+    Args:
+        file_path: Ruta al archivo CSV.
+        batch_size: Número máximo de registros por lote.
+        workers: Número de procesos (por defecto, y como máximo, MAX_WORKERS).
+        shard_bytes: Tamaño aproximado del rango de bytes asignado a cada tarea.
+        table_name: Tabla de destino. Si es None, se deduce del nombre del archivo.
+
+    Returns:
+        Iterador de lotes columnares.
+    """
+    if batch_size < 1:
+        raise ValueError("El tamaño del lote debe ser mayor que 0")
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"El archivo {file_path} no existe")
+
+    if table_name is None:
+        table_name = detect_table(os.path.basename(file_path))
+    if find_schema(table_name) is None or detect_file_compression(file_path):
+        return iter_csv_batches(file_path, batch_size, table_name)
+
+    return _iter_parallel_batches(file_path, table_name, batch_size, workers, shard_bytes)
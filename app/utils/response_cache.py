@@ -0,0 +1,107 @@
+"""
+Caché en memoria de respuestas serializadas de las consultas analíticas
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, NamedTuple, Optional, Tuple
+
+# Número de respuestas que conserva la caché por defecto
+DEFAULT_CACHE_SIZE = 128
+
+class CachedResponse(NamedTuple):
+    """
+    Cuerpo de una respuesta y su ETag, que depende solo del contenido: una
+    escritura que no cambia el resultado no invalida las copias de los clientes.
+    """
+    body: bytes
+    etag: str
+
+    @classmethod
+    def from_body(cls, body: bytes) -> 'CachedResponse':
+        return cls(body, f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"')
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """
+        Indica si la cabecera If-None-Match de una petición incluye este ETag
+        (o es *), de modo que se puede responder 304 Not Modified.
+        """
+        if not if_none_match:
+            return False
+        tags = {tag.strip() for tag in if_none_match.split(',')}
+        # Las comparaciones de If-None-Match son débiles: W/"x" equivale a "x"
+        return '*' in tags or self.etag in {tag[2:] if tag.startswith('W/') else tag for tag in tags}
+
+class ResponseCache:
+    """
+    Caché LRU de respuestas, indexada por consulta y parámetros. Cada entrada
+    guarda la versión de los datos con que se calculó (ver
+    DatabaseManager.data_version) y solo se devuelve mientras la versión no
+    cambie; una entrada desactualizada se sustituye al volver a calcularla.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_CACHE_SIZE):
+        """
+        Inicializa la caché.
+
+        Args:
+            max_entries: Número máximo de respuestas; al superarlo se descarta
+                         la usada hace más tiempo. Con 0 no se guarda ninguna.
+        """
+        if max_entries < 0:
+            raise ValueError("El tamaño de la caché no puede ser negativo")
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Hashable, Tuple[Any, CachedResponse]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, version: Any) -> Optional[CachedResponse]:
+        """
+        Obtiene la respuesta guardada para una clave si se calculó con la
+        versión indicada de los datos.
+
+        Returns:
+            Respuesta guardada, o None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, version: Any, body: bytes) -> CachedResponse:
+        """
+        Guarda una respuesta calculada con la versión indicada de los datos.
+        La versión debe leerse antes de ejecutar la consulta: si los datos
+        cambian mientras tanto, la entrada se considera desactualizada.
+
+        Returns:
+            Respuesta guardada, con su ETag.
+        """
+        response = CachedResponse.from_body(body)
+        if self.max_entries == 0:
+            return response
+        with self._lock:
+            self._entries[key] = (version, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return response
+
+    def clear(self):
+        """
+        Descarta todas las respuestas guardadas.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Número de respuestas guardadas, aciertos y fallos.
+        """
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,197 @@
+"""
+Validación por columnas de las filas CSV antes de insertarlas
+"""
+import re
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from app.database.schema import INT64_MAX, INT64_MIN, ColumnSchema, TableSchema
+from app.utils.column_batch import ColumnBatch
+
+# Entero con signo opcional; admite los espacios que también acepta int()
+_INTEGER = r'\s*[+-]?\d+\s*'
+_INTEGER_KIND = 'un entero'
+_integer_fullmatch = re.compile(_INTEGER).fullmatch
+
+# Fecha y hora ISO 8601, con fracción de segundo y zona horaria opcionales.
+# La zona debe llevar los dos puntos (+05:00): strftime de SQLite devuelve
+# NULL para +0500, y la fila quedaría sin columnas derivadas
+ISO_TIMESTAMP = (
+    r'\d{4}-(?:0[1-9]|1[0-2])-(?:0[1-9]|[12]\d|3[01])'
+    r'[T ](?:[01]\d|2[0-3]):[0-5]\d:[0-5]\d(?:\.\d+)?'
+    r'(?:Z|[+-](?:[01]\d|2[0-3]):[0-5]\d)?'
+)
+
+# Políticas ante filas no válidas
+ON_ERROR_QUARANTINE = 'quarantine'
+ON_ERROR_ABORT = 'abort'
+ERROR_POLICIES = (ON_ERROR_QUARANTINE, ON_ERROR_ABORT)
+
+class RejectedRow(NamedTuple):
+    """
+    Fila descartada por la validación.
+    """
+    line_number: int
+    values: Tuple[str, ...]
+    errors: Tuple[str, ...]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"line_number": self.line_number, "values": list(self.values), "errors": list(self.errors)}
+
+class RowValidationError(ValueError):
+    """
+    Una fila no cumple el esquema de la tabla y la carga no admite descartarla.
+    """
+
+    def __init__(self, rejected: RejectedRow):
+        super().__init__(f"Línea {rejected.line_number}: {'; '.join(rejected.errors)}")
+        self.rejected = rejected
+
+    def __reduce__(self):
+        # Permite devolver la excepción desde un proceso de trabajo
+        return (RowValidationError, (self.rejected,))
+
+class _ColumnCheck(NamedTuple):
+    index: int
+    name: str
+    kind: str
+    fullmatch: Any
+
+def _column_check(index: int, column: ColumnSchema) -> Optional[_ColumnCheck]:
+    """
+    Prepara la comprobación de una columna, o None si la columna admite cualquier texto.
+    """
+    if column.is_integer:
+        kind, pattern = _INTEGER_KIND, _INTEGER
+    elif column.is_timestamp:
+        kind, pattern = 'una fecha ISO 8601', ISO_TIMESTAMP
+    elif not column.nullable:
+        kind, pattern = None, r'(?s).*\S.*'
+    else:
+        return None
+
+    if column.nullable:
+        # Un valor vacío se convierte en NULL
+        pattern = rf'(?:{pattern})?|\s*'
+    fullmatch = re.compile(pattern).fullmatch
+    if column.is_integer:
+        fullmatch = _in_int64_range(fullmatch)
+    return _ColumnCheck(index, column.name, kind, fullmatch)
+
+def _in_int64_range(fullmatch: Callable[[str], Any]) -> Callable[[str], Any]:
+    """
+    Añade a la comprobación de una columna entera el rango de 64 bits con
+    signo: un valor mayor no cabe en array('q') ni en SQLite.
+    """
+    def check(value: str) -> Any:
+        match = fullmatch(value)
+        if match is None or not value.strip():
+            return match
+        return match if INT64_MIN <= int(value) <= INT64_MAX else None
+    return check
+
+class RowValidator:
+    """
+    Valida bloques de filas CSV de una tabla columna a columna: cada
+    comprobación recorre una columna completa con una expresión regular
+    precompilada, en lugar de evaluar el esquema fila a fila. Las filas que
+    superan la validación se pueden convertir con schema.convert_row sin errores.
+    """
+
+    def __init__(self, schema: TableSchema):
+        """
+        Inicializa el validador.
+
+        Args:
+            schema: Esquema de la tabla de destino.
+        """
+        self.schema = schema
+        self.width = len(schema.column_names)
+        self._checks = [
+            check for check in (_column_check(index, column) for index, column in enumerate(schema.columns))
+            if check is not None
+        ]
+
+    def _message(self, check: _ColumnCheck, value: str) -> str:
+        if not value.strip():
+            return f"{check.name}: valor obligatorio vacío"
+        if check.kind == _INTEGER_KIND and _integer_fullmatch(value):
+            return f"{check.name}: {value.strip()} está fuera del rango de los enteros de 64 bits"
+        return f"{check.name}: {value!r} no es {check.kind}"
+
+    def validate(self, rows: Sequence[List[str]],
+                 first_line: int = 1) -> Tuple[List[Tuple[Any, ...]], List[RejectedRow]]:
+        """
+        Valida un bloque de filas y convierte las válidas. Las filas vacías se ignoran.
+
+        Args:
+            rows: Filas del CSV (listas de cadenas).
+            first_line: Número de línea de la primera fila del bloque.
+
+        Returns:
+            Tupla (filas válidas ya tipadas, filas descartadas).
+        """
+        errors: Dict[int, List[str]] = {}
+        complete = []
+        for position, row in enumerate(rows):
+            if len(row) >= self.width:
+                complete.append(position)
+            elif row:
+                errors[position] = [f"se esperaban {self.width} columnas y hay {len(row)}"]
+
+        if complete:
+            columns = list(zip(*(rows[position] for position in complete)))
+            for check in self._checks:
+                values = columns[check.index]
+                fullmatch = check.fullmatch
+                for i in [i for i, value in enumerate(values) if fullmatch(value) is None]:
+                    errors.setdefault(complete[i], []).append(self._message(check, values[i]))
+
+        convert = self.schema.convert_row
+        valid = [convert(rows[position]) for position in complete if position not in errors]
+        rejected = [
+            RejectedRow(first_line + position, tuple(rows[position]), tuple(messages))
+            for position, messages in sorted(errors.items())
+        ]
+        return valid, rejected
+
+def raise_on_rejected(batches: Iterable[ColumnBatch]) -> Iterator[ColumnBatch]:
+    """
+    Recorre los lotes y lanza RowValidationError al encontrar el primero con
+    filas descartadas, antes de entregarlo. Sirve para las cargas que no
+    admiten perder filas (política 'abort').
+
+    Args:
+        batches: Lotes columnares.
+
+    Yields:
+        Los mismos lotes, mientras no tengan filas descartadas.
+    """
+    for batch in batches:
+        if batch.rejected:
+            raise RowValidationError(batch.rejected[0])
+        yield batch
+
+def dry_run_report(batches: Iterable[ColumnBatch], max_samples: int = 100) -> Dict[str, Any]:
+    """
+    Valida una carga completa sin escribir nada en la base de datos.
+
+    Args:
+        batches: Lotes columnares de la carga.
+        max_samples: Número máximo de filas descartadas incluidas en el informe.
+
+    Returns:
+        Número de filas válidas y descartadas y una muestra de las descartadas.
+    """
+    valid = rejected = 0
+    samples: List[Dict[str, Any]] = []
+    for batch in batches:
+        valid += len(batch)
+        rejected += len(batch.rejected)
+        for row in batch.rejected[:max(max_samples - len(samples), 0)]:
+            samples.append(row.to_dict())
+    return {
+        "dry_run": True,
+        "records_valid": valid,
+        "records_rejected": rejected,
+        "rejected_sample": samples
+    }
@@ -0,0 +1,124 @@
+"""
+Utilidades para procesar cuerpos de petición a medida que se reciben
+"""
+import queue
+import threading
+from typing import Callable, Optional
+
+class ChunkStream:
+    """
+    Flujo binario alimentado por fragmentos desde otro hilo.
+
+    El productor (el bucle de eventos que recibe la petición) llama a feed()
+    con cada fragmento y a finish() al terminar; el consumidor (un hilo que
+    parsea e inserta) lo lee con read() como si fuera un archivo. La cola es
+    acotada, así que un consumidor lento frena al productor en lugar de
+    acumular el cuerpo completo en memoria.
+    """
+
+    # Intervalo para volver a comprobar si el otro extremo ha abandonado
+    _POLL_INTERVAL = 0.1
+
+    def __init__(self, max_chunks: int = 16, on_space: Optional[Callable[[], None]] = None):
+        """
+        Inicializa el flujo.
+
+        Args:
+            max_chunks: Número máximo de fragmentos pendientes de leer.
+            on_space: Función a la que llama el consumidor (desde su hilo) al
+                      sacar un fragmento de la cola o al cerrar el flujo, para
+                      que un productor que usa offer() sepa cuándo reintentar.
+        """
+        self._queue = queue.Queue(maxsize=max_chunks)
+        self._on_space = on_space
+        self._buffer = b''
+        self._eof = False
+        self._closed = threading.Event()
+        self._error: Optional[BaseException] = None
+
+    def feed(self, chunk: bytes):
+        """
+        Añade un fragmento al flujo. Bloquea mientras la cola esté llena.
+
+        Args:
+            chunk: Bytes recibidos. Un fragmento vacío marca el final del flujo.
+        """
+        while True:
+            if self._closed.is_set():
+                raise BrokenPipeError("El consumidor del flujo se ha detenido")
+            try:
+                self._queue.put(chunk, timeout=self._POLL_INTERVAL)
+                return
+            except queue.Full:
+                continue
+
+    def offer(self, chunk: bytes) -> bool:
+        """
+        Añade un fragmento al flujo sin bloquear.
+
+        Args:
+            chunk: Bytes recibidos. Un fragmento vacío marca el final del flujo.
+
+        Returns:
+            True si se ha añadido, o False si la cola está llena.
+        """
+        if self._closed.is_set():
+            raise BrokenPipeError("El consumidor del flujo se ha detenido")
+        try:
+            self._queue.put_nowait(chunk)
+        except queue.Full:
+            return False
+        return True
+
+    def finish(self):
+        """
+        Marca el final del flujo.
+        """
+        self.feed(b'')
+
+    def fail(self, error: BaseException):
+        """
+        Aborta el flujo desde el productor; el consumidor recibirá el error.
+
+        Args:
+            error: Excepción que se lanzará en el consumidor.
+        """
+        self._error = error
+
+    def close(self):
+        """
+        Cierra el flujo desde el consumidor; el productor dejará de bloquearse.
+        """
+        self._closed.set()
+        if self._on_space is not None:
+            self._on_space()
+
+    def read(self, size: int = -1) -> bytes:
+        """
+        Lee hasta size bytes del flujo, esperando a que llegue el siguiente fragmento.
+
+        Args:
+            size: Número máximo de bytes a devolver (-1 para un fragmento completo).
+
+        Returns:
+            Bytes leídos, o b'' al final del flujo.
+        """
+        while not self._buffer and not self._eof:
+            if self._error is not None:
+                raise self._error
+            try:
+                chunk = self._queue.get(timeout=self._POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            if self._on_space is not None:
+                self._on_space()
+            if chunk:
+                self._buffer = chunk
+            else:
+                self._eof = True
+
+        if size is None or size < 0 or size >= len(self._buffer):
+            data, self._buffer = self._buffer, b''
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
@@ -0,0 +1,74 @@
+"""
+Comparación de rendimiento de las consultas analíticas de /sql entre SQLite
+y la réplica en DuckDB (app.database.analytics) sobre un hired_employees
+sintético. Comprueba además que ambos motores devuelven los mismos resultados.
+Requiere el paquete duckdb.
+
+Uso:
+    python -m benchmarks.bench_analytics --rows 5000000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from app.database.analytics import DuckDBAnalytics, SQLiteAnalytics
+from app.database.create_db import create_database
+from app.database.db_manager import DatabaseManager
+from app.routes.sql_routes import DEPARTMENTS_ABOVE_MEAN_QUERY, EMPLOYEES_BY_QUARTER_QUERY, REPORT_YEAR, ReportPeriod
+from app.utils.csv_processor import iter_csv_batches
+from benchmarks.bench_csv_parsing import write_hired_employees
+
+QUERIES = {
+    "employees-by-quarter": EMPLOYEES_BY_QUARTER_QUERY,
+    "departments-above-mean": DEPARTMENTS_ABOVE_MEAN_QUERY,
+}
+
+def measure(backend, query: str, repeat: int):
+    """
+    Ejecuta una consulta repeat veces y devuelve el mejor tiempo y el resultado.
+    """
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = backend.query(query, ReportPeriod.for_year(REPORT_YEAR).params)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=5_000_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = os.path.join(tmp_dir, 'hired_employees.csv')
+        write_hired_employees(file_path, args.rows)
+
+        db_manager = DatabaseManager(create_database(os.path.join(tmp_dir, 'analytics.db')))
+        with db_manager.bulk_load() as session:
+            session.insert('departments', [{"id": i, "department": f"Department {i}"} for i in range(1, 13)])
+            session.insert('jobs', [{"id": i, "job": f"Job {i}"} for i in range(1, 184)])
+            session.insert_batches('hired_employees', iter_csv_batches(file_path, 10000, 'hired_employees'))
+
+        sqlite_backend = SQLiteAnalytics(db_manager)
+        duckdb_backend = DuckDBAnalytics(db_manager)
+        try:
+            start = time.perf_counter()
+            copied = duckdb_backend.refresh()
+            print(f"Réplica DuckDB: {sum(copied.values())} filas en {time.perf_counter() - start:.2f} s")
+
+            for name, query in QUERIES.items():
+                sqlite_time, sqlite_result = measure(sqlite_backend, query, args.repeat)
+                duckdb_time, duckdb_result = measure(duckdb_backend, query, args.repeat)
+                if duckdb_result != sqlite_result:
+                    raise SystemExit(f"{name}: los resultados de SQLite y DuckDB no coinciden")
+                print(f"{name:<24} sqlite {sqlite_time * 1000:9.1f} ms  duckdb {duckdb_time * 1000:9.1f} ms"
+                      f"  aceleración {sqlite_time / duckdb_time:6.2f}x")
+        finally:
+            duckdb_backend.close()
+            db_manager.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Medición de la memoria ocupada por un millón de filas de hired_employees,
+representadas como lista de diccionarios y como lote columnar.
+
+Uso:
+    python -m benchmarks.bench_batch_memory --rows 1000000
+"""
+import argparse
+import tracemalloc
+
+from app.utils.column_batch import ColumnBatch
+from app.database.schema import get_schema
+
+def generate_rows(rows: int):
+    """
+    Genera filas tipadas de hired_employees.
+    """
+    for i in range(1, rows + 1):
+        job_id = None if i % 50 == 0 else i % 183 + 1
+        yield (i, f"Employee Name {i}", f"2021-{i % 12 + 1:02d}-07T02:48:42Z", i % 12 + 1, job_id)
+
+def measure(label: str, build, rows: int) -> float:
+    """
+    Construye la estructura y devuelve los MB ocupados por millón de filas.
+    """
+    tracemalloc.start()
+    structure = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del structure
+    mb_per_million = current / (1024 * 1024) * 1_000_000 / rows
+    print(f"{label:<22} {mb_per_million:10.1f} MB por millón de filas")
+    return mb_per_million
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    schema = get_schema('hired_employees')
+    columns = schema.column_names
+    int_columns, nullable_columns = schema.int_columns, schema.nullable_int_columns
+
+    def build_dicts():
+        return [dict(zip(columns, row)) for row in generate_rows(args.rows)]
+
+    def build_columns():
+        batch = ColumnBatch(columns, int_columns, nullable_columns)
+        for row in generate_rows(args.rows):
+            batch.append(row)
+        return batch
+
+    dicts = measure("lista de diccionarios", build_dicts, args.rows)
+    columnar = measure("lote columnar", build_columns, args.rows)
+    print(f"Ahorro: {dicts - columnar:.1f} MB por millón de filas ({columnar / dicts:.0%} del original)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Comparación de rendimiento entre la inserción por lotes confirmados uno a uno
+(insert_batch) y una sesión de carga masiva (DatabaseManager.bulk_load) sobre
+un archivo hired_employees.csv sintético.
+
+Uso:
+    python -m benchmarks.bench_bulk_load --rows 1000000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from app.database.create_db import create_database
+from app.database.db_manager import DatabaseManager
+from app.utils.csv_processor import iter_csv_batches
+from benchmarks.bench_csv_parsing import write_hired_employees
+
+def measure(label: str, load) -> float:
+    """
+    Ejecuta una carga y devuelve las filas por segundo.
+    """
+    start = time.perf_counter()
+    rows = load()
+    elapsed = time.perf_counter() - start
+    rate = rows / elapsed
+    print(f"{label:<28} {rows:>10} filas  {elapsed:8.2f} s  {rate:>12,.0f} filas/s")
+    return rate
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--synchronous', default='NORMAL')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = os.path.join(tmp_dir, 'hired_employees.csv')
+        write_hired_employees(file_path, args.rows)
+
+        def batches():
+            return iter_csv_batches(file_path, args.batch_size, 'hired_employees')
+
+        def database(name: str) -> DatabaseManager:
+            db_path = create_database(os.path.join(tmp_dir, name))
+            db_manager = DatabaseManager(db_path)
+            db_manager.execute_query("CREATE INDEX idx_hired_department ON hired_employees (department_id)")
+            return db_manager
+
+        per_batch = database('per_batch.db')
+        baseline = measure("lote a lote", lambda: per_batch.insert_batches('hired_employees', batches())[0])
+
+        bulk = database('bulk.db')
+        def bulk_load() -> int:
+            with bulk.bulk_load(['hired_employees'], synchronous=args.synchronous) as session:
+                return session.insert_batches('hired_employees', batches())[0]
+        rate = measure(f"carga masiva ({args.synchronous})", bulk_load)
+        print(f"Aceleración: {rate / baseline:.2f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Comparación de rendimiento entre la lectura con un archivo de texto con búfer,
+la lectura secuencial sobre mmap y el parseo paralelo de un archivo
+hired_employees.csv sintético.
+
+Uso:
+    python -m benchmarks.bench_csv_parsing --rows 2000000 --workers 16
+"""
+import argparse
+import csv
+import os
+import tempfile
+import time
+
+from app.utils.csv_processor import _iter_column_batches, iter_csv_batches
+from app.utils.parallel_csv import iter_csv_batches_parallel
+
+def write_hired_employees(file_path: str, rows: int):
+    """
+    Genera un archivo hired_employees.csv sintético.
+
+    Args:
+        file_path: Ruta del archivo a generar.
+        rows: Número de filas.
+    """
+    with open(file_path, 'w', encoding='utf-8') as file:
+        for i in range(1, rows + 1):
+            job_id = '' if i % 50 == 0 else str(i % 183 + 1)
+            file.write(f"{i},Employee Name {i},2021-{i % 12 + 1:02d}-07T02:48:42Z,{i % 12 + 1},{job_id}\n")
+
+def iter_text_batches(file_path: str, batch_size: int):
+    """
+    Lee el archivo a través de un archivo de texto con búfer, como antes de usar mmap.
+    """
+    with open(file_path, encoding='utf-8', newline='') as file:
+        yield from _iter_column_batches(csv.reader(file), 'hired_employees', batch_size)
+
+def measure(label: str, batches) -> float:
+    """
+    Consume los lotes y devuelve las filas por segundo.
+    """
+    start = time.perf_counter()
+    rows = sum(len(batch) for batch in batches)
+    elapsed = time.perf_counter() - start
+    rate = rows / elapsed
+    print(f"{label:<28} {rows:>10} filas  {elapsed:8.2f} s  {rate:>12,.0f} filas/s")
+    return rate
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = os.path.join(tmp_dir, 'hired_employees.csv')
+        write_hired_employees(file_path, args.rows)
+        size_mb = os.path.getsize(file_path) / (1024 * 1024)
+        print(f"Archivo: {args.rows} filas, {size_mb:.1f} MB, {args.workers} procesos")
+
+        text = measure("texto con búfer", iter_text_batches(file_path, args.batch_size))
+        sequential = measure("secuencial (mmap)", iter_csv_batches(file_path, args.batch_size))
+        print(f"mmap frente a texto: {sequential / text:.2f}x")
+        parallel = measure(
+            f"paralelo ({args.workers} procesos)",
+            iter_csv_batches_parallel(file_path, args.batch_size, args.workers)
+        )
+        print(f"Aceleración: {parallel / sequential:.2f}x")
+
+if __name__ == '__main__':
+    main()
@@ -31,6 +31,7 @@ def setup_test_db():
     yield db_manager
     
     # Limpiar después de las pruebas
+    db_manager.close()
     if os.path.exists(test_db_path):
         os.remove(test_db_path)
 
@@ -156,3 +157,827 @@ def test_batch_size_validation():
     
     assert response.status_code == 400
     assert "tamaño del lote" in response.json()["detail"]
+
+@pytest.fixture
+def isolated_db(tmp_path):
+    """Configura una base de datos vacía y aislada para la API principal"""
+    import app.main_updated as main_updated
+    
+    test_db_path = str(tmp_path / "isolated.db")
+    create_database(test_db_path)
+    db_manager = DatabaseManager(test_db_path)
+    
+    main_updated.test_mode = True
+    main_updated.test_db_manager = db_manager
+    
+    yield db_manager
+    
+    main_updated.test_mode = False
+    main_updated.test_db_manager = None
+    db_manager.close()
+
+def test_upload_from_path_streams_more_than_1000_rows(isolated_db, tmp_path):
+    """Prueba que la carga desde ruta no está limitada a 1000 registros"""
+    csv_path = tmp_path / "hired_employees.csv"
+    with open(csv_path, "w", encoding="utf-8") as f:
+        for i in range(1, 2501):
+            f.write(f"{i},Employee {i},2021-01-15T10:00:00Z,1,1\n")
+    
+    response = client.post(
+        "/upload-from-path/hired_employees?batch_size=1000",
+        json={"file_path": str(csv_path)}
+    )
+    
+    assert response.status_code == 201
+    assert response.json()["records_inserted"] == 2500
+    assert response.json()["batches"] == 3
+    assert isolated_db.execute_query("SELECT COUNT(*) FROM hired_employees")[0][0] == 2500
+
+def test_upload_from_path_missing_file(isolated_db):
+    """Prueba que un archivo inexistente devuelve 404"""
+    response = client.post(
+        "/upload-from-path/departments",
+        json={"file_path": "/no/existe/departments.csv"}
+    )
+    
+    assert response.status_code == 404
+
+def test_upload_multipart_without_temp_file(isolated_db):
+    """Prueba la carga de un archivo multipart procesado directamente desde el stream"""
+    content = "".join(f"{i},Job {i}\n" for i in range(1, 1501)).encode("utf-8")
+    
+    response = client.post(
+        "/upload/jobs",
+        files={"file": ("jobs.csv", content, "text/csv")}
+    )
+    
+    assert response.status_code == 201
+    assert response.json()["records_inserted"] == 1500
+    assert response.json()["batches"] == 2
+
+def test_upload_stream_raw_body(isolated_db):
+    """Prueba la carga de un CSV enviado como cuerpo crudo en varios fragmentos"""
+    def body():
+        for start in range(1, 3001, 500):
+            yield "".join(f"{i},Employee {i},2021-03-01T08:00:00Z,,\n"
+                          for i in range(start, start + 500)).encode("utf-8")
+    
+    response = client.post(
+        "/upload-stream/hired_employees?batch_size=700",
+        content=body(),
+        headers={"Content-Type": "text/csv"}
+    )
+    
+    assert response.status_code == 201
+    assert response.json()["records_inserted"] == 3000
+    assert response.json()["batches"] == 5
+    rows = isolated_db.execute_query("SELECT department_id, job_id FROM hired_employees LIMIT 1")
+    assert rows == [(None, None)]
+
+def test_upload_uses_table_name_for_schema(isolated_db):
+    """Prueba que un archivo con nombre arbitrario se interpreta según la tabla de la ruta"""
+    response = client.post(
+        "/upload/departments",
+        files={"file": ("export_20240101.csv", b"1,Sales\n2,Finance\n", "text/csv")}
+    )
+    
+    assert response.status_code == 201
+    assert isolated_db.execute_query("SELECT id, department FROM departments ORDER BY id") == [
+        (1, "Sales"), (2, "Finance")
+    ]
+
+def test_upload_from_path_resumes_from_checkpoint(isolated_db, tmp_path):
+    """Prueba que un trabajo fallido se reanuda desde el último lote confirmado"""
+    csv_path = tmp_path / "departments.csv"
+    lines = [f"{i},Dept {i}\n" for i in range(1, 11)]
+    # La fila 8 no es válida: solo el primer lote (filas 1-5) se confirma antes del fallo
+    lines[7] = "x,Broken\n"
+    csv_path.write_text("".join(lines), encoding="utf-8")
+    
+    response = client.post(
+        "/upload-from-path/departments?batch_size=5&on_error=abort",
+        json={"file_path": str(csv_path), "job_id": "job-resume"}
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("Línea 8:")
+    assert isolated_db.execute_query("SELECT COUNT(*) FROM departments")[0][0] == 5
+    
+    # Corregir la fila y reanudar con el mismo job_id
+    lines[7] = "8,Dept 8\n"
+    csv_path.write_text("".join(lines), encoding="utf-8")
+    response = client.post(
+        "/upload-from-path/departments?batch_size=5&on_error=abort",
+        json={"file_path": str(csv_path), "job_id": "job-resume"}
+    )
+    
+    assert response.status_code == 201
+    body = response.json()
+    assert body["resumed_from_offset"] == len("".join(lines[:5]).encode("utf-8"))
+    assert body["records_inserted"] == 5
+    assert body["total_records"] == 10
+    assert isolated_db.execute_query("SELECT COUNT(*) FROM departments")[0][0] == 10
+    
+    # Repetir un trabajo completado no vuelve a insertar nada
+    response = client.post(
+        "/upload-from-path/departments",
+        json={"file_path": str(csv_path), "job_id": "job-resume"}
+    )
+    assert response.status_code == 201
+    assert response.json()["records_inserted"] == 0
+
+def wait_for_job(job_id, timeout=10.0):
+    """Consulta el estado de un trabajo hasta que termina"""
+    import time
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = client.get(f"/jobs/{job_id}").json()
+        if status["status"] in ("completed", "failed"):
+            return status
+        time.sleep(0.05)
+    raise AssertionError(f"El trabajo {job_id} no terminó a tiempo")
+
+def test_upload_from_path_background_job(isolated_db, tmp_path):
+    """Prueba la importación en segundo plano con respuesta 202 y consulta de estado"""
+    csv_path = tmp_path / "jobs.csv"
+    csv_path.write_text("".join(f"{i},Job {i}\n" for i in range(1, 2001)), encoding="utf-8")
+    
+    response = client.post(
+        "/upload-from-path/jobs?background=true&batch_size=500",
+        json={"file_path": str(csv_path)}
+    )
+    
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+    assert response.headers["location"] == f"/jobs/{job_id}"
+    
+    status = wait_for_job(job_id)
+    assert status["status"] == "completed"
+    assert status["rows_parsed"] == 2000
+    assert status["rows_inserted"] == 2000
+    assert status["bytes_processed"] == status["bytes_total"]
+    assert status["eta_seconds"] == 0.0
+    assert isolated_db.execute_query("SELECT COUNT(*) FROM jobs")[0][0] == 2000
+
+def test_upload_multipart_background_job(isolated_db):
+    """Prueba la carga multipart en segundo plano"""
+    response = client.post(
+        "/upload/departments?background=true",
+        files={"file": ("departments.csv", b"1,Sales\n2,Finance\n", "text/csv")}
+    )
+    
+    assert response.status_code == 202
+    status = wait_for_job(response.json()["job_id"])
+    assert status["status"] == "completed"
+    assert isolated_db.execute_query("SELECT COUNT(*) FROM departments")[0][0] == 2
+
+def test_job_status_not_found(isolated_db):
+    """Prueba que un trabajo desconocido devuelve 404"""
+    response = client.get("/jobs/no-existe")
+    
+    assert response.status_code == 404
+
+def test_upload_bundle_single_transaction(isolated_db):
+    """Prueba la carga conjunta de las tres tablas"""
+    response = client.post(
+        "/upload-bundle",
+        files={
+            "hired_employees": ("he.csv", b"1,Ana,2021-01-01T00:00:00Z,1,1\n2,Luis,2021-05-01T00:00:00Z,2,\n", "text/csv"),
+            "departments": ("d.csv", b"1,Sales\n2,Finance\n", "text/csv"),
+            "jobs": ("j.csv", b"1,Analyst\n", "text/csv")
+        }
+    )
+    
+    assert response.status_code == 201
+    assert response.json()["records_inserted"] == {"departments": 2, "jobs": 1, "hired_employees": 2}
+
+def test_upload_bundle_rolls_back_on_error(isolated_db):
+    """Prueba que un error en la tabla de hechos deshace también las dimensiones"""
+    response = client.post(
+        "/upload-bundle",
+        files={
+            "departments": ("d.csv", b"1,Sales\n", "text/csv"),
+            "jobs": ("j.csv", b"1,Analyst\n", "text/csv"),
+            "hired_employees": ("he.csv", b"1,Ana,2021-01-01T00:00:00Z,1,1\n1,Dup,2021-01-01T00:00:00Z,1,1\n", "text/csv")
+        }
+    )
+    
+    assert response.status_code == 500
+    assert isolated_db.execute_query("SELECT COUNT(*) FROM departments")[0][0] == 0
+    assert isolated_db.execute_query("SELECT COUNT(*) FROM jobs")[0][0] == 0
+
+def test_uploads_parse_outside_writer_lane(isolated_db, tmp_path, monkeypatch):
+    """Prueba que /upload, /upload-bundle y los trabajos en segundo plano no parsean en el hilo de escritura"""
+    import threading
+    import app.database.import_jobs as import_jobs
+    import app.main_updated as main_updated
+    
+    parsed_in = []
+    
+    def recording(iter_batches):
+        def wrapper(*args, **kwargs):
+            for batch in iter_batches(*args, **kwargs):
+                parsed_in.append(threading.current_thread().name)
+                yield batch
+        return wrapper
+    
+    monkeypatch.setattr(main_updated, "iter_stream_batches", recording(main_updated.iter_stream_batches))
+    monkeypatch.setattr(import_jobs, "iter_csv_batches_from_offset",
+                        recording(import_jobs.iter_csv_batches_from_offset))
+    
+    assert client.post("/upload/departments?batch_size=2",
+                       files={"file": ("d.csv", b"1,Sales\n2,Finance\n3,HR\n", "text/csv")}).status_code == 201
+    assert client.post("/upload/jobs?bulk=true",
+                       files={"file": ("j.csv", b"1,Analyst\n", "text/csv")}).status_code == 201
+    response = client.post(
+        "/upload-bundle",
+        files={
+            "departments": ("d.csv", b"4,Legal\n", "text/csv"),
+            "jobs": ("j.csv", b"2,Engineer\n", "text/csv"),
+            "hired_employees": ("he.csv", b"1,Ana,2021-01-01T00:00:00Z,4,2\n", "text/csv")
+        }
+    )
+    assert response.status_code == 201
+    csv_path = tmp_path / "jobs.csv"
+    csv_path.write_text("3,Manager\n4,Director\n", encoding="utf-8")
+    response = client.post("/upload-from-path/jobs?background=true", json={"file_path": str(csv_path)})
+    assert wait_for_job(response.json()["job_id"])["status"] == "completed"
+    
+    assert len(parsed_in) == 7
+    assert not [name for name in parsed_in if name.startswith("db-write")]
+    assert isolated_db.execute_query("SELECT COUNT(*) FROM jobs") == [(4,)]
+
+def test_upload_compressed_files(isolated_db, tmp_path):
+    """Prueba la carga de CSV comprimidos por multipart y desde ruta, incluido el modo paralelo"""
+    import bz2
+    import gzip
+    
+    jobs = "".join(f"{i},Job {i}\n" for i in range(1, 1201)).encode("utf-8")
+    response = client.post(
+        "/upload/jobs",
+        files={"file": ("jobs.csv.gz", gzip.compress(jobs), "application/gzip")}
+    )
+    assert response.status_code == 201
+    assert response.json()["records_inserted"] == 1200
+    
+    csv_path = tmp_path / "departments.csv.bz2"
+    csv_path.write_bytes(bz2.compress("".join(f"{i},Dept {i}\n" for i in range(1, 301)).encode("utf-8")))
+    response = client.post("/upload-from-path/departments", json={"file_path": str(csv_path)})
+    assert response.status_code == 201
+    assert response.json()["records_inserted"] == 300
+    
+    # Con varios procesos, el archivo comprimido se lee de forma secuencial
+    isolated_db.execute_query("DELETE FROM departments")
+    response = client.post("/upload-from-path/departments?workers=2", json={"file_path": str(csv_path)})
+    assert response.status_code == 201
+    assert response.json()["records_inserted"] == 300
+
+def test_batch_stream_ndjson(isolated_db):
+    """Prueba la inserción de un flujo NDJSON largo en lotes, recibido en fragmentos"""
+    import json
+    
+    def body():
+        for start in range(1, 2501, 250):
+            yield "".join(json.dumps({"id": i, "name": f"Employee {i}", "datetime": "2021-05-01T09:00:00Z",
+                                      "department_id": 1, "job_id": None}) + "\n"
+                          for i in range(start, start + 250)).encode("utf-8")
+        yield b"\n"
+    
+    response = client.post(
+        "/batch-stream/hired_employees?batch_size=1000",
+        content=body(),
+        headers={"Content-Type": "application/x-ndjson"}
+    )
+    
+    assert response.status_code == 201
+    assert response.json()["records_inserted"] == 2500
+    assert response.json()["batches"] == 3
+    assert isolated_db.execute_query("SELECT COUNT(*), COUNT(job_id) FROM hired_employees") == [(2500, 0)]
+
+def test_batch_stream_ndjson_invalid_line(isolated_db):
+    """Prueba que una línea no válida devuelve 400 con su número y conserva los lotes anteriores"""
+    lines = [f'{{"id": {i}, "department": "Dept {i}"}}' for i in range(1, 6)]
+    lines.append('{"id": "seis", "department": "Dept 6"}')
+    
+    response = client.post(
+        "/batch-stream/departments?batch_size=2",
+        content="\n".join(lines).encode("utf-8"),
+        headers={"Content-Type": "application/x-ndjson"}
+    )
+    
+    assert response.status_code == 400
+    assert "Línea 6" in response.json()["detail"]
+    assert isolated_db.execute_query("SELECT COUNT(*) FROM departments")[0][0] == 4
+
+def test_batch_stream_does_not_hold_writer_while_client_pauses(isolated_db):
+    """Prueba que un cliente de /batch-stream detenido a mitad del cuerpo no bloquea las demás escrituras"""
+    import asyncio
+    import app.main_updated as main_updated
+    from app.utils.db_utils import get_async_db
+    
+    async def scenario():
+        resume = asyncio.Event()
+        
+        class PausedRequest:
+            async def stream(self):
+                yield b'{"id": 1, "department": "Dept 1"}\n{"id": 2, "department": "Dept 2"}\n'
+                await resume.wait()
+                yield b'{"id": 3, "department": "Dept 3"}\n'
+        
+        upload = asyncio.ensure_future(main_updated.insert_batch_stream("departments", PausedRequest(), batch_size=2))
+        db = get_async_db()
+        
+        async def first_batch():
+            while (await db.execute_query("SELECT COUNT(*) FROM departments"))[0][0] < 2:
+                await asyncio.sleep(0.01)
+        
+        try:
+            await asyncio.wait_for(first_batch(), timeout=5)
+            # El carril de escritura sigue libre mientras el cliente no envía más bytes
+            assert await asyncio.wait_for(db.write(lambda: "libre"), timeout=2) == "libre"
+        finally:
+            resume.set()
+            response = await upload
+        return response
+    
+    response = asyncio.run(scenario())
+    assert response.status_code == 201
+    assert isolated_db.execute_query("SELECT COUNT(*) FROM departments") == [(3,)]
+
+def test_concurrent_streams_do_not_exhaust_threadpool(isolated_db):
+    """Prueba que más flujos simultáneos que hilos en run_in_threadpool terminan todos"""
+    import asyncio
+    import anyio
+    import app.main_updated as main_updated
+    
+    class ChunkedRequest:
+        def __init__(self, first_id):
+            self.first_id = first_id
+        
+        async def stream(self):
+            for i in range(self.first_id, self.first_id + 40):
+                yield f'{{"id": {i}, "department": "Dept {i}"}}\n'.encode("utf-8")
+                await asyncio.sleep(0)
+    
+    async def scenario():
+        anyio.to_thread.current_default_thread_limiter().total_tokens = 2
+        uploads = [main_updated.insert_batch_stream("departments", ChunkedRequest(first_id), batch_size=10)
+                   for first_id in range(1, 201, 40)]
+        return await asyncio.wait_for(asyncio.gather(*uploads), timeout=10)
+    
+    responses = asyncio.run(scenario())
+    assert [response.status_code for response in responses] == [201] * 5
+    assert isolated_db.execute_query("SELECT COUNT(*) FROM departments") == [(200,)]
+
+def test_batch_ignores_client_derived_columns(isolated_db):
+    """Prueba que las columnas derivadas enviadas por el cliente se sustituyen por las calculadas"""
+    response = client.post("/batch/hired_employees", json=[
+        {"id": 1, "name": "Ana", "datetime": "2021-01-01T10:00:00Z", "department_id": 1, "job_id": 1,
+         "hire_year": 1999, "hire_quarter": 4, "hire_epoch": 0}
+    ])
+    
+    assert response.status_code == 201
+    assert isolated_db.execute_query(
+        "SELECT hire_year, hire_quarter, hire_epoch > 0 FROM hired_employees") == [(2021, 1, 1)]
+    assert isolated_db.execute_query(
+        "SELECT hire_year, SUM(hired) FROM hired_employees_summary GROUP BY hire_year") == [(2021, 1)]
+
+def test_upload_quarantines_invalid_rows(isolated_db):
+    """Prueba que las filas no válidas se guardan en cuarentena con su línea y el resto se carga"""
+    content = (
+        "1,Ana,2021-01-15T10:00:00Z,1,2\n"
+        ",Sin id,2021-01-15T10:00:00Z,1,2\n"
+        "3,,2021-02-01T00:00:00Z,,\n"
+        "4,Luis,15/01/2021,x,\n"
+        "5,Eva,2021-03-01T08:30:00Z,,\n"
+        "6,Corta\n"
+    ).encode("utf-8")
+    
+    response = client.post(
+        "/upload/hired_employees?batch_size=4",
+        files={"file": ("hired_employees.csv", content, "text/csv")}
+    )
+    
+    assert response.status_code == 201
+    body = response.json()
+    assert body["records_inserted"] == 2
+    assert body["records_rejected"] == 4
+    assert isolated_db.execute_query("SELECT id FROM hired_employees ORDER BY id") == [(1,), (5,)]
+    
+    rejected = client.get(f"/rejected/{body['load_id']}").json()
+    assert rejected["total"] == 4
+    assert [row["line_number"] for row in rejected["rows"]] == [2, 3, 4, 6]
+    assert rejected["rows"][2]["errors"] == [
+        "datetime: '15/01/2021' no es una fecha ISO 8601",
+        "department_id: 'x' no es un entero"
+    ]
+    assert rejected["rows"][1]["errors"] == ["name: valor obligatorio vacío"]
+
+def test_upload_quarantines_out_of_range_integers(isolated_db):
+    """Prueba que un entero que no cabe en 64 bits se descarta en lugar de hacer fallar la carga"""
+    content = (
+        "1,Ana,2021-01-15T10:00:00Z,1,2\n"
+        "99999999999999999999,Luis,2021-01-15T10:00:00Z,1,2\n"
+        "3,Eva,2021-03-01T08:30:00Z,-9223372036854775809,\n"
+        "9223372036854775807,Sara,2021-03-01T08:30:00Z,,\n"
+    ).encode("utf-8")
+    
+    response = client.post("/upload/hired_employees", files={"file": ("hired_employees.csv", content, "text/csv")})
+    
+    assert response.status_code == 201
+    body = response.json()
+    assert (body["records_inserted"], body["records_rejected"]) == (2, 2)
+    rejected = client.get(f"/rejected/{body['load_id']}").json()
+    assert [row["errors"] for row in rejected["rows"]] == [
+        ["id: 99999999999999999999 está fuera del rango de los enteros de 64 bits"],
+        ["department_id: -9223372036854775809 está fuera del rango de los enteros de 64 bits"],
+    ]
+    
+    response = client.post("/batch-stream/departments", content=b'{"id": 99999999999999999999, "department": "D"}\n',
+                           headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 400
+    assert "Línea 1" in response.json()["detail"]
+
+def test_upload_rejects_timezone_without_colon(isolated_db):
+    """Prueba que una zona horaria sin dos puntos, que SQLite no interpreta, se descarta"""
+    content = (
+        "1,Ana,2021-01-01T00:00:00+05:00,1,1\n"
+        "2,Luis,2021-01-01T00:00:00+0500,1,1\n"
+    ).encode("utf-8")
+    
+    response = client.post("/upload/hired_employees", files={"file": ("hired_employees.csv", content, "text/csv")})
+    
+    assert response.status_code == 201
+    assert (response.json()["records_inserted"], response.json()["records_rejected"]) == (1, 1)
+    assert isolated_db.execute_query("SELECT id, hire_year FROM hired_employees") == [(1, 2020)]
+
+def test_upload_from_path_dry_run(isolated_db, tmp_path):
+    """Prueba que dry_run informa de las filas no válidas sin escribir nada"""
+    csv_path = tmp_path / "jobs.csv"
+    csv_path.write_text("1,Analyst\nx,Broken\n3,\n4,Manager\n", encoding="utf-8")
+    
+    for workers in (1, 2):
+        response = client.post(
+            f"/upload-from-path/jobs?dry_run=true&workers={workers}&batch_size=2",
+            json={"file_path": str(csv_path)}
+        )
+        
+        assert response.status_code == 200
+        body = response.json()
+        assert body["records_valid"] == 2
+        assert body["records_rejected"] == 2
+        assert [row["line_number"] for row in body["rejected_sample"]] == [2, 3]
+    assert isolated_db.execute_query("SELECT COUNT(*) FROM jobs")[0][0] == 0
+
+def test_upload_upsert_updates_changed_rows(isolated_db, tmp_path):
+    """Prueba que el modo upsert solo reescribe los registros que cambian y omite recargas idénticas"""
+    csv_path = tmp_path / "jobs.csv"
+    csv_path.write_text("1,Analyst\n2,Manager\n3,Engineer\n", encoding="utf-8")
+    url = "/upload-from-path/jobs?mode=upsert&batch_size=2"
+    
+    response = client.post(url, json={"file_path": str(csv_path)})
+    assert response.status_code == 201
+    assert response.json()["records_inserted"] == 3
+    
+    # Un archivo idéntico no se vuelve a cargar
+    response = client.post(url, json={"file_path": str(csv_path)})
+    assert response.status_code == 200
+    assert response.json()["unchanged"] is True
+    
+    # Solo el registro modificado y el nuevo se escriben
+    csv_path.write_text("1,Analyst\n2,Director\n3,Engineer\n4,Designer\n", encoding="utf-8")
+    response = client.post(
+        "/upload/jobs?mode=upsert",
+        files={"file": ("jobs.csv", csv_path.read_bytes(), "text/csv")}
+    )
+    assert response.status_code == 201
+    body = response.json()
+    assert body["records_inserted"] == 2
+    assert body["records_unchanged"] == 2
+    assert isolated_db.execute_query("SELECT job FROM jobs WHERE id = 2") == [("Director",)]
+    
+    # force y truncate invalidan la huella
+    response = client.post(url + "&force=true", json={"file_path": str(csv_path)})
+    assert response.status_code == 201
+    assert response.json()["records_inserted"] == 0
+    
+    assert client.post("/truncate/jobs").status_code == 200
+    response = client.post(url, json={"file_path": str(csv_path)})
+    assert response.status_code == 201
+    assert response.json()["records_inserted"] == 4
+    
+    response = client.post(url.replace("upsert", "merge"), json={"file_path": str(csv_path)})
+    assert response.status_code == 400
+
+def test_connection_pool_reuses_connections(tmp_path):
+    """Prueba que el pool reutiliza las conexiones y descarta las que ya no sirven"""
+    db_path = str(tmp_path / "pool.db")
+    create_database(db_path)
+    # Sin WAL, para poder sustituir el archivo con conexiones abiertas
+    db_manager = DatabaseManager(db_path, pool_size=1, pragmas={"busy_timeout": 5000})
+    
+    for i in range(1, 4):
+        db_manager.insert_batch("departments", [{"id": i, "department": f"Dept {i}"}])
+    assert db_manager.execute_query("SELECT COUNT(*) FROM departments") == [(3,)]
+    assert db_manager.pool.connections_opened == 1
+    assert db_manager.execute_query("PRAGMA busy_timeout") == [(5000,)]
+    # Solo los usos que modificaron filas cuentan como escrituras
+    assert db_manager.write_version == 3
+    
+    # Una transacción abierta se deshace al devolver la conexión
+    conn, cursor = db_manager.get_connection()
+    cursor.execute("INSERT INTO departments (id, department) VALUES (4, 'Sin confirmar')")
+    db_manager.close_connection(conn)
+    assert db_manager.execute_query("SELECT COUNT(*) FROM departments") == [(3,)]
+    
+    # Si el archivo se sustituye, la conexión inactiva se descarta
+    os.remove(db_path)
+    create_database(db_path)
+    assert db_manager.execute_query("SELECT COUNT(*) FROM departments") == [(0,)]
+    assert db_manager.pool.connections_opened == 2
+    
+    db_manager.close()
+    assert db_manager.pool.idle_count() == 0
+
+def test_read_only_snapshot_connections(isolated_db):
+    """Prueba que las lecturas analíticas usan conexiones de solo lectura que no esperan a las escrituras"""
+    import sqlite3
+    
+    isolated_db.insert_batch("departments", [{"id": 1, "department": "Dept 1"}])
+    
+    with isolated_db.bulk_load(["departments"]) as session:
+        session.insert("departments", [{"id": 2, "department": "Dept 2"}])
+        # La carga sin confirmar no es visible y la lectura no queda bloqueada
+        assert isolated_db.execute_read("SELECT COUNT(*) FROM departments") == [(1,)]
+    assert isolated_db.execute_read("SELECT COUNT(*) FROM departments") == [(2,)]
+    
+    with isolated_db.snapshot() as cursor:
+        assert cursor.execute("PRAGMA query_only").fetchone() == (1,)
+        cursor.execute("SELECT COUNT(*) FROM departments")
+        assert cursor.fetchone() == (2,)
+        # La instantánea no ve lo que se confirma después de su primera lectura
+        isolated_db.insert_batch("departments", [{"id": 3, "department": "Dept 3"}])
+        cursor.execute("SELECT COUNT(*) FROM departments")
+        assert cursor.fetchone() == (2,)
+    
+    with pytest.raises(sqlite3.OperationalError):
+        isolated_db.execute_read("DELETE FROM departments")
+    assert isolated_db.execute_query("SELECT COUNT(*) FROM departments") == [(3,)]
+
+def test_bulk_load_session(isolated_db, tmp_path):
+    """Prueba la sesión de carga masiva: una transacción, índices reconstruidos y PRAGMAs restaurados"""
+    isolated_db.execute_query("CREATE INDEX idx_hired_name ON hired_employees (name)")
+    
+    with isolated_db.bulk_load(["hired_employees"], synchronous="OFF") as session:
+        assert session.cursor.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE name = 'idx_hired_name'"
+        ).fetchone() == (0,)
+        for start in (1, 3):
+            session.insert("hired_employees", [
+                {"id": i, "name": f"Emp {i}", "datetime": "2021-01-01T00:00:00Z"} for i in (start, start + 1)
+            ])
+        assert session.cursor.execute("PRAGMA synchronous").fetchone() == (0,)
+    
+    assert session.records_inserted == 4 and session.batches == 2
+    assert isolated_db.execute_query("SELECT name FROM sqlite_master WHERE name = 'idx_hired_name'") == [
+        ("idx_hired_name",)
+    ]
+    assert isolated_db.execute_query("PRAGMA journal_mode") == [("wal",)]
+    assert isolated_db.execute_query("PRAGMA cache_size") == [(-16000,)]
+    
+    # Si la carga falla no queda nada confirmado, tampoco la eliminación del índice
+    csv_path = tmp_path / "hired_employees.csv"
+    csv_path.write_text("10,Ana,2021-01-15T10:00:00Z,1,2\n11,Luis,15/01/2021,1,2\n", encoding="utf-8")
+    response = client.post(
+        "/upload-from-path/hired_employees?bulk=true&on_error=abort&batch_size=1",
+        json={"file_path": str(csv_path)}
+    )
+    assert response.status_code == 400
+    assert isolated_db.execute_query("SELECT COUNT(*) FROM hired_employees") == [(4,)]
+    assert isolated_db.execute_query("SELECT COUNT(*) FROM sqlite_master WHERE name = 'idx_hired_name'") == [(1,)]
+    
+    response = client.post(
+        "/upload-from-path/hired_employees?bulk=true&batch_size=1",
+        json={"file_path": str(csv_path)}
+    )
+    assert response.status_code == 201
+    assert response.json()["records_inserted"] == 1
+    assert response.json()["records_rejected"] == 1
+
+def test_database_lanes_serialize_writes_without_blocking_reads(isolated_db):
+    """Prueba que las lecturas no esperan a una escritura en curso y que las escrituras se ejecutan de una en una"""
+    import asyncio
+    import threading
+    from app.database.async_db import AsyncDatabase, DatabaseLanes
+    
+    lanes = DatabaseLanes(read_workers=2)
+    db = AsyncDatabase(isolated_db, lanes)
+    release = threading.Event()
+    
+    async def scenario():
+        blocked = asyncio.ensure_future(db.write(release.wait, 5))
+        queued = asyncio.ensure_future(db.insert_batch("jobs", [{"id": 1, "job": "Analyst"}]))
+        
+        # La lectura se atiende mientras el carril de escritura está ocupado
+        assert await db.execute_query("SELECT COUNT(*) FROM jobs") == [(0,)]
+        assert not queued.done()
+        
+        release.set()
+        await asyncio.gather(blocked, queued)
+        return await db.execute_query("SELECT job FROM jobs")
+    
+    try:
+        assert asyncio.run(scenario()) == [("Analyst",)]
+    finally:
+        release.set()
+        lanes.shutdown()
+
+def test_group_commit_writer_coalesces_batches(isolated_db):
+    """Prueba que los lotes simultáneos se confirman juntos y que un lote no válido solo falla él"""
+    import threading
+    from app.database.async_db import DatabaseLanes
+    from app.database.group_commit import GroupCommitWriter
+    
+    lanes = DatabaseLanes(read_workers=1)
+    writer = GroupCommitWriter(lanes, window=0.05)
+    release = threading.Event()
+    
+    try:
+        # Mientras el hilo de escritura está ocupado, los lotes se acumulan en la cola
+        lanes.submit_write(release.wait, 5)
+        futures = [writer.submit(isolated_db, "jobs", [{"id": i, "job": f"Job {i}"}]) for i in range(1, 6)]
+        duplicate = writer.submit(isolated_db, "jobs", [{"id": 1, "job": "Duplicado"}])
+        assert writer.stats()["queue_depth"] == 6
+        release.set()
+        
+        assert [future.result(timeout=5) for future in futures] == [1] * 5
+        with pytest.raises(Exception):
+            duplicate.result(timeout=5)
+        
+        stats = writer.stats()
+        assert stats["commits"] == 1
+        assert stats["batches_committed"] == 5
+        assert stats["batches_failed"] == 1
+        assert stats["max_queue_depth"] == 6
+        assert stats["queue_depth"] == 0
+        assert isolated_db.execute_query("SELECT COUNT(*) FROM jobs") == [(5,)]
+        assert isolated_db.execute_query("SELECT job FROM jobs WHERE id = 1") == [("Job 1",)]
+    finally:
+        release.set()
+        lanes.shutdown()
+    
+    response = client.get("/batch-writer/stats")
+    assert response.status_code == 200
+    assert "avg_batches_per_commit" in response.json()
+
+def test_group_commit_writer_survives_cancelled_waiters(isolated_db):
+    """Prueba que un lote cancelado antes de confirmarse se descarta y el escritor sigue atendiendo lotes"""
+    import threading
+    from app.database.async_db import DatabaseLanes
+    from app.database.group_commit import GroupCommitWriter
+    
+    lanes = DatabaseLanes(read_workers=1)
+    writer = GroupCommitWriter(lanes, window=0)
+    release = threading.Event()
+    
+    try:
+        lanes.submit_write(release.wait, 5)
+        cancelled = writer.submit(isolated_db, "jobs", [{"id": 1, "job": "Cancelado"}])
+        kept = writer.submit(isolated_db, "jobs", [{"id": 2, "job": "Job 2"}])
+        assert cancelled.cancel()
+        release.set()
+        
+        assert kept.result(timeout=5) == 1
+        assert writer.submit(isolated_db, "jobs", [{"id": 3, "job": "Job 3"}]).result(timeout=5) == 1
+        assert isolated_db.execute_query("SELECT id FROM jobs ORDER BY id") == [(2,), (3,)]
+        assert writer.stats()["queue_depth"] == 0
+    finally:
+        release.set()
+        lanes.shutdown()
+
+def test_archive_year_moves_hired_employees(isolated_db):
+    """Prueba que un año archivado se traslada a su archivo y sigue contando en los informes y el historial"""
+    import os
+    from app.database.analytics import SQLiteAnalytics
+    from app.routes.sql_routes import EMPLOYEES_BY_QUARTER_QUERY, ReportPeriod
+    
+    isolated_db.insert_batch("departments", [{"id": 1, "department": "Dept 1"}])
+    isolated_db.insert_batch("jobs", [{"id": 1, "job": "Job 1"}])
+    isolated_db.insert_batch("hired_employees", [
+        {"id": i, "name": f"Emp {i}", "datetime": f"{2019 + i % 3}-0{i % 9 + 1}-01T10:00:00Z",
+         "department_id": 1, "job_id": 1}
+        for i in range(1, 31)
+    ])
+    analytics = SQLiteAnalytics(isolated_db)
+    before = analytics.query(EMPLOYEES_BY_QUARTER_QUERY, ReportPeriod.for_year(2020).params)
+    
+    response = client.post("/archive/2020")
+    assert response.status_code == 200
+    assert response.json()["records_archived"] == 10
+    assert client.post("/archive/2020").status_code == 400
+    
+    assert os.path.exists(isolated_db.archive_path(2020))
+    assert isolated_db.execute_query("SELECT COUNT(*) FROM hired_employees WHERE hire_year = 2020") == [(0,)]
+    source, archive_years = isolated_db.hired_employees_history()
+    assert archive_years == [2020]
+    assert analytics.query(EMPLOYEES_BY_QUARTER_QUERY, ReportPeriod.for_year(2020).params) == before
+    assert isolated_db.execute_read(f"SELECT COUNT(*) FROM {source}", archive_years=archive_years) == [(30,)]
+    
+    # Las filas de un año archivado cargadas después se siguen contando
+    isolated_db.insert_batch("hired_employees", [
+        {"id": 100, "name": "Emp 100", "datetime": "2020-12-01T10:00:00Z", "department_id": 1, "job_id": 1}
+    ])
+    assert isolated_db.execute_read(f"SELECT COUNT(*) FROM {source} WHERE hire_year = 2020",
+                                    archive_years=archive_years) == [(11,)]
+    
+    response = client.post("/truncate/hired_employees")
+    assert response.status_code == 200
+    assert isolated_db.archived_years() == {}
+    assert not os.path.exists(isolated_db.archive_path(2020))
+
+def test_archived_ids_are_not_inserted_again(isolated_db):
+    """Prueba que un upsert repetido tras archivar un año no duplica sus filas ni sus recuentos"""
+    rows = [
+        {"id": i, "name": f"Emp {i}", "datetime": f"{2020 + i % 2}-03-01T10:00:00Z", "department_id": 1, "job_id": 1}
+        for i in range(1, 7)
+    ]
+    isolated_db.insert_batch("hired_employees", rows)
+    isolated_db.archive_year(2020)
+    
+    def summary():
+        return isolated_db.execute_query(
+            "SELECT hire_year, SUM(hired) FROM hired_employees_summary GROUP BY hire_year ORDER BY hire_year")
+    
+    assert summary() == [(2020, 3), (2021, 3)]
+    assert isolated_db.insert_batch("hired_employees", rows, upsert=True) == 0
+    assert summary() == [(2020, 3), (2021, 3)]
+    source, archive_years = isolated_db.hired_employees_history()
+    assert isolated_db.execute_read(f"SELECT COUNT(*), COUNT(DISTINCT id) FROM {source}",
+                                    archive_years=archive_years) == [(6, 6)]
+    
+    # Una fila archivada no se puede modificar ni volver a insertar
+    changed = dict(rows[1], name="Otro nombre")
+    with pytest.raises(ValueError):
+        isolated_db.insert_batch("hired_employees", [changed], upsert=True)
+    with pytest.raises(ValueError):
+        isolated_db.insert_batch("hired_employees", [rows[1]])
+    assert summary() == [(2020, 3), (2021, 3)]
+
+def test_archive_year_limited_to_attachable_archives(isolated_db):
+    """Prueba que no se archivan más años de los que SQLite puede adjuntar y que /export sigue funcionando"""
+    from app.database.db_manager import MAX_ARCHIVES
+    
+    years = range(2000, 2000 + MAX_ARCHIVES + 1)
+    isolated_db.insert_batch("hired_employees", [
+        {"id": i, "name": f"Emp {i}", "datetime": f"{year}-01-01T10:00:00Z", "department_id": 1, "job_id": 1}
+        for i, year in enumerate(years, 1)
+    ])
+    for year in years[:-1]:
+        assert client.post(f"/archive/{year}").status_code == 200
+    
+    response = client.post(f"/archive/{years[-1]}")
+    assert response.status_code == 400
+    assert str(MAX_ARCHIVES) in response.json()["detail"]
+    
+    export = client.get("/export/hired_employees")
+    assert export.status_code == 200
+    assert len(export.text.splitlines()) == MAX_ARCHIVES + 1
+    isolated_db.drop_archives()
+
+def test_iter_read_and_export_stream_in_chunks(isolated_db):
+    """Prueba que las lecturas por bloques devuelven la conexión al terminar y que /export devuelve la tabla completa"""
+    import json
+    
+    isolated_db.insert_batch("jobs", [{"id": i, "job": f"Job {i}"} for i in range(1, 2501)])
+    
+    chunks = isolated_db.iter_read("SELECT id FROM jobs ORDER BY id", chunk_size=1000)
+    assert [len(rows) for rows in chunks] == [1000, 1000, 500]
+    idle = isolated_db.read_pool.idle_count()
+    
+    # Un recorrido abandonado devuelve la conexión al cerrarlo
+    chunks = isolated_db.iter_read("SELECT id FROM jobs", chunk_size=10)
+    assert next(chunks)[0] == (1,)
+    assert isolated_db.read_pool.idle_count() == idle - 1
+    chunks.close()
+    assert isolated_db.read_pool.idle_count() == idle
+    
+    with pytest.raises(ValueError):
+        isolated_db.iter_read("SELECT id FROM jobs", chunk_size=0)
+    
+    response = client.get("/export/jobs", params={"chunk_size": 300})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    lines = response.text.splitlines()
+    assert len(lines) == 2500 and lines[0] == "1,Job 1" and lines[-1] == "2500,Job 2500"
+    
+    isolated_db.insert_batch("hired_employees", [
+        {"id": 1, "name": "Emp 1", "datetime": "2021-01-01T10:00:00Z", "department_id": None, "job_id": 3}
+    ])
+    response = client.get("/export/hired_employees", params={"format": "ndjson"})
+    assert response.status_code == 200
+    assert [json.loads(line) for line in response.text.splitlines()] == [
+        {"id": 1, "name": "Emp 1", "datetime": "2021-01-01T10:00:00Z", "department_id": None, "job_id": 3}
+    ]
+    
+    assert client.get("/export/departments").text == ""
+    assert client.get("/export/jobs", params={"format": "xml"}).status_code == 400
+    assert client.get("/export/invalid").status_code == 400
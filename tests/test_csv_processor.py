@@ -0,0 +1,240 @@
+"""
+Pruebas para el procesamiento de archivos CSV
+"""
+import pytest
+from app.utils.csv_processor import iter_batches, iter_csv_batches, parse_csv_file
+
+def test_iter_batches_fixed_size():
+    """Prueba que los lotes tienen el tamaño indicado salvo el último"""
+    batches = list(iter_batches(range(7), 3))
+    
+    assert batches == [[0, 1, 2], [3, 4, 5], [6]]
+
+def test_iter_batches_invalid_size():
+    """Prueba que un tamaño de lote no positivo es rechazado"""
+    with pytest.raises(ValueError):
+        list(iter_batches([1], 0))
+
+def test_iter_csv_batches_matches_parse(tmp_path):
+    """Prueba que la lectura por lotes produce los mismos registros que la lectura completa"""
+    csv_path = tmp_path / "departments.csv"
+    csv_path.write_text("".join(f"{i},Dept {i}\n" for i in range(1, 11)), encoding="utf-8")
+    
+    batches = list(iter_csv_batches(str(csv_path), 4))
+    
+    assert [len(batch) for batch in batches] == [4, 4, 2]
+    assert [r for batch in batches for r in batch.to_records()] == parse_csv_file(str(csv_path))
+
+def test_iter_csv_batches_missing_file():
+    """Prueba que un archivo inexistente se detecta antes de iterar"""
+    with pytest.raises(FileNotFoundError):
+        iter_csv_batches("/no/existe.csv")
+
+def test_iter_text_lines_splits_across_chunks():
+    """Prueba que las líneas y los caracteres multibyte partidos entre lecturas se reconstruyen"""
+    import io
+    from app.utils.csv_processor import iter_text_lines
+    
+    data = "1,Ñandú\n2,Café\r\n3,Último".encode("utf-8")
+    
+    lines = list(iter_text_lines(io.BytesIO(data), chunk_size=3))
+    
+    assert lines == ["1,Ñandú\n", "2,Café\r\n", "3,Último"]
+
+def test_chunk_stream_feeds_parser_from_another_thread():
+    """Prueba que el parser consume un ChunkStream alimentado desde otro hilo"""
+    import threading
+    from app.utils.csv_processor import iter_stream_batches
+    from app.utils.streaming import ChunkStream
+    
+    stream = ChunkStream(max_chunks=2)
+    
+    def produce():
+        for i in range(1, 101):
+            stream.feed(f"{i},Dept {i}\n".encode("utf-8"))
+        stream.finish()
+    
+    producer = threading.Thread(target=produce)
+    producer.start()
+    batches = list(iter_stream_batches(stream, "departments", 30))
+    producer.join()
+    
+    assert [len(batch) for batch in batches] == [30, 30, 30, 10]
+    assert batches[-1].to_records()[-1] == {"id": 100, "department": "Dept 100"}
+
+def test_split_byte_ranges_aligned_to_lines(tmp_path):
+    """Prueba que los rangos cubren el archivo y terminan en salto de línea"""
+    from app.utils.parallel_csv import split_byte_ranges
+    
+    csv_path = tmp_path / "jobs.csv"
+    data = "".join(f"{i},Job number {i}\n" for i in range(1, 200)).encode("utf-8")
+    csv_path.write_bytes(data)
+    
+    ranges = split_byte_ranges(str(csv_path), 100)
+    
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(data)
+    for (_, end), (start, _) in zip(ranges, ranges[1:]):
+        assert end == start
+        assert data[end - 1:end] == b"\n"
+
+def test_parallel_batches_match_sequential(tmp_path):
+    """Prueba que el parseo paralelo entrega los mismos lotes y en el mismo orden"""
+    from app.utils.parallel_csv import iter_csv_batches_parallel
+    
+    csv_path = tmp_path / "hired_employees.csv"
+    csv_path.write_text(
+        "".join(f"{i},Employee {i},2021-01-01T00:00:00Z,{i % 5 or ''},{i % 7}\n" for i in range(1, 1001)),
+        encoding="utf-8"
+    )
+    
+    sequential = list(iter_csv_batches(str(csv_path), 128))
+    parallel = list(iter_csv_batches_parallel(str(csv_path), 128, workers=2, shard_bytes=2048))
+    
+    assert all(len(batch) <= 128 for batch in parallel)
+    # Un número de procesos desorbitado se limita a MAX_WORKERS
+    capped = iter_csv_batches_parallel(str(csv_path), 128, workers=10 ** 6, shard_bytes=2048)
+    assert [r for batch in capped for r in batch.to_records()] == [r for batch in parallel for r in batch.to_records()]
+    assert ([r for batch in parallel for r in batch.to_records()] ==
+            [r for batch in sequential for r in batch.to_records()])
+
+def test_parallel_batches_keep_unusual_line_separators_in_fields(tmp_path):
+    """Prueba que los caracteres que str.splitlines trata como saltos de línea no parten las filas en paralelo"""
+    from app.utils.parallel_csv import iter_csv_batches_parallel
+    
+    csv_path = tmp_path / "jobs.csv"
+    csv_path.write_bytes("".join(
+        f"{i},Job\x0c{i}\u2028x\x85y\n" if i % 3 == 0 else f"{i},Job {i}\n" for i in range(1, 301)
+    ).encode("utf-8"))
+    
+    sequential = [r for batch in iter_csv_batches(str(csv_path), 50) for r in batch.to_records()]
+    parallel = [r for batch in iter_csv_batches_parallel(str(csv_path), 50, workers=2, shard_bytes=512)
+                for r in batch.to_records()]
+    
+    assert len(sequential) == 300
+    assert parallel == sequential
+    assert parallel[2] == {"id": 3, "job": "Job\x0c3\u2028x\x85y"}
+
+def test_column_batch_round_trip_with_nulls():
+    """Prueba que el lote columnar conserva los NULL mediante la máscara de validez"""
+    import pickle
+    from app.utils.column_batch import ColumnBatch
+    
+    batch = ColumnBatch(("id", "name", "job_id"), int_columns=("id", "job_id"), nullable_columns=("job_id",))
+    batch.append((1, "Ana", 7))
+    batch.append((2, "Luis", None))
+    
+    assert list(batch.rows()) == [(1, "Ana", 7), (2, "Luis", None)]
+    restored = pickle.loads(pickle.dumps(batch))
+    restored.append((3, "Eva", None))
+    assert restored.to_records()[1:] == [
+        {"id": 2, "name": "Luis", "job_id": None},
+        {"id": 3, "name": "Eva", "job_id": None}
+    ]
+
+def test_schema_registry_matches_ddl():
+    """Prueba que el registro de esquemas refleja las tablas de create_db"""
+    from app.database.schema import SCHEMAS
+    
+    assert list(SCHEMAS) == ["departments", "jobs", "hired_employees"]
+    employees = SCHEMAS["hired_employees"]
+    assert employees.column_names == ("id", "name", "datetime", "department_id", "job_id")
+    assert employees.nullable_int_columns == ("department_id", "job_id")
+
+def test_schema_converter_types_row():
+    """Prueba el convertidor precompilado de hired_employees"""
+    from app.database.schema import get_schema
+    
+    convert = get_schema("hired_employees").convert_row
+    
+    assert convert(["7", "Ana", "2021-01-01T00:00:00Z", " ", "3"]) == (7, "Ana", "2021-01-01T00:00:00Z", None, 3)
+    with pytest.raises(ValueError):
+        convert(["x", "Ana", "2021-01-01T00:00:00Z", "1", "3"])
+
+def test_iter_csv_batches_uses_table_name_over_file_name(tmp_path):
+    """Prueba que la tabla indicada determina el esquema aunque el nombre del archivo no la mencione"""
+    csv_path = tmp_path / "tmp1a2b3c.csv"
+    csv_path.write_text("1,Sales\n2,Finance\n", encoding="utf-8")
+    
+    batches = list(iter_csv_batches(str(csv_path), table_name="departments"))
+    
+    assert batches[0].to_records() == [{"id": 1, "department": "Sales"}, {"id": 2, "department": "Finance"}]
+
+def test_iter_csv_batches_from_offset_reports_positions(tmp_path):
+    """Prueba que los offsets permiten reanudar la lectura, incluso con campos multilínea"""
+    from app.utils.csv_processor import iter_csv_batches_from_offset
+    
+    content = '1,"Research\nand Development"\n2,Sales\n3,"Ñoño, Inc."\n4,HR\n'
+    csv_path = tmp_path / "departments.csv"
+    csv_path.write_text(content, encoding="utf-8")
+    
+    positioned = list(iter_csv_batches_from_offset(str(csv_path), "departments", 2))
+    
+    assert [offset for _, offset in positioned] == [
+        len('1,"Research\nand Development"\n2,Sales\n'.encode("utf-8")),
+        len(content.encode("utf-8"))
+    ]
+    resumed = list(iter_csv_batches_from_offset(str(csv_path), "departments", 2, positioned[0][1]))
+    assert resumed[0][0].to_records() == [{"id": 3, "department": "Ñoño, Inc."}, {"id": 4, "department": "HR"}]
+    assert positioned[0][0].to_records()[0]["department"] == "Research\nand Development"
+
+@pytest.mark.parametrize("compress", ["gzip", "bz2", "lzma"])
+def test_compressed_file_and_stream_are_decompressed(tmp_path, compress):
+    """Prueba que los CSV comprimidos se leen igual que los planos, desde archivo y desde flujo"""
+    import importlib
+    import io
+    from app.utils.csv_processor import iter_csv_batches_from_offset, iter_stream_batches
+    from app.utils.streaming import ChunkStream
+    
+    content = "".join(f"{i},Dept {i}\n" for i in range(1, 11)).encode("utf-8")
+    compressed = importlib.import_module(compress).compress(content)
+    csv_path = tmp_path / "data.csv.z"
+    csv_path.write_bytes(compressed)
+    expected = [{"id": i, "department": f"Dept {i}"} for i in range(1, 11)]
+    
+    from_file = [r for batch in iter_csv_batches(str(csv_path), 4, "departments") for r in batch.to_records()]
+    from_stream = [r for batch in iter_stream_batches(io.BytesIO(compressed), "departments", 4)
+                   for r in batch.to_records()]
+    
+    # Un flujo que entrega la cabecera en fragmentos de un byte
+    stream = ChunkStream(max_chunks=len(compressed) + 1)
+    for byte in compressed:
+        stream.feed(bytes([byte]))
+    stream.finish()
+    from_chunks = [r for batch in iter_stream_batches(stream, "departments") for r in batch.to_records()]
+    
+    assert from_file == from_stream == from_chunks == expected
+    
+    # Los offsets se refieren al contenido descomprimido y permiten reanudar
+    first_batch, offset = next(iter(iter_csv_batches_from_offset(str(csv_path), "departments", 4)))
+    assert offset == len(b"".join(content.splitlines(keepends=True)[:4]))
+    resumed = [r for batch, _ in iter_csv_batches_from_offset(str(csv_path), "departments", 4, offset)
+               for r in batch.to_records()]
+    assert resumed == expected[4:]
+
+def test_mapped_chunks_match_csv_reader(tmp_path):
+    """Prueba que la lectura sobre mmap divide los registros igual que csv.reader"""
+    import csv
+    from app.utils.mmap_csv import iter_mapped_chunks
+    
+    content = (
+        '1,Sales\n\n2,"Research\nand Development"\n3,"Ñoño, Inc."\r\n'
+        '4,HR\n5,\n6,Legal,extra\n7,"Dos ""comillas"""\n8,Sin salto final'
+    ).encode("utf-8")
+    csv_path = tmp_path / "departments.csv"
+    csv_path.write_bytes(content)
+    expected = list(csv.reader(content.decode("utf-8").splitlines(keepends=True)))
+    
+    for chunk_size in (1, 2, 3, 100):
+        chunks = list(iter_mapped_chunks(str(csv_path), chunk_size))
+        assert [row for rows, _ in chunks for row in rows] == expected
+        assert all(len(rows) == chunk_size for rows, _ in chunks[:-1])
+        assert chunks[-1][1] == len(content)
+        
+        # Cada offset es el inicio de un registro desde el que se puede reanudar
+        for index, (_, offset) in enumerate(chunks[:-1]):
+            resumed = [row for rows, _ in iter_mapped_chunks(str(csv_path), chunk_size, offset) for row in rows]
+            assert resumed == expected[(index + 1) * chunk_size:]
+    
+    empty_path = tmp_path / "empty.csv"
+    empty_path.write_bytes(b"")
+    assert list(iter_mapped_chunks(str(empty_path), 10)) == []
@@ -108,6 +108,7 @@ def setup_test_data():
     # Limpiar después de las pruebas
     db_utils.test_mode = False
     db_utils.test_db_manager = None
+    db_manager.close()
 
 def test_employees_by_quarter(setup_test_data):
     """Prueba el endpoint de empleados por trimestre"""
@@ -157,4 +158,275 @@ def test_departments_above_mean(setup_test_data):
 
     # Verificar que HR NO esté en los resultados (tiene pocas contrataciones)
     hr_absent = not any(item["department"] == "HR" for item in data)
-    assert hr_absent, "HR debería estar por debajo de la media"
\ No newline at end of file
+    assert hr_absent, "HR debería estar por debajo de la media"
+def test_analytics_queries_read_hire_summary(setup_test_data):
+    """Prueba que las consultas analíticas se resuelven con el resumen, sin leer hired_employees"""
+    from app.database.create_db import HIRE_SUMMARY_COUNTS
+    from app.routes.sql_routes import (
+        DEPARTMENTS_ABOVE_MEAN_QUERY, EMPLOYEES_BY_PERIOD_QUERIES, REPORT_YEAR, ReportPeriod
+    )
+    
+    assert setup_test_data.execute_query(
+        "SELECT hire_epoch, hire_year, hire_quarter FROM hired_employees WHERE id = 12"
+    ) == [(1609495200, 2021, 1)]
+    assert sorted(setup_test_data.execute_query("SELECT * FROM hired_employees_summary")) == sorted(
+        setup_test_data.execute_query(HIRE_SUMMARY_COUNTS.format(source="hired_employees"))
+    )
+    
+    params = ReportPeriod.for_year(REPORT_YEAR).params
+    for query in (*EMPLOYEES_BY_PERIOD_QUERIES.values(), DEPARTMENTS_ABOVE_MEAN_QUERY):
+        plan = " | ".join(
+            row[3] for row in setup_test_data.execute_query("EXPLAIN QUERY PLAN " + query, params)
+        )
+        assert "SEARCH s USING INDEX idx_hired_summary_key (hire_year>? AND hire_year<?)" in plan
+        assert "hired_employees" not in plan
+
+def test_hire_summary_follows_writes(tmp_path):
+    """Prueba que el resumen se mantiene con inserciones, upserts, eliminaciones, cargas masivas, archivos y truncados"""
+    from app.database.create_db import HIRE_SUMMARY_COUNTS
+    
+    db_manager = DatabaseManager(create_database(str(tmp_path / "summary.db")))
+    
+    def summary():
+        return sorted(db_manager.execute_query("SELECT * FROM hired_employees_summary"))
+    
+    try:
+        db_manager.insert_batch("hired_employees", [
+            {"id": 1, "name": "Ana", "datetime": "2021-02-01T10:00:00Z", "department_id": 1, "job_id": None},
+            {"id": 2, "name": "Luis", "datetime": "2021-03-01T10:00:00Z", "department_id": 1, "job_id": None},
+            {"id": 3, "name": "Eva", "datetime": "2020-12-01T10:00:00Z", "department_id": 2, "job_id": 1},
+            {"id": 4, "name": "Sin fecha", "datetime": "desconocida", "department_id": 2, "job_id": 1},
+        ])
+        assert summary() == [(2020, 2, 1, 12, 1), (2021, 1, None, 2, 1), (2021, 1, None, 3, 1)]
+        
+        # Un upsert mueve la fila de grupo; una fila sin cambios no altera el resumen
+        db_manager.insert_batch("hired_employees", [
+            {"id": 2, "name": "Luis", "datetime": "2021-07-01T10:00:00Z", "department_id": 1, "job_id": None},
+            {"id": 3, "name": "Eva", "datetime": "2020-12-01T10:00:00Z", "department_id": 2, "job_id": 1},
+        ], upsert=True)
+        assert summary() == [(2020, 2, 1, 12, 1), (2021, 1, None, 2, 1), (2021, 1, None, 7, 1)]
+        
+        with db_manager.bulk_load(["hired_employees"]) as session:
+            session.insert("hired_employees", [
+                {"id": 5, "name": "Sara", "datetime": "2020-11-01T10:00:00Z", "department_id": 2, "job_id": 1}
+            ])
+        assert summary() == [(2020, 2, 1, 11, 1), (2020, 2, 1, 12, 1), (2021, 1, None, 2, 1), (2021, 1, None, 7, 1)]
+        assert db_manager.execute_query("SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger'") == [(3,)]
+        
+        # Una fila eliminada se descuenta, y su grupo desaparece al quedar vacío
+        db_manager.execute_query("DELETE FROM hired_employees WHERE id = 5")
+        assert summary() == [(2020, 2, 1, 12, 1), (2021, 1, None, 2, 1), (2021, 1, None, 7, 1)]
+        db_manager.insert_batch("hired_employees", [
+            {"id": 5, "name": "Sara", "datetime": "2020-11-01T10:00:00Z", "department_id": 2, "job_id": 1}
+        ])
+        
+        # Los años archivados siguen contando
+        db_manager.archive_year(2020)
+        assert db_manager.execute_query("SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger'") == [(3,)]
+        assert summary() == [(2020, 2, 1, 11, 1), (2020, 2, 1, 12, 1), (2021, 1, None, 2, 1), (2021, 1, None, 7, 1)]
+        assert db_manager.refresh_hire_summary() == 4
+        assert summary() == [(2020, 2, 1, 11, 1), (2020, 2, 1, 12, 1), (2021, 1, None, 2, 1), (2021, 1, None, 7, 1)]
+        assert sorted(db_manager.execute_query(HIRE_SUMMARY_COUNTS.format(source="hired_employees"))) == [
+            (2021, 1, None, 2, 1), (2021, 1, None, 7, 1)
+        ]
+        
+        db_manager.truncate("hired_employees")
+        db_manager.drop_archives()
+        assert summary() == []
+        assert db_manager.refresh_hire_summary() == 0
+        assert db_manager.execute_query("SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger'") == [(3,)]
+    finally:
+        db_manager.close()
+
+def test_migrate_database_adds_hire_columns(tmp_path):
+    """Prueba que la migración añade y calcula las columnas de fecha de una base de datos existente"""
+    import sqlite3
+    from app.database.create_db import SCHEMA_VERSION, migrate_database
+    
+    db_path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+        CREATE TABLE departments (id INTEGER PRIMARY KEY, department VARCHAR(100) NOT NULL);
+        CREATE TABLE jobs (id INTEGER PRIMARY KEY, job VARCHAR(100) NOT NULL);
+        CREATE TABLE hired_employees (id INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL,
+            datetime TIMESTAMP NOT NULL, department_id INTEGER, job_id INTEGER);
+        INSERT INTO hired_employees VALUES (1, 'Ana', '2021-11-07T09:30:00Z', 1, 1);
+    """)
+    conn.close()
+    
+    # Los almacenes de las cargas no crean sus tablas al instanciarse
+    from app.database.fingerprints import FingerprintStore
+    from app.database.import_jobs import ImportJobStore
+    from app.database.quarantine import QuarantineStore
+    untouched = DatabaseManager(db_path)
+    for store in (QuarantineStore, FingerprintStore, ImportJobStore):
+        store(untouched)
+    untouched.close()
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone() == (3,)
+    conn.close()
+    
+    assert create_database(db_path) == db_path
+    assert migrate_database(db_path) == 0
+    
+    db_manager = DatabaseManager(db_path)
+    db_manager.insert_batch("hired_employees", [
+        {"id": 2, "name": "Luis", "datetime": "2022-03-31T23:00:00Z", "department_id": 1, "job_id": 1}
+    ])
+    assert db_manager.execute_query("PRAGMA user_version") == [(SCHEMA_VERSION,)]
+    assert db_manager.execute_query(
+        "SELECT id, hire_year, hire_quarter FROM hired_employees ORDER BY id"
+    ) == [(1, 2021, 4), (2, 2022, 1)]
+    assert db_manager.execute_query("SELECT * FROM hired_employees_summary ORDER BY hire_year") == [
+        (2021, 1, 1, 11, 1), (2022, 1, 1, 3, 1)
+    ]
+    assert db_manager.execute_query(
+        "SELECT name FROM sqlite_master WHERE name = 'idx_hired_year_department_job_quarter'"
+    ) == []
+    assert db_manager.execute_query(
+        "SELECT name FROM sqlite_master WHERE name IN ('rejected_rows', 'table_fingerprints', 'import_jobs') "
+        "ORDER BY name"
+    ) == [("import_jobs",), ("rejected_rows",), ("table_fingerprints",)]
+    db_manager.close()
+
+def test_duckdb_analytics_matches_sqlite(setup_test_data, tmp_path):
+    """Prueba que la réplica en DuckDB devuelve lo mismo que SQLite y se actualiza tras una carga"""
+    pytest.importorskip("duckdb")
+    from app.database.analytics import DuckDBAnalytics, SQLiteAnalytics
+    from app.routes.sql_routes import (
+        DEPARTMENTS_ABOVE_MEAN_QUERY, EMPLOYEES_BY_PERIOD_QUERIES, EMPLOYEES_BY_QUARTER_QUERY, REPORT_YEAR,
+        ReportPeriod
+    )
+    
+    params = ReportPeriod(2020, 6, REPORT_YEAR, 12).params
+    sqlite_backend = SQLiteAnalytics(setup_test_data)
+    duckdb_backend = DuckDBAnalytics(setup_test_data, path=str(tmp_path / "analytics.duckdb"))
+    try:
+        for query in (*EMPLOYEES_BY_PERIOD_QUERIES.values(), DEPARTMENTS_ABOVE_MEAN_QUERY):
+            assert duckdb_backend.query(query, params) == sqlite_backend.query(query, params)
+        assert not duckdb_backend.is_stale()
+        
+        setup_test_data.insert_batch("hired_employees", [
+            {"id": 1000, "name": "HR 1000", "datetime": "2021-12-01T10:00:00Z", "department_id": 4, "job_id": 4}
+        ])
+        assert duckdb_backend.is_stale()
+        assert (duckdb_backend.query(EMPLOYEES_BY_QUARTER_QUERY, params)
+                == sqlite_backend.query(EMPLOYEES_BY_QUARTER_QUERY, params))
+        assert duckdb_backend.query("SELECT COUNT(*) FROM hired_employees") == [(54,)]
+    finally:
+        duckdb_backend.close()
+        setup_test_data.execute_query("DELETE FROM hired_employees WHERE id = 1000")
+
+def test_analytics_responses_cached_with_etag(setup_test_data):
+    """Prueba que las respuestas analíticas se sirven desde la caché con ETag y que cualquier escritura las invalida"""
+    import sqlite3
+    from app.utils.db_utils import get_response_cache
+    from app.utils.response_cache import ResponseCache
+    
+    first = client.get("/sql/employees-by-quarter")
+    etag = first.headers["etag"]
+    cache = get_response_cache()
+    stats = cache.stats()
+    
+    cached = client.get("/sql/employees-by-quarter", headers={"If-None-Match": etag})
+    assert cached.status_code == 304 and cached.headers["etag"] == etag and cached.content == b""
+    assert client.get("/sql/employees-by-quarter").json() == first.json()
+    assert cache.stats()["hits"] == stats["hits"] + 2
+    
+    # Una escritura que no cambia el resultado recalcula la respuesta, con el mismo ETag
+    setup_test_data.insert_batch("departments", [{"id": 99, "department": "Legal"}])
+    unchanged = client.get("/sql/employees-by-quarter", headers={"If-None-Match": etag})
+    assert unchanged.status_code == 304
+    assert cache.stats()["misses"] == stats["misses"] + 1
+    
+    # Las escrituras de otra conexión, como las de otro proceso, también invalidan la caché
+    conn = sqlite3.connect(setup_test_data.db_path)
+    try:
+        conn.execute("INSERT INTO hired_employees (id, name, datetime, department_id, job_id, hire_year, hire_quarter) "
+                     "VALUES (2000, 'Externo', '2021-01-05T10:00:00Z', 4, 4, 2021, 1)")
+        conn.commit()
+        changed = client.get("/sql/employees-by-quarter", headers={"If-None-Match": etag})
+        assert changed.status_code == 200 and changed.headers["etag"] != etag
+        assert [row["Q1"] for row in changed.json() if row["department"] == "HR"] == [1]
+    finally:
+        conn.execute("DELETE FROM hired_employees WHERE id = 2000")
+        conn.execute("DELETE FROM departments WHERE id = 99")
+        conn.commit()
+        conn.close()
+    
+    lru = ResponseCache(max_entries=1)
+    lru.put("a", 1, b"[]")
+    lru.put("b", 1, b"[]")
+    assert lru.get("a", 1) is None and lru.get("b", 1) is not None and lru.get("b", 2) is None
+
+def test_analytics_cache_follows_scheduled_duckdb_refresh(setup_test_data, tmp_path):
+    """Prueba que una respuesta calculada con la réplica desactualizada no se sirve tras reconstruirla"""
+    pytest.importorskip("duckdb")
+    import app.utils.db_utils as db_utils
+    from app.database.analytics import DuckDBAnalytics
+    
+    def hr_q1(response):
+        return [row["Q1"] for row in response.json() if row["department"] == "HR"]
+    
+    before = client.get("/sql/employees-by-quarter")
+    previous = db_utils._analytics
+    db_utils._analytics = DuckDBAnalytics(setup_test_data, path=str(tmp_path / "analytics.duckdb"),
+                                          refresh_interval=3600)
+    try:
+        db_utils._analytics.refresh()
+        assert client.get("/sql/employees-by-quarter").json() == before.json()
+        
+        setup_test_data.insert_batch("hired_employees", [
+            {"id": 4000, "name": "HR 4000", "datetime": "2021-02-01T10:00:00Z", "department_id": 4, "job_id": 4}
+        ])
+        stale = client.get("/sql/employees-by-quarter")
+        assert stale.json() == before.json()
+        
+        # La reconstrucción programada (aquí, llamada directamente) invalida la respuesta
+        db_utils._analytics.refresh()
+        fresh = client.get("/sql/employees-by-quarter", headers={"If-None-Match": stale.headers["etag"]})
+        assert fresh.status_code == 200
+        assert hr_q1(fresh) == [hr_q1(before)[0] + 1]
+    finally:
+        db_utils._analytics.close()
+        db_utils._analytics = previous
+        setup_test_data.execute_query("DELETE FROM hired_employees WHERE id = 4000")
+
+def test_analytics_reports_by_year_and_period(setup_test_data):
+    """Prueba los informes de otros años y de periodos de varios años, por trimestre o por mes"""
+    default = client.get("/sql/employees-by-quarter").json()
+    assert client.get("/sql/employees-by-quarter", params={"year": 2021}).json() == default
+    assert {row["year"] for row in default} == {2021}
+    
+    monthly = client.get("/sql/employees-by-quarter", params={"granularity": "month"}).json()
+    assert [sum(row[f"M{month}"] for month in range(1, 13)) for row in monthly] == [
+        sum(row[f"Q{quarter}"] for quarter in range(1, 5)) for row in default
+    ]
+    
+    setup_test_data.insert_batch("hired_employees", [
+        {"id": 3000 + i, "name": f"Previo {i}", "datetime": f"2020-{month}-15T10:00:00Z",
+         "department_id": department_id, "job_id": department_id}
+        for i, (month, department_id) in enumerate([("11", 1), ("12", 1), ("12", 1), ("06", 2)])
+    ])
+    try:
+        data = client.get("/sql/employees-by-quarter", params={"from": "2020", "to": "2021"}).json()
+        engineering = [row for row in data if row["department"] == "Engineering"]
+        assert [row["year"] for row in engineering] == [2020, 2021]
+        assert (engineering[0]["Q1"], engineering[0]["Q4"]) == (0, 3)
+        assert engineering[1] == next(row for row in default if row["department"] == "Engineering")
+        
+        data = client.get("/sql/employees-by-quarter",
+                          params={"from": "2020-12", "to": "2021-01", "granularity": "month"}).json()
+        engineering = [row for row in data if row["department"] == "Engineering"]
+        assert [(row["year"], row["M11"], row["M12"]) for row in engineering] == [(2020, 0, 2), (2021, 0, 0)]
+        assert all(row["M2"] == 0 for row in data)
+        
+        assert client.get("/sql/departments-above-mean", params={"year": 2020}).json() == [
+            {"id": 1, "department": "Engineering", "hired": 3}
+        ]
+        
+        for params in ({"year": 2021, "from": "2021"}, {"from": "2021"}, {"from": "2021-06", "to": "2021-05"},
+                       {"from": "2021-13", "to": "2022"}, {"granularity": "week"}):
+            assert client.get("/sql/employees-by-quarter", params=params).status_code == 400
+    finally:
+        setup_test_data.execute_query("DELETE FROM hired_employees WHERE id >= 3000")